@@ -0,0 +1,73 @@
+##
+##  Time family-tree-2's insert_people across a range of batch sizes:  a batch size of 1 is one query,  round
+##  trip and transaction per person (as the demo used to do);  larger batches bundle that many people into
+##  each transaction.
+##
+##  The people are renamed copies of the demo's in-memory Family.  By default they are inserted into an
+##  in-process woqlStandin server;  give --server to use a real TerminusDB server instead.
+##
+##  Usage:
+##      python batch_insert.py [--people 100000] [--batch-sizes 1,10,100,1000,10000] [--server http://localhost:6363]
+##
+
+import os
+import io
+import sys
+import time
+import argparse
+import contextlib
+
+HERE                    = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "family-tree-2"))
+
+import woqlStandin
+from scaling_bench import KEY, scale_family, rebuild
+
+
+NR_PEOPLE               = 10000                 # number of people inserted,  for each batch size
+BATCH_SIZES             = (1, 10, 100, 1000, 10000)
+MAX_UNBATCHED           = 2000                  # at most this many people are inserted one at a time (it is slow)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time family2's insert_people across batch sizes")
+    parser.add_argument("--people", type=int, default=NR_PEOPLE, help="number of people inserted")
+    parser.add_argument("--batch-sizes", default=",".join(str(b) for b in BATCH_SIZES),
+                        help="comma separated batch sizes")
+    parser.add_argument("--server", help="url of a TerminusDB server (default: an in-process stand-in)")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import family2 as demo
+    import woqlclient.woqlClient as woql
+
+    server = None
+    url = args.server
+    if url is None:
+        server, url = woqlStandin.start_standin()
+    demo.wary.use_pooled_session(url)
+    client = woql.WOQLClient()
+    with demo.wary.suppress_Terminus_diagnostics():
+        client.connect(url, KEY)
+    demo.client = client
+
+    copies = -(-args.people // len(demo.Family))
+    people = list(scale_family(demo.Family, demo.Person, copies).items())[:args.people]
+    print("[Inserting {:,} people]".format(len(people)))
+    try:
+        for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+            some = people[:MAX_UNBATCHED] if batch_size == 1 else people
+            with contextlib.redirect_stdout(io.StringIO()):
+                rebuild(demo, client)
+                demo.create_schema(client)
+                start = time.perf_counter()
+                demo.insert_people(client, iter(some), batch_size)
+                elapsed = time.perf_counter() - start
+            print("    batch size {:>6,}:   {:>8,} people in {:8.2f} s   {:>10,.0f} people/s   {:>8,} transactions".format(
+                batch_size, len(some), elapsed, len(some) / elapsed, -(-len(some) // batch_size)))
+            if server is not None:
+                server.databases.clear()
+    finally:
+        if server is not None:
+            server.shutdown()
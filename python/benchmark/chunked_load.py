@@ -0,0 +1,126 @@
+##
+##  Time the loading of a demo's .csv files in chunks (see woqlDiagnosis.load_csv_chunked()),  across a range of
+##  chunk sizes and numbers of workers,  to find where the server's throughput stops improving.  The whole file
+##  in a single transaction (the demos' default) is timed first,  for comparison.  With --client-side,  the chunks are
+##  read here and their rows sent to the server with the load query's idgens,  casts and inserts (see
+##  woqlDiagnosis.load_csv_client_side()) instead,  with the building of their queries spread across --processes.
+##
+##  The bundled data is scaled up to the tier as by scaling_bench.py.  By default it is loaded into an in-process
+##  woqlStandin server (which runs the queries on a database one at a time,  so that only the client side work
+##  overlaps);  give --server,  with --local-files set to the server's TERMINUS_LOCAL directory,  to use a real
+##  TerminusDB server instead.
+##
+##  Usage:
+##      python chunked_load.py [--demo charities] [--tier 10] [--chunk-rows 1000,10000] [--workers 1,2,4,8]
+##                             [--client-side [--processes 4]]
+##                             [--server http://localhost:6363 --local-files /path/to/TERMINUS_LOCAL]
+##
+
+import os
+import io
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+HERE                    = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+import woqlStandin
+import woqlDiagnosis as wary
+from scaling_bench import DEMOS, DEMOS_DIR, KEY, scale_csv, scaled_name, rebuild
+
+
+TIER                    = 10                    # data size,  as a multiple of the bundled data
+CHUNK_ROWS              = (1000, 10000)
+WORKERS                 = (1, 2, 4, 8)
+
+
+def load_all(name, demo, client, local_dir, files, chunk_rows, workers, client_side=False, processes=1):
+    '''
+        Rebuild the demo's database,  and load each of its (scaled) .csv files
+
+        :return:        the number of rows and of triples loaded,  and the seconds taken to load them
+    '''
+    rows = 0
+    triples = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        rebuild(demo, client)
+        demo.create_schema(client)
+        start = time.perf_counter()
+        for scaled, voyages in zip(files, (True, False)):
+            loader = (lambda url: demo.load_query(url, voyages)) if name == "shipping" else demo.load_query
+            if chunk_rows and client_side:
+                report = wary.load_csv_client_side(client, scaled, loader, chunk_rows, workers, processes, local_dir)
+                rows += report["rows"]
+                triples += report["triples"]
+            elif chunk_rows:
+                report = wary.load_csv_chunked(client, scaled, loader, chunk_rows, workers, local_dir)
+                rows += report["rows"]
+                triples += report["triples"]
+            else:
+                wary.execute_query(loader(scaled), client)
+                nr_rows = sum(1 for _ in wary.read_csv_rows(scaled, local_dir)) - 1
+                rows += nr_rows
+                triples += nr_rows * wary.count_writes(loader(scaled))
+        elapsed = time.perf_counter() - start
+    return rows, triples, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time chunked loading of a demo's .csv files")
+    parser.add_argument("--demo", default="charities", choices=[d for d in DEMOS if DEMOS[d][2]])
+    parser.add_argument("--tier", type=int, default=TIER, help="data size,  as a multiple of the bundled data")
+    parser.add_argument("--chunk-rows", default=",".join(str(c) for c in CHUNK_ROWS),
+                        help="comma separated chunk sizes,  in rows")
+    parser.add_argument("--workers", default=",".join(str(w) for w in WORKERS),
+                        help="comma separated numbers of chunks loaded at the same time")
+    parser.add_argument("--client-side", action="store_true", help="read and parse the chunks here")
+    parser.add_argument("--processes", type=int, default=1, help="number of processes building queries,  with --client-side")
+    parser.add_argument("--server", help="url of a TerminusDB server (default: an in-process stand-in)")
+    parser.add_argument("--local-files", help="the server's TERMINUS_LOCAL directory (default: a temporary one)")
+    args = parser.parse_args()
+
+    local_dir = args.local_files or tempfile.mkdtemp(prefix="woql_chunked_")
+    server = None
+    url = args.server
+    if url is None:
+        server, url = woqlStandin.start_standin(local_dir=local_dir)
+    wary.use_pooled_session(url)
+    import woqlclient.woqlClient as woql
+
+    directory, module, sources = DEMOS[args.demo]
+    sys.path.insert(0, os.path.join(DEMOS_DIR, directory))
+    with contextlib.redirect_stdout(io.StringIO()):
+        demo = __import__(module)
+    client = woql.WOQLClient()
+    with wary.suppress_Terminus_diagnostics():
+        client.connect(url, KEY)
+    demo.client = client
+    files = []
+    for path, names, numbers in sources:
+        files.append(scaled_name(path, args.tier))
+        scale_csv(os.path.join(DEMOS_DIR, directory, path), os.path.join(local_dir, files[-1]), args.tier, names,
+                  numbers)
+
+    runs = [(0, 1)] + [(int(c), int(w)) for c in args.chunk_rows.split(",") for w in args.workers.split(",")]
+    wary.set_max_in_flight(max(w for _, w in runs))
+    kind = "client-side" if args.client_side else "chunks"
+    print("[{} at {}x]".format(args.demo, args.tier))
+    try:
+        for chunk_rows, workers in runs:
+            rows, triples, elapsed = load_all(args.demo, demo, client, local_dir, files, chunk_rows, workers,
+                                              args.client_side, args.processes)
+            print("    {:<30} {:>9,} rows in {:7.2f} s   {:>9,.0f} rows/s   {:>10,.0f} triples/s".format(
+                "{} of {:,} rows x {}".format(kind, chunk_rows, workers) if chunk_rows else "one transaction",
+                rows, elapsed, rows / elapsed, triples / elapsed))
+            if server is not None:
+                server.databases.clear()
+    finally:
+        if server is not None:
+            server.shutdown()
+        if args.local_files is None:
+            shutil.rmtree(local_dir, ignore_errors=True)
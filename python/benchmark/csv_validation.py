@@ -0,0 +1,96 @@
+##
+##  Time the checking of a demo's .csv files before they are loaded (see woqlDiagnosis.validate_csv()),  with a few
+##  bad values planted in them:  each is emptied,  or given a value which is not of its type,  or is not one of its
+##  allowed values.  Every planted problem should be found.  (In the family tree,  a person whose name is emptied
+##  also leaves their children with a parent who is not named in the file,  and so more problems are found.)
+##
+##  The bundled data is scaled up to the tier as by scaling_bench.py.
+##
+##  Usage:
+##      python csv_validation.py [--demo charities] [--tiers 1,10,100] [--bad 10]
+##
+
+import os
+import io
+import sys
+import csv
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+HERE                    = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+LOCAL_DIR               = tempfile.mkdtemp(prefix="woql_check_")
+os.environ["TERMINUS_LOCAL"] = LOCAL_DIR        # where the demos' check_csv reads the .csv files
+
+from scaling_bench import DEMOS, DEMOS_DIR, scale_csv, scaled_name
+
+
+TIERS                   = (1, 10, 100)          # data sizes,  as multiples of the bundled data
+BAD_ROWS                = 10                    # number of bad values planted in each file
+SEED                    = 1
+BAD_VALUES              = {"Registered Number": "12O45", "start": "2020-04-31 12:00", "end": "noon",
+                           "route": "Out9", "berth": "B7", "Parent1": "Nobody", "Parent2": "Nobody"}
+                                                # a bad value for each column which is checked for more than a value
+
+
+def plant(path, columns, nr_bad):
+    '''
+        Plant bad values in a .csv file:  each either empty,  or one of BAD_VALUES
+
+        :return:    set of the (line,  column) of each
+    '''
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.reader(f))
+    planted = set()
+    while len(planted) < nr_bad:
+        line = random.randrange(2, len(rows) + 1)
+        column = random.choice(columns)
+        if column in BAD_VALUES and random.random() < 0.5:
+            rows[line - 1][rows[0].index(column)] = BAD_VALUES[column]
+        else:
+            rows[line - 1][rows[0].index(column)] = ""
+        planted.add((line, column))
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+    return planted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time checking a demo's .csv files before they are loaded")
+    parser.add_argument("--demo", default="charities", choices=[d for d in DEMOS if DEMOS[d][2]])
+    parser.add_argument("--tiers", default=",".join(str(t) for t in TIERS),
+                        help="comma separated data sizes,  as multiples of the bundled data")
+    parser.add_argument("--bad", type=int, default=BAD_ROWS, help="number of bad values planted in each file")
+    args = parser.parse_args()
+    random.seed(SEED)
+
+    directory, module, sources = DEMOS[args.demo]
+    sys.path.insert(0, os.path.join(DEMOS_DIR, directory))
+    with contextlib.redirect_stdout(io.StringIO()):
+        demo = __import__(module)
+    local_dir = LOCAL_DIR
+    try:
+        for tier in [int(t) for t in args.tiers.split(",")]:
+            for (path, names, numbers), voyages in zip(sources, (True, False)):
+                scaled = os.path.join(local_dir, scaled_name(path, tier))
+                rows = scale_csv(os.path.join(DEMOS_DIR, directory, path), scaled, tier, names, numbers)
+                with open(scaled, newline="", encoding="utf-8") as f:
+                    columns = next(csv.reader(f))
+                planted = plant(scaled, columns, min(args.bad, rows))
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    problems = demo.check_csv(*((scaled, voyages) if args.demo == "shipping" else (scaled,)),
+                                              exit_on_error=False)
+                seconds = time.perf_counter() - start
+                found = set(zip(problems["line"], problems["column"]))
+                print("    {:<24} {:>10,} rows  {:7.2f} s  {:>10,.0f} rows/s    {} of {} planted problems found{}"
+                      .format(os.path.basename(scaled), rows, seconds, rows / seconds, len(found & planted),
+                              len(planted), ",  and {} others".format(len(found - planted)) if found - planted else ""))
+    finally:
+        shutil.rmtree(local_dir, ignore_errors=True)
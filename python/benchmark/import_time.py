@@ -0,0 +1,77 @@
+##
+##  Compare the cold start time of each demo,  with its heavy modules (matplotlib,  networkx) imported eagerly
+##  on start up as before,  against importing them lazily,  only when a plot is first drawn.
+##
+##  Each start up is timed in a fresh python interpreter:  the time taken to import the demo module,  which is
+##  all that a batch run (loading data and running queries,  but not plotting) pays for before it starts work.
+##  The eager case is had by setting WOQL_EAGER_IMPORTS,  which makes woqlDiagnosis.lazy_import() import at once.
+##
+##  Usage:
+##      python import_time.py [number of start ups for each demo]
+##
+
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+
+NR_STARTS               = 5                 # number of start ups timed,  for each demo and mode
+
+HERE                    = os.path.dirname(os.path.abspath(__file__))
+
+DEMOS = {
+    "charities":    ("charities", "charities"),
+    "family":       ("family-tree", "family"),
+    "family2":      ("family-tree-2", "family2"),
+    "shipping":     ("shipping", "shipping"),
+}
+
+HEAVY_MODULES           = ("pandas", "matplotlib", "matplotlib.pyplot", "networkx")
+
+#
+#  Run in each fresh interpreter:  time the import,  and note which of the heavy modules it pulled in
+#
+PROBE = '''
+import sys, time, json
+sys.path.insert(0, {directory!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+
+def time_start(directory, module, eager):
+    '''
+        Time one cold start of a demo
+
+        :param directory:   string, the demo's directory
+        :param module:      string, the demo's module
+        :param eager:       boolean, whether the heavy modules are imported eagerly
+        :return:            dict, with the import time in seconds,  and the heavy modules loaded
+    '''
+    env = dict(os.environ)
+    env.pop("WOQL_EAGER_IMPORTS", None)
+    if eager:
+        env["WOQL_EAGER_IMPORTS"] = "1"
+    code = PROBE.format(directory=directory, module=module, heavy=HEAVY_MODULES)
+    out = subprocess.run([sys.executable, "-c", code], cwd=directory, env=env, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else NR_STARTS
+
+    print("[Cold start of each demo:  median of {} starts]".format(n))
+    for name, (directory, module) in DEMOS.items():
+        directory = os.path.join(HERE, "..", directory)
+        times = {}
+        for eager in (True, False):
+            starts = [time_start(directory, module, eager) for _ in range(n)]
+            times[eager] = statistics.median(s["seconds"] for s in starts)
+            print("    {:<10} {:<7} {:8.3f} s    loads: {}".format(
+                name, "eager" if eager else "lazy", times[eager], ", ".join(starts[-1]["loaded"]) or "-"))
+        print("    {:<10} Speed up: {:.2f}x".format(name, times[True] / times[False]))
@@ -0,0 +1,201 @@
+##
+##  Check that the client-side query optimizer (woqlDiagnosis/optimizer.py) leaves the results of the demos'
+##  queries unchanged,  and time each query before and after.
+##
+##  Each demo's data is loaded into an in-process woqlStandin server (which,  like a simple planner,  evaluates
+##  clauses in the order given).  Then each of its queries is run as written,  and again after each rewrite in
+##  turn (flatten,  then hoist,  then drop,  then order),  and the bindings compared with those of the query as
+##  written.  Any difference is reported,  and the exit code is then 1.
+##
+##  With --statistics,  the optimizer plans from the statistics catalog (counts of each predicate's triples,  subjects
+##  and objects,  gathered after the load) rather than from its heuristic guesses.
+##
+##  Usage:
+##      python optimizer_check.py [--tier 10] [--demos charities,family] [--repeats 5] [--statistics] [--show]
+##
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import statistics
+import tempfile
+import contextlib
+
+HERE                    = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+import woqlStandin
+import woqlDiagnosis as wary
+from woqlclient import WOQLQuery
+from woqlDiagnosis.optimizer import optimize_json, REWRITES
+from scaling_bench import DEMOS, DEMOS_DIR, KEY, scale_csv, scaled_name, scale_family, rebuild
+
+
+REPEATS                 = 5                     # number of times each query is timed,  before and after
+TIER                    = 1                     # data size,  as a multiple of the bundled data
+BUSY_TRUSTEES           = 3                     # N,  for busy_trustees(N)
+TRUSTEE                 = "T1796596693580697126"
+CHARITY                 = "Irish Scouting Fellowship"
+
+
+#######################################################################################################################
+#
+#   The queries of each demo
+#
+
+def charities_queries(demo):
+    selects = ["v:Trustee_Name"] + ["v:Charity_Name{}".format(i) for i in range(1, BUSY_TRUSTEES + 1)] + \
+              ["v:date_appointed{}".format(i) for i in range(1, BUSY_TRUSTEES + 1)]
+
+    #
+    #  Composed from a nested select,  as a caller might:  the charities sharing a trustee with CHARITY
+    #
+    fellows = WOQLQuery().select("v:Other_Name").woql_and(
+        WOQLQuery().select("v:Trustee").woql_and(
+            WOQLQuery().triple("v:Appointment", "trustee", "v:Trustee"),
+            WOQLQuery().triple("v:Appointment", "trustee_of", "v:Charity"),
+            WOQLQuery().triple("v:Charity", "charity_name", demo.literal_string(CHARITY))),
+        WOQLQuery().triple("v:Other_Appointment", "trustee", "v:Trustee"),
+        WOQLQuery().triple("v:Other_Appointment", "trustee_of", "v:Other"),
+        WOQLQuery().triple("v:Other", "charity_name", "v:Other_Name"))
+    return [
+        ("charities_for_query",         demo.charities_for_query(TRUSTEE)),
+        ("trustees_for_query",          demo.Trustees_For_Template.bind(charity__name=CHARITY)),
+        ("registration_query",          demo.Registration_Template.bind(charity=CHARITY)),
+        ("all_appointments_query",      demo.all_appointments_query()),
+        ("busy_trustees({})".format(BUSY_TRUSTEES),
+                                        WOQLQuery().select(*selects).woql_and(demo.sub_query_appointment(BUSY_TRUSTEES))),
+        ("fellow_charities",            fellows),
+    ]
+
+
+def family_queries(demo):
+    return [
+        ("list_people_query",               demo.list_people_query()[0]),
+        ("list_parents_of_query(Mary)",     demo.list_parents_of_query("Mary")[0]),
+        ("list_father_of_query",            demo.list_father_of_query()[0]),
+        ("list_mother_of_query(Mary)",      demo.list_mother_of_query("Mary")[0]),
+        ("list_children_of_query(Seamus)",  demo.list_children_of_query("Seamus")[0]),
+        ("list_grandmothers_of_query",      demo.list_grandmothers_of_query()[0]),
+        ("list_grandmothers_of_query(Joe)", demo.list_grandmothers_of_query("Joe")[0]),
+        ("list_grandfathers_of_query(Joe)", demo.list_grandfathers_of_query("Joe")[0]),
+        ("list_grandchildren_of_query(Roisin)", demo.list_grandchildren_of_query("Roisin")[0]),
+    ]
+
+
+def shipping_queries(demo):
+    span = demo.END_DATETIME - demo.START_DATETIME
+    times = [demo.START_DATETIME + span * i / 4 for i in range(1, 4)]
+    return [("status_query({:%d %H:%M})".format(t), demo.Status_Template.bind(time=t.strftime('%Y-%m-%d %H:%M:%S')))
+            for t in times]
+
+
+QUERIES = {
+    "charities":    charities_queries,
+    "family":       family_queries,
+    "family2":      family_queries,
+    "shipping":     shipping_queries,
+}
+
+
+#######################################################################################################################
+
+def load(name, demo, client, local_dir, tier):
+    '''
+        Build the demo's database in the stand-in,  from its bundled data scaled to the tier
+    '''
+    directory, _, sources = DEMOS[name]
+    with contextlib.redirect_stdout(io.StringIO()):
+        rebuild(demo, client)
+        demo.create_schema(client)
+        if name == "family2":
+            demo.insert_people(client, scale_family(demo.Family, demo.Person, tier))
+        for (path, names, numbers), voyages in zip(sources, (True, False)):
+            scaled = scaled_name(path, tier)
+            scale_csv(os.path.join(DEMOS_DIR, directory, path), os.path.join(local_dir, scaled), tier, names, numbers)
+            if name == "shipping":
+                demo.load_csv(client, scaled, voyages)
+            else:
+                demo.load_csv(client, scaled)
+
+
+def timed_run(j, client, repeats):
+    '''
+        :return:        the result of the query,  and the median of its run times
+    '''
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = wary.run_query(WOQLQuery().json(json.loads(json.dumps(j))), client, use_cache=False)
+        seconds.append(time.perf_counter() - start)
+    return result, statistics.median(seconds)
+
+
+def check(name, q, client, repeats, show, estimate):
+    '''
+        Run a query as written,  and after each rewrite in turn
+
+        :return:        boolean, whether every rewrite gave the same bindings
+    '''
+    written = wary.query_json(q)
+    expected, before = timed_run(written, client, repeats)
+    same = True
+    for i, rewrite in enumerate(REWRITES):
+        j = optimize_json(json.loads(json.dumps(written)), estimate, rewrites=REWRITES[:i + 1])
+        result, after = timed_run(j, client, 1 if i + 1 < len(REWRITES) else repeats)
+        if not wary.same_bindings(result, expected):
+            print("    {:<38} [{} changed the bindings:  {:,} rows,  not {:,}]".format(
+                name, rewrite, wary.binding_count(result), wary.binding_count(expected)))
+            same = False
+    print("    {:<38} {:>7,} rows   {:>9.2f} ms -> {:>9.2f} ms   ({:.2f}x)".format(
+        name, wary.binding_count(expected), before * 1000.0, after * 1000.0, before / after if after else 0.0))
+    if show:
+        print("        written:   " + json.dumps(written))
+        print("        optimized: " + json.dumps(j))
+    return same
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that the query optimizer leaves the demos' results unchanged")
+    parser.add_argument("--tier", type=int, default=TIER, help="data size,  as a multiple of the bundled data")
+    parser.add_argument("--demos", default=",".join(QUERIES), help="comma separated demos to check")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="number of times each query is timed")
+    parser.add_argument("--statistics", action="store_true", help="plan from the predicate statistics catalog")
+    parser.add_argument("--show", action="store_true", help="print each query as written and as optimized")
+    args = parser.parse_args()
+
+    local_dir = tempfile.mkdtemp(prefix="woql_optimizer_")
+    server, url = woqlStandin.start_standin(local_dir=local_dir)
+    wary.use_pooled_session(url)
+    if args.statistics:
+        wary.enable_statistics(None)
+    import woqlclient.woqlClient as woql
+    ok = True
+    try:
+        for name in args.demos.split(","):
+            directory, module, _ = DEMOS[name]
+            sys.path.insert(0, os.path.join(DEMOS_DIR, directory))
+            with contextlib.redirect_stdout(io.StringIO()):
+                demo = __import__(module)
+            client = woql.WOQLClient()
+            with wary.suppress_Terminus_diagnostics():
+                client.connect(url, KEY)
+            demo.client = client
+            load(name, demo, client, local_dir, args.tier)
+
+            print("[{} at {}x:  median of {} runs,  as written -> optimized]".format(name, args.tier, args.repeats))
+            estimate = wary.statistics_estimate(client)
+            for query, q in QUERIES[name](demo):
+                ok = check(query, q, client, args.repeats, args.show, estimate) and ok
+            sys.path.pop(0)
+            server.databases.clear()
+    finally:
+        server.shutdown()
+        shutil.rmtree(local_dir, ignore_errors=True)
+    print("[All rewrites preserved the results]" if ok else "[Some rewrites changed the results]")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,96 @@
+##
+##  Compare the per-query latency of the woqlclient library's own (unpooled) use of 'requests',
+##  against the pooled keep-alive session installed by woqlDiagnosis.use_pooled_session().
+##
+##  A small local HTTP/1.1 server stands in for TerminusDB,  so that the comparison measures
+##  the connection handling costs only,  and not the work done by the server.
+##
+##  Usage:
+##      python pool_latency.py [number of round trips]
+##
+
+import os
+import sys
+import json
+import time
+import threading
+import statistics
+import http.server
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import woqlDiagnosis as wary
+
+
+NR_ROUND_TRIPS          = 500               # number of queries timed,  for each of the two modes
+
+#
+#  A typical (small) query result,  as returned by the server
+#
+RESPONSE = json.dumps({"bindings": [{"Charity_Name": {"@type": "xsd:string", "@value": "Charity {}".format(i)}}
+                                    for i in range(20)]}).encode("utf-8")
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    '''
+        Answer every GET with the same canned query result,  keeping the connection alive
+    '''
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True              # else headers and body go as separate delayed packets
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def time_round_trips(get, url, n):
+    '''
+        Time n round trips to the stand-in server
+
+        :param get:     function, used to issue a GET request
+        :param url:     string, the stand-in server url
+        :param n:       integer, number of round trips
+        :return:        list of latencies,  in milliseconds
+    '''
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        get(url).json()
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies
+
+
+def report(label, latencies):
+    latencies = sorted(latencies)
+    print("{:<28} mean {:7.3f} ms   p50 {:7.3f} ms   p95 {:7.3f} ms".format(
+        label,
+        statistics.mean(latencies),
+        latencies[len(latencies) // 2],
+        latencies[int(len(latencies) * 0.95)]))
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else NR_ROUND_TRIPS
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:{}/".format(server.server_address[1])
+
+    print("[{:,} round trips to a local stand-in server at {}]".format(n, url))
+    before = time_round_trips(requests.get, url, n)
+
+    session = wary.use_pooled_session(url)
+    pooled = wary._PooledRequests(session)
+    after = time_round_trips(pooled.get, url, n)
+
+    report("Before (requests.get):", before)
+    report("After (pooled session):", after)
+    print("Speed up: {:.2f}x".format(statistics.mean(before) / statistics.mean(after)))
+    server.shutdown()
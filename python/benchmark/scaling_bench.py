@@ -0,0 +1,390 @@
+##
+##  Time the load and query paths of the four demos (charities,  family-tree,  family-tree-2 and shipping)
+##  across a series of data size tiers,  and write the results as JSON so that runs can be compared over time.
+##
+##  For each demo and tier,  the bundled data is scaled up by making renamed copies of it (so that a tier of
+##  10 has ten disjoint copies of the charities register,  of the family tree,  and of the port's voyages and
+##  dockings).  Then,  in a fresh process of its own:
+##      -   create_schema and load_csv (or,  for family-tree-2,  the per-person insert_people loop) are timed,
+##      -   each illustrative query is timed over a number of repeats (with the result cache off),
+##  and its throughput,  p50/p95/p99 latency and the peak RSS of the (client) process are recorded.
+##
+##  By default the demos talk to an in-process woqlStandin server,  run by this (parent) process so that it
+##  does not add to the peak RSS of the demos.  Give --server to use a real TerminusDB server instead:  the
+##  scaled .csv files are then written to --local-files,  which should be the server's TERMINUS_LOCAL directory.
+##
+##  Usage:
+##      python scaling_bench.py [--tiers 1,10,100] [--demos charities,shipping] [--repeats 20]
+##                              [--output bench.json] [--compare previous.json]
+##                              [--server http://localhost:6363 --local-files /path/to/TERMINUS_LOCAL]
+##
+
+import os
+import io
+import sys
+import csv
+import json
+import time
+import shutil
+import argparse
+import platform
+import datetime
+import resource
+import tempfile
+import contextlib
+import multiprocessing
+
+
+HERE                    = os.path.dirname(os.path.abspath(__file__))
+DEMOS_DIR               = os.path.join(HERE, "..")
+
+TIERS                   = (1, 10, 100, 1000)    # default data size tiers,  as multiples of the bundled data
+QUERY_REPEATS           = 20                    # number of times each query is timed,  in each tier
+LOAD_REPEATS            = 1                     # number of times the database is rebuilt and loaded,  in each tier
+BUSY_TRUSTEES           = 3                     # N,  for busy_trustees(N)
+NETWORK_SEED            = "Daingean Community Childcare Services Limited"   # seed charity for query_network
+KEY                     = "root"
+
+#
+#  Each demo:  its directory and module,  and the bundled .csv files which it loads (with,  for each file,
+#  the columns which are renamed in each copy)
+#
+DEMOS = {
+    "charities":    ("charities", "charities",
+                     [("raw/quads.csv", ("Appt", "Name", "Charity"), ("Registered Number",))]),
+    "family":       ("family-tree", "family",
+                     [("people.csv", ("Nr", "Name", "Parent1", "Parent2"), ())]),
+    "family2":      ("family-tree-2", "family2", []),
+    "shipping":     ("shipping", "shipping",
+                     [("voyages.csv", ("voyage", "ship"), ()),
+                      ("dockings.csv", ("docking", "ship"), ())]),
+}
+
+UNRENAMED               = ("unknown", "")       # values left alone in every copy,  eg an unknown parent
+NUMBER_STRIDE           = 1000000000            # added to a registered number,  for each copy
+
+
+#######################################################################################################################
+#
+#   Scaling the data
+#
+
+def renamed(value, copy):
+    '''
+        :param value:       string, a name or identifier from the bundled data
+        :param copy:        integer, the copy being made (the first,  0,  keeps the original names)
+        :return:            string, the name in that copy
+    '''
+    if copy == 0 or value in UNRENAMED:
+        return value
+    return "{}_{}".format(value, copy)
+
+
+def scaled_name(path, tier):
+    root, ext = os.path.splitext(os.path.basename(path))
+    return "{}_x{}{}".format(root, tier, ext)
+
+
+def scale_csv(src, dst, tier, names, numbers):
+    '''
+        Write tier copies of a .csv file,  one after another,  renaming the entities in each copy so
+        that they are distinct.  Rows are streamed,  so the scaled file is never held in memory.
+
+        :param src:         string, the bundled .csv file
+        :param dst:         string, the scaled .csv file to write
+        :param tier:        integer, number of copies
+        :param names:       tuple of column names whose values are renamed in each copy
+        :param numbers:     tuple of column names whose (integer) values are offset in each copy
+        :return:            integer, number of rows written
+    '''
+    with open(src, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        header = reader.fieldnames
+        rows = list(reader)
+    with open(dst, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, header)
+        writer.writeheader()
+        for copy in range(tier):
+            for row in rows:
+                row = dict(row)
+                for column in names:
+                    row[column] = renamed(row[column], copy)
+                for column in numbers:
+                    row[column] = str(int(row[column]) + copy * NUMBER_STRIDE)
+                writer.writerow(row)
+    return tier * len(rows)
+
+
+def scale_family(family, person, tier):
+    '''
+        Make tier renamed copies of the family2 in-memory dataset
+
+        :param family:      dict, of Person by name
+        :param person:      the Person class
+        :param tier:        integer, number of copies
+        :return:            dict, of Person by name
+    '''
+    scaled = {}
+    for copy in range(tier):
+        for name, p in family.items():
+            scaled[renamed(name, copy)] = person(p.sex, renamed(p.father, copy), renamed(p.mother, copy))
+    return scaled
+
+
+#######################################################################################################################
+#
+#   Measuring
+#
+
+def percentile(ordered, p):
+    '''
+        :param ordered:     sorted list of values
+        :param p:           float, the percentile wanted,  between 0 and 1
+        :return:            the (nearest rank) percentile
+    '''
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def peak_rss_mb():
+    '''
+        :return:            float, the peak resident set size of this process so far,  in MB
+    '''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3       # bytes on macOS,  KB elsewhere
+
+
+def summarise(demo, tier, phase, name, seconds, items, unit):
+    '''
+        Summarise the repeated timings of one load or query
+
+        :param seconds:     list of floats, the time taken by each repeat
+        :param items:       integer, number of rows (or queries) handled by each repeat
+        :param unit:        string, what the throughput counts
+        :return:            dict, one entry of the results
+    '''
+    ordered = sorted(seconds)
+    return {
+        "demo":         demo,
+        "tier":         tier,
+        "phase":        phase,
+        "name":         name,
+        "repeats":      len(seconds),
+        "seconds":      sum(seconds),
+        "throughput":   items * len(seconds) / sum(seconds) if sum(seconds) > 0 else None,
+        "unit":         unit,
+        "p50_ms":       percentile(ordered, 0.50) * 1000.0,
+        "p95_ms":       percentile(ordered, 0.95) * 1000.0,
+        "p99_ms":       percentile(ordered, 0.99) * 1000.0,
+        "peak_rss_mb":  peak_rss_mb(),
+    }
+
+
+def timed(f, *args):
+    start = time.perf_counter()
+    f(*args)
+    return time.perf_counter() - start
+
+
+#######################################################################################################################
+#
+#   Running one demo at one tier,  in a process of its own
+#
+
+def rebuild(demo, client):
+    '''
+        Drop and re-create the demo's database,  as its __main__ does
+    '''
+    with demo.wary.suppress_Terminus_diagnostics():
+        try:
+            client.deleteDatabase(demo.dbId)
+        except Exception:
+            pass
+        client.createDatabase(demo.dbId, demo.dbId, key=None, comment="scaling benchmark")
+
+
+def demo_queries(name, demo, repeats):
+    '''
+        :return:            list of (query name,  function,  list of argument tuples:  one per repeat)
+    '''
+    if name == "charities":
+        return [("list_all_charities",      demo.list_all_charities,    [()] * repeats),
+                ("busy_trustees",           demo.busy_trustees,         [(BUSY_TRUSTEES,)] * repeats),
+                ("query_network",           demo.query_network,         [(NETWORK_SEED,)] * repeats)]
+    if name in ("family", "family2"):
+        return [("list_grandmothers_of",    demo.list_grandmothers_of,  [()] * repeats),
+                ("list_grandmothers_of(Joe)", demo.list_grandmothers_of, [("Joe",)] * repeats)]
+    if name == "shipping":
+        #
+        #  As the animation does:  step through the day,  one frame after another
+        #
+        span = demo.END_DATETIME - demo.START_DATETIME
+        return [("query_status",            demo.query_status,
+                 [(demo.START_DATETIME + span * i / repeats,) for i in range(repeats)])]
+    return []
+
+
+def run_demo(name, tier, url, files, repeats, load_repeats, results):
+    '''
+        Time the loads and queries of one demo at one tier.  Runs in a fresh process,  so that the
+        peak RSS measured is that of this demo and tier alone.
+
+        :param name:            string, the demo
+        :param tier:            integer, the data size tier
+        :param url:             string, the server url
+        :param files:           list of (scaled .csv file name,  number of rows),  as the server sees them
+        :param repeats:         integer, number of times each query is timed
+        :param load_repeats:    integer, number of times the database is rebuilt and loaded
+        :param results:         queue,  on which the list of results is put
+    '''
+    directory, module, _ = DEMOS[name]
+    sys.path.insert(0, os.path.join(DEMOS_DIR, directory))
+    with contextlib.redirect_stdout(io.StringIO()):             # the demos narrate their progress
+        demo = __import__(module)
+    import woqlclient.woqlClient as woql
+
+    out = []
+    demo.wary.use_pooled_session(url)
+    client = woql.WOQLClient()
+    with demo.wary.suppress_Terminus_diagnostics():
+        client.connect(url, KEY)
+    demo.client = client
+    demo.server_url = url
+    demo.dburl = url + "/" + demo.dbId
+    start_rss = peak_rss_mb()                                   # after the imports,  before any data
+
+    people = scale_family(demo.Family, demo.Person, tier) if name == "family2" else None
+    schema = []
+    loads = [[]] if people is not None else [[] for _ in files]
+    for _ in range(load_repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            rebuild(demo, client)
+            schema.append(timed(demo.create_schema, client))
+            if people is not None:
+                loads[0].append(timed(demo.insert_people, client, people))
+            elif name == "shipping":
+                for (csv_file, _), seconds, voyages in zip(files, loads, (True, False)):
+                    seconds.append(timed(demo.load_csv, client, csv_file, voyages))
+            else:
+                for (csv_file, _), seconds in zip(files, loads):
+                    seconds.append(timed(demo.load_csv, client, csv_file))
+    out.append(summarise(name, tier, "load", "create_schema", schema, 1, "schemas/s"))
+    if people is not None:
+        out.append(summarise(name, tier, "load", "insert_people", loads[0], len(people), "rows/s"))
+    else:
+        for (csv_file, rows), seconds in zip(files, loads):
+            out.append(summarise(name, tier, "load", "load_csv({})".format(csv_file), seconds, rows, "rows/s"))
+
+    for query, f, calls in demo_queries(name, demo, repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds = [timed(f, *args) for args in calls]
+        out.append(summarise(name, tier, "query", query, seconds, 1, "queries/s"))
+    for entry in out:
+        entry["start_rss_mb"] = start_rss
+    results.put(out)
+
+
+#######################################################################################################################
+#
+#   Reporting
+#
+
+def report(entry):
+    print("    {:<8} {:<34} {:>12} {:<10} p50 {:>10.2f} ms  p95 {:>10.2f} ms  p99 {:>10.2f} ms  {:>8.1f} MB".format(
+        entry["phase"], entry["name"],
+        "-" if entry["throughput"] is None else "{:,.1f}".format(entry["throughput"]), entry["unit"],
+        entry["p50_ms"], entry["p95_ms"], entry["p99_ms"], entry["peak_rss_mb"]))
+
+
+def compare(previous, results):
+    '''
+        Print the change in p50 latency of each load and query,  against those of a previous run
+    '''
+    before = {(e["demo"], e["tier"], e["phase"], e["name"]): e for e in previous["results"]}
+    print("\n[Compared with the run of {}]".format(previous["started"]))
+    for e in results:
+        old = before.get((e["demo"], e["tier"], e["phase"], e["name"]))
+        if old is None or not e["p50_ms"]:
+            continue
+        print("    {:<9} {:>5}x  {:<34} p50 {:>10.2f} ms -> {:>10.2f} ms   ({:.2f}x)".format(
+            e["demo"], e["tier"], e["name"], old["p50_ms"], e["p50_ms"], old["p50_ms"] / e["p50_ms"]))
+
+
+#######################################################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the load and query paths of the demos across data size tiers")
+    parser.add_argument("--tiers", default=",".join(str(t) for t in TIERS), help="comma separated data size tiers")
+    parser.add_argument("--demos", default=",".join(DEMOS), help="comma separated demos to run")
+    parser.add_argument("--repeats", type=int, default=QUERY_REPEATS, help="number of times each query is timed")
+    parser.add_argument("--load-repeats", type=int, default=LOAD_REPEATS, help="number of times each load is timed")
+    parser.add_argument("--server", help="url of a TerminusDB server (default: an in-process stand-in)")
+    parser.add_argument("--local-files", help="the server's TERMINUS_LOCAL directory,  for the scaled .csv files")
+    parser.add_argument("--output", default="bench_{}.json".format(datetime.datetime.now().strftime("%Y%m%d_%H%M%S")),
+                        help="file to which the results are written")
+    parser.add_argument("--compare", help="results of a previous run to compare against")
+    args = parser.parse_args()
+
+    tiers = [int(t) for t in args.tiers.split(",")]
+    demos = args.demos.split(",")
+    if args.server and not args.local_files:
+        parser.error("--server needs --local-files,  so that the server can read the scaled .csv files")
+
+    local_dir = args.local_files or tempfile.mkdtemp(prefix="woql_bench_")
+    server = None
+    url = args.server
+    if url is None:
+        sys.path.insert(0, HERE)
+        import woqlStandin
+        server, url = woqlStandin.start_standin(local_dir=local_dir)
+
+    run = {
+        "started":      datetime.datetime.now().isoformat(timespec="seconds"),
+        "python":       platform.python_version(),
+        "platform":     platform.platform(),
+        "server":       args.server or "stand-in",
+        "tiers":        tiers,
+        "query_repeats": args.repeats,
+        "load_repeats": args.load_repeats,
+        "results":      [],
+    }
+    spawn = multiprocessing.get_context("spawn")
+    try:
+        for tier in tiers:
+            for name in demos:
+                directory, _, sources = DEMOS[name]
+                files = []
+                for path, names, numbers in sources:
+                    scaled = scaled_name(path, tier)
+                    rows = scale_csv(os.path.join(DEMOS_DIR, directory, path), os.path.join(local_dir, scaled),
+                                     tier, names, numbers)
+                    files.append((scaled, rows))
+
+                print("[{} at {}x..]".format(name, tier))
+                results = spawn.Queue()
+                worker = spawn.Process(target=run_demo,
+                                       args=(name, tier, url, files, args.repeats, args.load_repeats, results))
+                worker.start()
+                worker.join()
+                if worker.exitcode != 0:
+                    print("    [Failed,  exit code {}]".format(worker.exitcode))
+                    continue
+                out = results.get()
+                for entry in out:
+                    report(entry)
+                run["results"].extend(out)
+
+                if server is not None:
+                    server.databases.clear()                # release the stand-in's memory before the next one
+    finally:
+        if server is not None:
+            server.shutdown()
+        if not args.local_files:
+            shutil.rmtree(local_dir, ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump(run, f, indent=2)
+    print("[Results written to '{}']".format(args.output))
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), run["results"])
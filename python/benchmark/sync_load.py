@@ -0,0 +1,143 @@
+##
+##  Time a start up which syncs the database with its .csv files (see woqlDiagnosis.sync_csv()) against one which
+##  rebuilds it from scratch:  with the data unchanged since the last run,  and with a fraction of its rows changed,
+##  removed or added.  After each sync,  the database is checked against one rebuilt from the same data.
+##
+##  The bundled data is scaled up to the tier as by scaling_bench.py,  and loaded into an in-process woqlStandin
+##  server.
+##
+##  Usage:
+##      python sync_load.py [--demo charities] [--tier 10] [--changed 0.01]
+##
+
+import os
+import io
+import sys
+import csv
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+HERE                    = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+LOCAL_DIR               = tempfile.mkdtemp(prefix="woql_sync_")
+os.environ["TERMINUS_LOCAL"] = LOCAL_DIR        # where the demos' sync_csv reads the .csv files
+
+import woqlStandin
+import woqlDiagnosis as wary
+from woqlclient import WOQLQuery
+from scaling_bench import DEMOS, DEMOS_DIR, KEY, scale_csv, scaled_name, rebuild
+
+
+TIER                    = 10                    # data size,  as a multiple of the bundled data
+CHANGED                 = 0.01                  # fraction of the rows changed,  and of those removed and added
+SEED                    = 1
+
+
+def change_rows(path, fraction, key):
+    '''
+        Change,  remove and add a fraction of the rows of a .csv file each:  a change alters the last column of
+        a row (or its start,  for the shipping data),  and an added row is a copy of another under a new key
+    '''
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.reader(f))
+    header, body = rows[0], rows[1:]
+    n = max(1, int(len(body) * fraction))
+    random.shuffle(body)
+    body = body[n:]
+    column = header.index("start") if "start" in header else len(header) - 1
+    for row in body[:n]:
+        row[column] = "2020-04-30 12:00" if header[column] == "start" else row[column] + "_changed"
+    k = header.index(key)
+    body += [row[:k] + [row[k] + "_added"] + row[k + 1:] for row in body[n:2 * n]]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(body)
+
+
+def triples(client):
+    '''
+        :return:    sorted list of every triple in the database
+    '''
+    result = wary.run_query(WOQLQuery().triple("v:S", "v:P", "v:O"), client, use_cache=False)
+    return sorted(wary.canonical_json(b) for b in result["bindings"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time syncing a demo's database against rebuilding it")
+    parser.add_argument("--demo", default="charities", choices=[d for d in DEMOS if DEMOS[d][2]])
+    parser.add_argument("--tier", type=int, default=TIER, help="data size,  as a multiple of the bundled data")
+    parser.add_argument("--changed", type=float, default=CHANGED,
+                        help="fraction of the rows changed,  and of those removed and added")
+    args = parser.parse_args()
+    random.seed(SEED)
+
+    local_dir = LOCAL_DIR
+    server, url = woqlStandin.start_standin(local_dir=local_dir)
+    wary.use_pooled_session(url)
+    import woqlclient.woqlClient as woql
+
+    directory, module, sources = DEMOS[args.demo]
+    sys.path.insert(0, os.path.join(DEMOS_DIR, directory))
+    with contextlib.redirect_stdout(io.StringIO()):
+        demo = __import__(module)
+    demo.MANIFEST_FILE = os.path.join(local_dir, "manifest.json")
+
+    def connected():
+        '''
+            :return:    a client of its own,  connected to the server,  with the demo's database chosen:  as each
+                        start up of a demo makes (see woqlDiagnosis.build_database())
+        '''
+        client = woql.WOQLClient()
+        with wary.suppress_Terminus_diagnostics():
+            client.connect(url, KEY)
+        client.conConfig.setDB(demo.dbId)
+        demo.client = client
+        return client
+
+    files = []
+    for path, names, numbers in sources:
+        files.append(scaled_name(path, args.tier))
+        scale_csv(os.path.join(DEMOS_DIR, directory, path), os.path.join(local_dir, files[-1]), args.tier, names,
+                  numbers)
+    keys = {"charities": ("Appt",), "family": ("Nr",), "shipping": ("voyage", "docking")}[args.demo]
+
+    def load(sync):
+        start = time.perf_counter()
+        client = connected()
+        with contextlib.redirect_stdout(io.StringIO()):
+            if not sync:
+                rebuild(demo, client)
+                demo.create_schema(client)
+            for scaled, voyages in zip(files, (True, False)):
+                load_csv = demo.sync_csv if sync else demo.load_csv
+                load_csv(*((client, scaled, voyages) if args.demo == "shipping" else (client, scaled)),
+                         **({} if sync else {"chunk_rows": 0, "client_side": False}))
+        return time.perf_counter() - start, client
+
+    print("[{} at {}x,  in a stand-in server]".format(args.demo, args.tier))
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            client = connected()
+            rebuild(demo, client)
+            demo.create_schema(client)
+        print("    {:<40} {:8.2f} s".format("first sync (loads the whole file)", load(True)[0]))
+        print("    {:<40} {:8.2f} s".format("sync,  with nothing changed", load(True)[0]))
+        for scaled, key in zip(files, keys):
+            change_rows(os.path.join(local_dir, scaled), args.changed, key)
+        seconds, client = load(True)
+        synced = triples(client)
+        print("    {:<40} {:8.2f} s".format("sync,  with {:.1%} of rows changed".format(args.changed), seconds))
+        seconds, client = load(False)
+        print("    {:<40} {:8.2f} s".format("rebuild from scratch", seconds))
+        print("[The synced database is {} the rebuilt one]".format("the same as" if synced == triples(client)
+                                                                      else "DIFFERENT from"))
+    finally:
+        server.shutdown()
+        shutil.rmtree(local_dir, ignore_errors=True)
@@ -0,0 +1,356 @@
+##
+##  Deterministic,  seedable generators of synthetic data for the demos,  at any scale.
+##
+##  Each writes .csv files in exactly the column layout which the demo's load_csv expects:
+##      charities:      Appt, Name, Charity, Registered Number, Date
+##      shipping:       voyage, start, end, ship, route         and     docking, start, end, berth, ship
+##      family tree:    Nr, Name, Sex, Parent1, Parent2
+##
+##  Rows are written as they are generated,  holding at most one generation (of a family tree) in memory,
+##  so multi-GB files can be made.  The same parameters and seed always give the same files.
+##
+##  Usage:
+##      python synthetic_data.py charities [--charities 373] [--trustees 2362] [--degree zipf] [--out quads.csv]
+##      python synthetic_data.py shipping [--ships 16] [--voyages 60] [--days 2] [--out-dir .]
+##      python synthetic_data.py family [--generations 4] [--fanout 2] [--couples 2] [--out people.csv]
+##
+##  or,  in-process:
+##      synthetic_data.write_charities("quads_big.csv", charities=100000, trustees=600000, seed=7)
+##
+
+import os
+import csv
+import random
+import bisect
+import argparse
+import datetime
+import itertools
+import math
+
+
+SEED                    = 1
+
+#
+#  The defaults reproduce the size and shape of the bundled data
+#
+CHARITIES               = 373               # number of charities
+TRUSTEES                = 2362              # number of trustees
+DEGREE                  = "zipf"            # distribution of the number of charities to which a trustee is appointed
+DEGREE_EXPONENT         = 3.5               # exponent of the zipf distribution (larger:  fewer busy trustees)
+DEGREE_MEAN             = 1.05              # mean of the poisson distribution (before adding 1)
+MAX_DEGREE              = 21                # most charities to which one trustee is appointed
+FIRST_APPOINTMENT       = datetime.date(1950, 1, 1)
+LAST_APPOINTMENT        = datetime.date(2020, 2, 13)
+FIRST_REGISTERED_NUMBER = 20000000
+
+SHIPS                   = 16                # number of ships
+VOYAGES                 = 60                # number of voyages (in and out:  two per visit to the port)
+START_DATETIME          = datetime.datetime(2020, 4, 28, 15, 0)
+DAYS                    = 2                 # length of the time window,  in days
+TRANSIT_MINUTES         = 60                # time taken by a voyage across the map (as for shipping.TRANSIT_TIME)
+MIN_DWELL_MINUTES       = 60                # least time spent at a berth
+
+GENERATIONS             = 4                 # number of generations in the family tree
+FANOUT                  = 2                 # number of children of each couple
+COUPLES                 = 2                 # number of couples in the first generation
+
+#
+#  Each route key in shipping.RoutesX,  and the berth at which ships using it dock (from shipping.py)
+#
+LINES = {"1": "B3", "2": "B4", "3": "B5", "4": "B6", "St": "B1", "If": "B2"}
+
+CHARITY_PLACES          = ("Dublin", "Cork", "Galway", "Limerick", "Waterford", "Kilkenny", "Sligo", "Athlone",
+                           "Wexford", "Tralee", "Ennis", "Drogheda", "Dundalk", "Navan", "Carlow", "Clonmel")
+CHARITY_KINDS           = ("Community", "Parish", "Sports", "Youth", "Heritage", "Arts", "Family", "Hospice",
+                           "Childcare", "Scouting", "Housing", "Education", "Animal", "Rescue", "Music", "Care")
+CHARITY_FORMS           = ("Association", "Trust", "Foundation", "Services Limited", "Society", "Group",
+                           "Fellowship", "Centre", "Club", "Project")
+SHIP_NAMES              = ("Opaline", "Epsilon", "SeaTruck Power", "Stena Adventurer", "Norbank", "Ulysses",
+                           "WB Yeats", "Stena Estrid", "Thun Gratitude", "SeaTruck Progress", "Clipper Point",
+                           "SeaTruck Pace", "Clipper Pennant", "Isle of Inishmore", "Celtic Link", "Mersey Viking")
+MALE_NAMES              = ("Joe", "Seamus", "Pat", "Padraig", "Liam", "Sean", "Cian", "Eoin", "Niall", "Conor")
+FEMALE_NAMES            = ("Mary", "Siobhan", "Cliona", "Roisin", "Aoife", "Niamh", "Ciara", "Orla", "Sinead", "Una")
+
+
+#######################################################################################################################
+#
+#   Charities
+#
+
+def charity_name(i):
+    '''
+        :param i:       integer, charity number (from 0)
+        :return:        string, a distinct name for it
+    '''
+    place, rest = divmod(i, len(CHARITY_KINDS) * len(CHARITY_FORMS))
+    kind, form = divmod(rest, len(CHARITY_FORMS))
+    name = "{} {} {}".format(CHARITY_PLACES[place % len(CHARITY_PLACES)], CHARITY_KINDS[kind], CHARITY_FORMS[form])
+    series = place // len(CHARITY_PLACES)
+    return name if series == 0 else "{} {}".format(name, series + 1)
+
+
+def degree_sampler(rng, distribution=DEGREE, exponent=DEGREE_EXPONENT, mean=DEGREE_MEAN, max_degree=MAX_DEGREE):
+    '''
+        Make a function which draws the number of charities to which a trustee is appointed
+
+        :param rng:             random.Random
+        :param distribution:    string, "zipf" (P(d) proportional to d ** -exponent),  "poisson" (1 + poisson(mean))
+                                or "fixed" (always max_degree)
+        :param exponent:        float, of the zipf distribution
+        :param mean:            float, of the poisson distribution
+        :param max_degree:      integer, the largest degree drawn
+        :return:                function of no arguments,  returning an integer between 1 and max_degree
+    '''
+    if distribution == "fixed":
+        return lambda: max_degree
+    if distribution == "zipf":
+        cumulative = list(itertools.accumulate(d ** -exponent for d in range(1, max_degree + 1)))
+        return lambda: 1 + bisect.bisect_left(cumulative, rng.random() * cumulative[-1])
+    if distribution == "poisson":
+        def poisson():
+            d, p = 0, rng.random()
+            threshold = math.exp(-mean)
+            while p > threshold:
+                d += 1
+                p *= rng.random()
+            return min(1 + d, max_degree)
+        return poisson
+    raise ValueError("Unknown degree distribution '{}'".format(distribution))
+
+
+def charity_rows(charities=CHARITIES, trustees=TRUSTEES, distribution=DEGREE, exponent=DEGREE_EXPONENT,
+                 mean=DEGREE_MEAN, max_degree=MAX_DEGREE, seed=SEED):
+    '''
+        Generate the appointments of trustees to charities,  in the layout of charities/raw/quads.csv
+
+        :param charities:       integer, number of charities
+        :param trustees:        integer, number of trustees
+        :param distribution:    string, distribution of the number of appointments of each trustee:  see degree_sampler
+        :param exponent:        float, of the zipf distribution
+        :param mean:            float, of the poisson distribution
+        :param max_degree:      integer, most charities to which one trustee is appointed
+        :param seed:            integer, random seed
+        :return:                generator of rows (Appt, Name, Charity, Registered Number, Date)
+    '''
+    rng = random.Random(seed)
+    degree = degree_sampler(rng, distribution, exponent, mean, min(max_degree, charities))
+    days = (LAST_APPOINTMENT - FIRST_APPOINTMENT).days
+    appt = 0
+    for _ in range(trustees):
+        trustee = "T{}".format(rng.getrandbits(63))                 # obfuscated,  as in the bundled data
+        for i in rng.sample(range(charities), degree()):
+            appt += 1
+            yield ("A{}".format(appt), trustee, charity_name(i), FIRST_REGISTERED_NUMBER + i,
+                   (FIRST_APPOINTMENT + datetime.timedelta(days=rng.randrange(days))).isoformat())
+
+
+def write_charities(path, **parameters):
+    '''
+        Write a synthetic charities .csv file
+
+        :param path:            string, file to write
+        :param parameters:      see charity_rows
+        :return:                integer, number of rows written
+    '''
+    return write_csv(path, ("Appt", "Name", "Charity", "Registered Number", "Date"), charity_rows(**parameters))
+
+
+#######################################################################################################################
+#
+#   Shipping
+#
+#   Each ship works one line (eg "St",  the Stena ferries):  it sails in on route In<line>,  docks at the line's
+#   berth,  sails out on route Out<line>,  and is then away at sea until its next visit.  The visits of each ship
+#   are spread evenly across the time window,  with some random jitter.
+#
+
+def ship_name(i):
+    return SHIP_NAMES[i] if i < len(SHIP_NAMES) else "{} {}".format(SHIP_NAMES[i % len(SHIP_NAMES)], i // len(SHIP_NAMES) + 1)
+
+
+def shipping_rows(ships=SHIPS, voyages=VOYAGES, start=START_DATETIME, days=DAYS, seed=SEED):
+    '''
+        Generate the voyages and dockings of ships in the port,  in the layout of shipping/voyages.csv and
+        shipping/dockings.csv
+
+        :param ships:           integer, number of ships
+        :param voyages:         integer, number of voyages (each visit to the port is two voyages,  in and out)
+        :param start:           datetime, start of the time window
+        :param days:            float, length of the time window,  in days
+        :param seed:            integer, random seed
+        :return:                generator of ("voyage",  row) and ("docking",  row) pairs
+    '''
+    rng = random.Random(seed)
+    lines = sorted(LINES)
+    window = int(days * 24 * 60)
+    visits = (voyages + 1) // 2
+    voyage = docking = 0
+    for ship in range(ships):
+        nr_visits = visits // ships + (1 if ship < visits % ships else 0)
+        if nr_visits == 0:
+            continue
+        period = window // nr_visits
+        if period < 2 * TRANSIT_MINUTES + MIN_DWELL_MINUTES:
+            raise ValueError("{:,} visits by each ship do not fit in {} days:  add ships or days".format(nr_visits, days))
+        name = ship_name(ship)
+        line = lines[rng.randrange(len(lines))]
+        for visit in range(nr_visits):
+            slack = period - 2 * TRANSIT_MINUTES - MIN_DWELL_MINUTES
+            arrive = visit * period + rng.randrange(slack // 2 + 1)
+            dwell = MIN_DWELL_MINUTES + rng.randrange(slack // 2 + 1)
+            times = [start + datetime.timedelta(minutes=m) for m in
+                     (arrive, arrive + TRANSIT_MINUTES, arrive + TRANSIT_MINUTES + dwell,
+                      arrive + 2 * TRANSIT_MINUTES + dwell)]
+            times = [t.strftime("%Y-%m-%d %H:%M") for t in times]
+            voyage += 1
+            yield "voyage", ("v{}".format(voyage), times[0], times[1], name, "In" + line)
+            docking += 1
+            yield "docking", ("d{}".format(docking), times[1], times[2], LINES[line], name)
+            if voyage < voyages:
+                voyage += 1
+                yield "voyage", ("v{}".format(voyage), times[2], times[3], name, "Out" + line)
+
+
+def write_shipping(voyages_path, dockings_path, **parameters):
+    '''
+        Write synthetic voyages and dockings .csv files
+
+        :param voyages_path:    string, voyages file to write
+        :param dockings_path:   string, dockings file to write
+        :param parameters:      see shipping_rows
+        :return:                integers, number of voyages and of dockings written
+    '''
+    counts = {"voyage": 0, "docking": 0}
+    with open(voyages_path, "w", newline="", encoding="utf-8") as vf, \
+            open(dockings_path, "w", newline="", encoding="utf-8") as df:
+        writers = {"voyage": csv.writer(vf), "docking": csv.writer(df)}
+        writers["voyage"].writerow(("voyage", "start", "end", "ship", "route"))
+        writers["docking"].writerow(("docking", "start", "end", "berth", "ship"))
+        for kind, row in shipping_rows(**parameters):
+            writers[kind].writerow(row)
+            counts[kind] += 1
+    return counts["voyage"], counts["docking"]
+
+
+#######################################################################################################################
+#
+#   Family trees
+#
+#   The first generation is made of couples with unknown parents.  Each couple has fanout children,  and the
+#   children of each generation are paired off at random (a son of one family with a daughter of another)
+#   to make the couples of the next.
+#
+
+def person_name(sex, i):
+    names = MALE_NAMES if sex == "M" else FEMALE_NAMES
+    return "{}_{}".format(names[i % len(names)], i)
+
+
+def family_rows(generations=GENERATIONS, fanout=FANOUT, couples=COUPLES, seed=SEED):
+    '''
+        Generate a family tree,  in the layout of family-tree/people.csv
+
+        :param generations:     integer, number of generations
+        :param fanout:          integer, number of children of each couple
+        :param couples:         integer, number of couples in the first generation
+        :param seed:            integer, random seed
+        :return:                generator of rows (Nr, Name, Sex, Parent1, Parent2)
+    '''
+    rng = random.Random(seed)
+    nr = itertools.count(1)
+    pairs = []
+    for _ in range(couples):
+        couple = []
+        for sex in ("M", "F"):
+            i = next(nr)
+            couple.append(person_name(sex, i))
+            yield ("P{}".format(i), couple[-1], sex, "unknown", "unknown")
+        pairs.append(tuple(couple))
+
+    for _ in range(1, generations):
+        sons, daughters = [], []
+        for father, mother in pairs:
+            for _ in range(fanout):
+                i = next(nr)
+                sex = "M" if rng.random() < 0.5 else "F"
+                child = person_name(sex, i)
+                (sons if sex == "M" else daughters).append(child)
+                yield ("P{}".format(i), child, sex, father, mother)
+        rng.shuffle(daughters)
+        pairs = list(zip(sons, daughters))
+        if not pairs:
+            break
+
+
+def write_family(path, **parameters):
+    '''
+        Write a synthetic family tree .csv file
+
+        :param path:            string, file to write
+        :param parameters:      see family_rows
+        :return:                integer, number of rows written
+    '''
+    return write_csv(path, ("Nr", "Name", "Sex", "Parent1", "Parent2"), family_rows(**parameters))
+
+
+#######################################################################################################################
+
+def write_csv(path, header, rows):
+    '''
+        Stream rows to a .csv file
+
+        :param path:        string, file to write
+        :param header:      tuple of column names
+        :param rows:        iterable of rows
+        :return:            integer, number of rows written
+    '''
+    n = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            n += 1
+    return n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic data for the demos")
+    parser.add_argument("--seed", type=int, default=SEED, help="random seed")
+    demos = parser.add_subparsers(dest="demo", required=True)
+
+    p = demos.add_parser("charities", help="appointments of trustees to charities")
+    p.add_argument("--charities", type=int, default=CHARITIES, help="number of charities")
+    p.add_argument("--trustees", type=int, default=TRUSTEES, help="number of trustees")
+    p.add_argument("--degree", choices=("zipf", "poisson", "fixed"), default=DEGREE,
+                   help="distribution of the number of appointments of each trustee")
+    p.add_argument("--exponent", type=float, default=DEGREE_EXPONENT, help="exponent of the zipf distribution")
+    p.add_argument("--mean", type=float, default=DEGREE_MEAN, help="mean of the poisson distribution")
+    p.add_argument("--max-degree", type=int, default=MAX_DEGREE, help="most appointments of one trustee")
+    p.add_argument("--out", default="quads.csv", help="file to write")
+
+    p = demos.add_parser("shipping", help="voyages and dockings of ships in the port")
+    p.add_argument("--ships", type=int, default=SHIPS, help="number of ships")
+    p.add_argument("--voyages", type=int, default=VOYAGES, help="number of voyages")
+    p.add_argument("--days", type=float, default=DAYS, help="length of the time window,  in days")
+    p.add_argument("--out-dir", default=".", help="directory for voyages.csv and dockings.csv")
+
+    p = demos.add_parser("family", help="a family tree")
+    p.add_argument("--generations", type=int, default=GENERATIONS, help="number of generations")
+    p.add_argument("--fanout", type=int, default=FANOUT, help="number of children of each couple")
+    p.add_argument("--couples", type=int, default=COUPLES, help="number of couples in the first generation")
+    p.add_argument("--out", default="people.csv", help="file to write")
+    args = parser.parse_args()
+
+    if args.demo == "charities":
+        n = write_charities(args.out, charities=args.charities, trustees=args.trustees, distribution=args.degree,
+                            exponent=args.exponent, mean=args.mean, max_degree=args.max_degree, seed=args.seed)
+        print("[{:,} appointments written to '{}']".format(n, args.out))
+    elif args.demo == "shipping":
+        nv, nd = write_shipping(os.path.join(args.out_dir, "voyages.csv"), os.path.join(args.out_dir, "dockings.csv"),
+                                ships=args.ships, voyages=args.voyages, days=args.days, seed=args.seed)
+        print("[{:,} voyages and {:,} dockings written to '{}']".format(nv, nd, args.out_dir))
+    else:
+        n = write_family(args.out, generations=args.generations, fanout=args.fanout, couples=args.couples,
+                         seed=args.seed)
+        print("[{:,} people written to '{}']".format(n, args.out))
@@ -0,0 +1,70 @@
+##
+##  Compare woqlclient's woqlDataframe.query_to_df() against the typed,  column-at-a-time
+##  woqlDiagnosis.bindings_to_df(),  on a synthetic result shaped like the bindings of the
+##  shipping demo's query_status() (ship, start, end, route or berth).
+##
+##  Usage:
+##      python typed_frames.py [number of bindings ...]
+##
+
+import os
+import sys
+import time
+
+import woqlclient.woqlDataframe as wdf
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import woqlDiagnosis as wary
+
+
+SIZES                   = (10000, 1000000)  # default numbers of bindings
+
+XSD                     = "http://www.w3.org/2001/XMLSchema#"
+
+
+def literal(ty, value):
+    return {"@type": XSD + ty, "@value": value}
+
+
+def make_result(n):
+    '''
+        Build a query result with n bindings
+
+        :param n:       integer, number of bindings
+        :return:        dict, as returned by the server
+    '''
+    bindings = []
+    for i in range(n):
+        day, hour = divmod(i, 24)
+        underway = i % 3 != 0
+        bindings.append({
+            "Ship":     literal("string", "Ship {}".format(i % 40)),
+            "Start":    literal("dateTime", "2020-{:02d}-{:02d}T{:02d}:00:00".format(1 + day // 28 % 12, 1 + day % 28, hour)),
+            "End":      literal("dateTime", "2020-{:02d}-{:02d}T{:02d}:30:00".format(1 + day // 28 % 12, 1 + day % 28, hour)),
+            "Route":    literal("string", "Route {}".format(i % 12) if underway else "unknown"),
+            "Berth":    literal("string", "unknown" if underway else "Berth {}".format(i % 8)),
+            "Load":     literal("decimal", i * 0.5),
+        })
+    return {"bindings": bindings}
+
+
+def time_call(f, result):
+    start = time.perf_counter()
+    df = f(result)
+    return time.perf_counter() - start, df
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    types = {"Start": "dateTime", "End": "dateTime", "Load": "decimal"}
+
+    for n in sizes:
+        result = make_result(n)
+        before, old = time_call(wdf.query_to_df, result)
+        after, new = time_call(lambda r: wary.bindings_to_df(r, types), result)
+        print("[{:,} bindings]".format(n))
+        print("    Before (query_to_df):     {:9.3f} s   {:8.1f} MB".format(
+            before, old.memory_usage(deep=True).sum() / 1e6))
+        print("    After (bindings_to_df):   {:9.3f} s   {:8.1f} MB".format(
+            after, new.memory_usage(deep=True).sum() / 1e6))
+        print("    Speed up: {:.1f}x".format(before / after))
@@ -0,0 +1,82 @@
+##
+##  Time a demo's start up (its build_database()) when the database is rebuilt from scratch,  against a warm start
+##  which finds the database already built from the same schema and data (see woqlDiagnosis.fingerprint()) and keeps
+##  it,  and against a start after a row of the data has changed.
+##
+##  The bundled data is scaled up to the tier as by scaling_bench.py,  and loaded into an in-process woqlStandin
+##  server.
+##
+##  Usage:
+##      python warm_start.py [--demo charities] [--tier 10]
+##
+
+import os
+import io
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+HERE                    = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+LOCAL_DIR               = tempfile.mkdtemp(prefix="woql_warm_")
+os.environ["TERMINUS_LOCAL"] = LOCAL_DIR        # where the demos' fingerprints read the .csv files
+
+import woqlStandin
+import woqlDiagnosis as wary
+from scaling_bench import DEMOS, DEMOS_DIR, KEY, scale_csv, scaled_name
+
+
+TIER                    = 10                    # data size,  as a multiple of the bundled data
+CSV_NAMES               = {"charities": ("CSV",), "family": ("CSV",), "shipping": ("VOYAGES_CSV", "DOCKINGS_CSV")}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time a demo's warm start against rebuilding its database")
+    parser.add_argument("--demo", default="charities", choices=list(CSV_NAMES))
+    parser.add_argument("--tier", type=int, default=TIER, help="data size,  as a multiple of the bundled data")
+    args = parser.parse_args()
+
+    local_dir = LOCAL_DIR
+    server, url = woqlStandin.start_standin(local_dir=local_dir)
+    wary.use_pooled_session(url)
+    import woqlclient.woqlClient as woql
+
+    directory, module, sources = DEMOS[args.demo]
+    sys.path.insert(0, os.path.join(DEMOS_DIR, directory))
+    with contextlib.redirect_stdout(io.StringIO()):
+        demo = __import__(module)
+    demo.MANIFEST_FILE = os.path.join(local_dir, "manifest.json")
+    for name, (path, names, numbers) in zip(CSV_NAMES[args.demo], sources):
+        setattr(demo, name, scaled_name(path, args.tier))
+        scale_csv(os.path.join(DEMOS_DIR, directory, path), os.path.join(local_dir, getattr(demo, name)),
+                  args.tier, names, numbers)
+
+    def start(force_reload=False):
+        begin = time.perf_counter()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            client = woql.WOQLClient()          # a client of its own,  connected to the server only,  as a demo's
+            with wary.suppress_Terminus_diagnostics():
+                client.connect(url, KEY)
+            demo.build_database(client, force_reload)
+        said = output.getvalue()
+        return time.perf_counter() - begin, ("kept" if "keeping it" in said else
+                                             "synced" if "[Syncing" in said else "rebuilt")
+
+    print("[{} at {}x,  in a stand-in server]".format(args.demo, args.tier))
+    try:
+        print("    {:<36} {:8.2f} s   ({})".format("first start", *start()))
+        print("    {:<36} {:8.2f} s   ({})".format("warm start", *start()))
+        print("    {:<36} {:8.2f} s   ({})".format("--force-reload", *start(True)))
+        with open(os.path.join(local_dir, getattr(demo, CSV_NAMES[args.demo][-1])), "a") as f:
+            f.write("\n")                       # the same rows,  but not the same file
+        print("    {:<36} {:8.2f} s   ({})".format("start,  after the data changed", *start()))
+        print("    {:<36} {:8.2f} s   ({})".format("warm start", *start()))
+    finally:
+        server.shutdown()
+        shutil.rmtree(local_dir, ignore_errors=True)
@@ -0,0 +1,958 @@
+##
+##  An in-process stand-in for the TerminusDB server,  so that the demos (and the benchmarks) can run
+##  without a live server at localhost:6363.
+##
+##  It holds each database as an in-memory triple store,  and evaluates the woql which the demos use:
+##  triple,  and,  or,  opt,  not,  select,  less,  greater,  eq,  cast,  idgen,  insert / add_triple,
+##  delete_triple,  when,  and get (over a .csv file,  either local or remote),  plus the add_quads
+##  made by doctype() to build a schema.  It is served over the same HTTP API as the one which
+##  WOQLClient.connect(),  createDatabase(),  deleteDatabase() and query() talk to.
+##
+##  It is not a reimplementation of TerminusDB:  there is no schema checking,  no access control,
+##  no commit history,  and query clauses are simply evaluated in the order given.
+##
+##  Usage:
+##      python woqlStandin.py [--port 6363] [--local directory for /app/local_files/]
+##
+##  or,  in-process:
+##      server, url = woqlStandin.start_standin()
+##
+
+import os
+import csv
+import json
+import argparse
+import threading
+import http.server
+import urllib.parse
+import email.parser
+import email.policy
+
+import requests
+
+
+STANDIN_PORT            = 6363                      # default port,  as for TerminusDB
+LOCAL_FILES             = "/app/local_files/"       # where the TerminusDB server expects local files to be
+XSD                     = "http://www.w3.org/2001/XMLSchema#"
+UNKNOWN                 = "terminus:unknown"        # what an unset (opt) variable is bound to,  in a result
+VARIABLE                = "http://terminusdb.com/woql/variable/"
+                                                    # prefix of each variable name,  as a key of a result's bindings
+
+NODE_PREFIXES           = ("doc:", "scm:", "rdf:", "rdfs:", "owl:", "xsd:", "xdd:", "tcs:", "terminus:",
+                           "db:", "vio:", "woql:", "http://", "https://")
+                                                    # a string object with one of these is a node,  not a literal
+SCHEMA_GRAPHS           = ("db:schema", "schema", "schema/main")
+INTEGER_TYPES           = ("xsd:integer", "xsd:int", "xsd:long", "xsd:short", "xsd:byte",
+                           "xsd:nonNegativeInteger", "xsd:positiveInteger", "xsd:negativeInteger",
+                           "xsd:nonPositiveInteger", "xsd:unsignedLong", "xsd:unsignedInt")
+FLOAT_TYPES             = ("xsd:decimal", "xsd:double", "xsd:float")
+DATETIME_TYPES          = ("xsd:dateTime", "xsd:date")
+
+ACTIONS                 = ("create_database", "delete_database", "woql_select", "woql_update", "class_frame",
+                           "create_document", "get_document", "update_document", "delete_document",
+                           "get_schema", "update_schema")
+                                                    # the capabilities granted to every client
+
+
+class WOQLError(Exception):
+    '''
+        A woql query which the stand-in cannot evaluate:  reported to the client as a syntax error
+    '''
+    pass
+
+
+#######################################################################################################################
+#
+#   Terms
+#
+#   A node is held as its (prefixed) id,  eg 'doc:Charity_1';  a literal as a tuple of its type and value,  eg
+#   ('xsd:decimal', 20112073.0).  Each distinct term is given a small integer,  and the triple store indexes those.
+#
+def xsd_type(ty):
+    '''
+        :param ty:      string, an xsd type,  either prefixed ('xsd:string') or in full
+        :return:        string, the prefixed type
+    '''
+    return "xsd:" + ty[len(XSD):] if ty.startswith(XSD) else ty
+
+
+def literal(ty, value):
+    '''
+        Make a literal term,  converting its value to suit its type
+
+        :param ty:      string, the (prefixed) xsd type
+        :param value:   the value
+        :return:        tuple of type and value
+    '''
+    try:
+        if ty in FLOAT_TYPES:
+            value = float(value)
+        elif ty in INTEGER_TYPES:
+            value = int(float(value))
+        elif ty in DATETIME_TYPES:
+            value = str(value).strip().replace(" ", "T").rstrip("Z")
+            if ty == "xsd:dateTime" and value.count(":") == 1:
+                value += ":00"
+        elif ty == "xsd:boolean":
+            value = value if isinstance(value, bool) else str(value).lower() in ("true", "1")
+        else:
+            value = str(value)
+    except ValueError:
+        raise WOQLError("Cannot cast '{}' to {}".format(value, ty))
+    return (ty, value)
+
+
+class TermDictionary:
+    '''
+        Gives each distinct term an integer id
+    '''
+
+    def __init__(self):
+        self.ids = {}
+        self.terms = []
+
+    def id(self, term):
+        '''
+            :param term:    a node or literal
+            :return:        integer, the term's id (a new one,  if the term is not yet known)
+        '''
+        i = self.ids.get(term)
+        if i is None:
+            i = self.ids[term] = len(self.terms)
+            self.terms.append(term)
+        return i
+
+    def find(self, term):
+        '''
+            :param term:    a node or literal
+            :return:        integer, the term's id,  or None if the term is not known
+        '''
+        return self.ids.get(term)
+
+    def render(self, i):
+        '''
+            :param i:       integer, a term id
+            :return:        the JSON form of the term,  as put in a query result
+        '''
+        term = self.terms[i]
+        if not isinstance(term, tuple):
+            return term
+        value = term[1]
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return {"@type": XSD + term[0][4:], "@value": value}
+
+
+#######################################################################################################################
+#
+#   Triple store
+#
+#   Each index is a dict of dicts,  whose leaves are the third term ids.  Almost all leaves hold a single id (a
+#   charity has one name,  a name belongs to one charity),  so a leaf is kept as a bare int until it needs a second
+#   id,  and only then becomes a set.  Likewise a second level with a single entry (a literal is the object of just
+#   one triple) is kept as a (key, leaf) tuple until it needs a second entry.  This keeps the store to a fraction of
+#   the size it would be with a dict and a set for every entry.
+#
+def _leaf_add(level, key, value):
+    leaf = level.get(key)
+    if leaf is None:
+        level[key] = value
+        return True
+    if leaf.__class__ is int:
+        if leaf == value:
+            return False
+        level[key] = {leaf, value}
+        return True
+    if value in leaf:
+        return False
+    leaf.add(value)
+    return True
+
+
+def _leaf_values(leaf):
+    return () if leaf is None else (leaf,) if leaf.__class__ is int else list(leaf)
+
+
+def _leaf_has(leaf, value):
+    return leaf is not None and (leaf == value if leaf.__class__ is int else value in leaf)
+
+
+class TripleStore:
+    '''
+        A set of triples of term ids,  with three hash indexes so that a triple pattern with any of its
+        positions bound can be answered without a scan:  subject -> predicate -> objects (SPO),
+        predicate -> object -> subjects (POS),  and object -> subject -> predicates (OSP)
+    '''
+
+    def __init__(self):
+        self.spo = {}
+        self.pos = {}
+        self.osp = {}
+        self.size = 0
+
+    @staticmethod
+    def _add(index, a, b, c):
+        level = index.get(a)
+        if level is None:
+            index[a] = (b, c)
+            return True
+        if level.__class__ is tuple:
+            if level[0] != b:
+                index[a] = {level[0]: level[1], b: c}
+                return True
+            level = index[a] = {b: level[1]}
+        return _leaf_add(level, b, c)
+
+    @staticmethod
+    def _remove(index, a, b, c):
+        level = index[a]
+        if level.__class__ is tuple:
+            del index[a]
+            return
+        leaf = level[b]
+        if leaf.__class__ is int:
+            del level[b]
+            if not level:
+                del index[a]
+        else:
+            leaf.discard(c)
+
+    @staticmethod
+    def _level(index, a):
+        '''
+            :return:    dict, the second level of an index for a (empty if none)
+        '''
+        level = index.get(a)
+        if level is None:
+            return {}
+        return {level[0]: level[1]} if level.__class__ is tuple else level
+
+    def add(self, s, p, o):
+        if not self._add(self.spo, s, p, o):
+            return False
+        self._add(self.pos, p, o, s)
+        self._add(self.osp, o, s, p)
+        self.size += 1
+        return True
+
+    def remove(self, s, p, o):
+        if not _leaf_has(self._level(self.spo, s).get(p), o):
+            return False
+        self._remove(self.spo, s, p, o)
+        self._remove(self.pos, p, o, s)
+        self._remove(self.osp, o, s, p)
+        self.size -= 1
+        return True
+
+    def match(self, s, p, o):
+        '''
+            Find the triples matching a pattern.  The leaves are copied as they are read,  so that the store can
+            be written to while the matches are being used.
+
+            :param s:       integer id of the subject,  or None for any
+            :param p:       integer id of the predicate,  or None for any
+            :param o:       integer id of the object,  or None for any
+            :return:        generator of (s, p, o) tuples
+        '''
+        if s is not None:
+            preds = self._level(self.spo, s)
+            if p is not None:
+                if o is not None:
+                    if _leaf_has(preds.get(p), o):
+                        yield s, p, o
+                    return
+                for o2 in _leaf_values(preds.get(p)):
+                    yield s, p, o2
+                return
+            if o is not None:
+                for p2 in _leaf_values(self._level(self.osp, o).get(s)):
+                    yield s, p2, o
+                return
+            for p2, objects in list(preds.items()):
+                for o2 in _leaf_values(objects):
+                    yield s, p2, o2
+            return
+        if p is not None:
+            objs = self._level(self.pos, p)
+            if o is not None:
+                for s2 in _leaf_values(objs.get(o)):
+                    yield s2, p, o
+                return
+            for o2, subjects in list(objs.items()):
+                for s2 in _leaf_values(subjects):
+                    yield s2, p, o2
+            return
+        if o is not None:
+            for s2, preds in list(self._level(self.osp, o).items()):
+                for p2 in _leaf_values(preds):
+                    yield s2, p2, o
+            return
+        for s2 in list(self.spo):
+            for p2, objects in list(self._level(self.spo, s2).items()):
+                for o2 in _leaf_values(objects):
+                    yield s2, p2, o2
+
+
+class Database:
+    '''
+        A database:  its instance and schema graphs,  sharing one term dictionary
+    '''
+
+    def __init__(self, name, label="", comment=""):
+        self.name = name
+        self.label = label
+        self.comment = comment
+        self.terms = TermDictionary()
+        self.instance = TripleStore()
+        self.schema = TripleStore()
+        self.lock = threading.RLock()                   # queries are run one at a time,  per database
+
+    def graph(self, name):
+        '''
+            :param name:    string, the graph named in a quad (or None for the instance graph)
+            :return:        TripleStore
+        '''
+        return self.schema if name in SCHEMA_GRAPHS else self.instance
+
+    def property_ranges(self):
+        '''
+            :return:        dict, property id to the xsd type of its range,  for the datatype properties
+        '''
+        terms = self.terms
+        rng = terms.find("rdfs:range")
+        if rng is None:
+            return {}
+        return {s: terms.terms[o] for s, _, o in self.schema.match(None, rng, None)
+                if isinstance(terms.terms[o], str) and terms.terms[o].startswith("xsd:")}
+
+
+#######################################################################################################################
+#
+#   Woql evaluation
+#
+#   The query JSON is compiled once into a tree of functions,  each taking a binding (a dict of variable name to
+#   term id) and yielding the bindings which extend it.  Constant terms are looked up in the term dictionary at
+#   compile time.
+#
+def operator(node):
+    '''
+        :param node:    dict, a woql query JSON node
+        :return:        tuple of the operator name (without any 'woql:' prefix) and its arguments
+    '''
+    ops = [k for k in node if not k.startswith("@")]
+    if len(ops) != 1:
+        if not ops:
+            raise WOQLError("No woql operator in " + json.dumps(node)[:200])
+        return "and", [{k: node[k]} for k in ops]
+    op = ops[0]
+    return op.split(":")[-1], node[op]
+
+
+class Compiler:
+    '''
+        Compiles a woql query (as JSON) against a database
+    '''
+
+    def __init__(self, db, local_dir=None):
+        self.db = db
+        self.terms = db.terms
+        self.local_dir = local_dir
+        self.ranges = None
+        self.writes = 0
+        self.update = False                             # whether the query writes to the database
+
+    #
+    #   Terms of a query
+    #
+    def term(self, t, position="object", predicate=None):
+        '''
+            :param t:           a term as given in the query
+            :param position:    string, 'subject',  'predicate' or 'object'
+            :param predicate:   the predicate (for an object),  as given in the query
+            :return:            tuple of ('var', name) or ('const', term)
+        '''
+        if isinstance(t, str):
+            if t.startswith("v:"):
+                return "var", t[2:]
+            if position == "subject":
+                return "const", t if ":" in t else "doc:" + t
+            if position == "predicate":
+                return "const", t if ":" in t else "scm:" + t
+            if predicate in ("rdf:type", "rdfs:subClassOf") and ":" not in t:
+                return "const", "scm:" + t
+            if t.startswith(NODE_PREFIXES):
+                return "const", t
+            return "const", ("xsd:string", t)
+        if isinstance(t, bool):
+            return "const", ("xsd:boolean", t)
+        if isinstance(t, (int, float)):
+            return "const", ("xsd:decimal", float(t))
+        if isinstance(t, dict):
+            if "@value" in t:
+                return "const", literal(xsd_type(t.get("@type", "xsd:string")), t["@value"])
+            if "@id" in t:
+                return self.term(t["@id"], position, predicate)
+            for k, v in t.items():
+                if k.split(":")[-1] == "variable_name":
+                    return "var", v["@value"] if isinstance(v, dict) else v
+        raise WOQLError("Cannot understand term " + json.dumps(t)[:200])
+
+    def resolve(self, term):
+        '''
+            :param term:    tuple, from term()
+            :return:        function of a binding,  giving the term id (or None if unbound,  or -1 if a constant
+                            which is not in the database)
+        '''
+        kind, value = term
+        if kind == "var":
+            return lambda b: b.get(value)
+        i = self.terms.find(value)
+        i = -1 if i is None else i
+        return lambda b: i
+
+    def value_of(self, term):
+        '''
+            :param term:    tuple, from term()
+            :return:        function of a binding,  giving the term itself (or None if unbound)
+        '''
+        kind, value = term
+        if kind == "var":
+            terms = self.terms.terms
+            return lambda b: terms[b[value]] if value in b else None
+        return lambda b: value
+
+    def bind(self, term, new):
+        '''
+            :param term:    tuple, from term()
+            :param new:     function of a binding,  giving a term
+            :return:        function of a binding,  yielding it extended (or not) by unifying the term with new's
+        '''
+        kind, value = term
+        terms = self.terms
+        if kind == "var":
+            def unify(b):
+                i = terms.id(new(b))
+                bound = b.get(value)
+                if bound is None:
+                    b = dict(b)
+                    b[value] = i
+                    yield b
+                elif bound == i:
+                    yield b
+            return unify
+
+        def check(b):
+            if new(b) == value:
+                yield b
+        return check
+
+    #
+    #   Operators
+    #
+    def compile(self, node):
+        '''
+            :param node:    woql query JSON
+            :return:        function of a binding,  yielding bindings
+        '''
+        if node is True or node == [] or node == {}:
+            return lambda b: iter((b,))
+        if isinstance(node, list):
+            return self.op_and(node)
+        if not isinstance(node, dict):
+            raise WOQLError("Cannot understand query " + json.dumps(node)[:200])
+        op, args = operator(node)
+        method = getattr(self, "op_" + op, None)
+        if method is None:
+            raise WOQLError("Unsupported woql operator '{}'".format(op))
+        return method(args)
+
+    def op_true(self, args):
+        return lambda b: iter((b,))
+
+    def op_and(self, args):
+        parts = [self.compile(a) for a in args]
+        if not parts:
+            return self.op_true(args)
+
+        def conjunction(b):
+            #
+            #  A stack of the matches still to try at each clause,  rather than recursion:  a batch of many
+            #  inserts makes for a very long conjunction
+            #
+            n = len(parts)
+            stack = [parts[0](b)]
+            while stack:
+                b2 = next(stack[-1], None)
+                if b2 is None:
+                    stack.pop()
+                elif len(stack) == n:
+                    yield b2
+                else:
+                    stack.append(parts[len(stack)](b2))
+        return conjunction
+
+    def op_or(self, args):
+        parts = [self.compile(a) for a in args]
+
+        def disjunction(b):
+            for part in parts:
+                yield from part(b)
+        return disjunction
+
+    def op_opt(self, args):
+        part = self.compile(args[0] if isinstance(args, list) and len(args) == 1 else args)
+
+        def optional(b):
+            found = False
+            for b2 in part(b):
+                found = True
+                yield b2
+            if not found:
+                yield b
+        return optional
+
+    op_optional = op_opt
+
+    def op_not(self, args):
+        part = self.compile(args[0] if isinstance(args, list) and len(args) == 1 else args)
+
+        def negation(b):
+            for _ in part(b):
+                return
+            yield b
+        return negation
+
+    def op_select(self, args):
+        names = [a[2:] if isinstance(a, str) and a.startswith("v:") else a for a in args[:-1]]
+        part = self.compile(args[-1])
+
+        def select(b):
+            for b2 in part(b):
+                yield {n: b2[n] for n in names if n in b2}
+        select.names = names
+        return select
+
+    def triple_pattern(self, args, graph=None):
+        if len(args) < 3:
+            raise WOQLError("A triple needs a subject,  predicate and object")
+        p = self.term(args[1], "predicate")
+        s = self.term(args[0], "subject")
+        o = self.term(args[2], "object", p[1])
+        store = self.db.graph(graph)
+        rs, rp, ro = self.resolve(s), self.resolve(p), self.resolve(o)
+        vs, vp, vo = [t[1] if t[0] == "var" else None for t in (s, p, o)]
+
+        def triple(b):
+            si, pi, oi = rs(b), rp(b), ro(b)
+            if -1 in (si, pi, oi):
+                return                                  # a constant which is not in the database
+            for ms, mp, mo in store.match(si, pi, oi):
+                b2 = b
+                for var, bound, value in ((vs, si, ms), (vp, pi, mp), (vo, oi, mo)):
+                    if var is not None and bound is None:
+                        if b2 is b:
+                            b2 = dict(b)
+                        if var in b2 and b2[var] != value:
+                            break                       # same variable in two positions
+                        b2[var] = value
+                else:
+                    yield b2
+        return triple
+
+    def op_triple(self, args):
+        return self.triple_pattern(args)
+
+    def op_quad(self, args):
+        return self.triple_pattern(args, args[3] if len(args) > 3 else None)
+
+    def comparison(self, args, test):
+        if len(args) != 2:
+            raise WOQLError("A comparison needs two arguments")
+        a, b = self.value_of(self.term(args[0])), self.value_of(self.term(args[1]))
+
+        def compare(binding):
+            x, y = a(binding), b(binding)
+            if x is None or y is None:
+                raise WOQLError("Comparison of an unbound variable")
+            if test(x[1] if isinstance(x, tuple) else x, y[1] if isinstance(y, tuple) else y):
+                yield binding
+        return compare
+
+    def op_less(self, args):
+        return self.comparison(args, lambda x, y: x < y)
+
+    def op_greater(self, args):
+        return self.comparison(args, lambda x, y: x > y)
+
+    def op_eq(self, args):
+        if len(args) != 2:
+            raise WOQLError("eq needs two arguments")
+        left, right = self.term(args[0]), self.term(args[1])
+        if left[0] != "var" and right[0] != "var":
+            same = left[1] == right[1]
+            return lambda b: iter((b,) if same else ())
+        if left[0] != "var":
+            left, right = right, left                   # so that left is a variable
+        to_left = self.bind(left, self.value_of(right))
+        if right[0] != "var":
+            return to_left
+        to_right = self.bind(right, self.value_of(left))
+
+        def eq(b):
+            if left[1] in b:
+                return to_right(b)
+            if right[1] in b:
+                return to_left(b)
+            raise WOQLError("eq of two unbound variables")
+        return eq
+
+    op_unify = op_eq
+
+    def op_cast(self, args):
+        if len(args) != 3:
+            raise WOQLError("cast needs a value,  a type and a variable")
+        value = self.value_of(self.term(args[0]))
+        ty = xsd_type(args[1]["@id"] if isinstance(args[1], dict) else args[1])
+
+        def cast(b):
+            v = value(b)
+            if v is None:
+                raise WOQLError("cast of an unbound variable")
+            if ty.startswith("xsd:"):
+                return literal(ty, v[1] if isinstance(v, tuple) else v)
+            return v[1] if isinstance(v, tuple) else v
+        return self.bind(self.term(args[2]), cast)
+
+    op_typecast = op_cast
+
+    def op_idgen(self, args):
+        if len(args) != 3:
+            raise WOQLError("idgen needs a prefix,  a list of values and a variable")
+        prefix = args[0]["@id"] if isinstance(args[0], dict) else args[0]
+        keys = args[1].get("list", args[1].get("woql:list", [])) if isinstance(args[1], dict) else args[1]
+        values = [self.value_of(self.term(k)) for k in keys]
+
+        def idgen(b):
+            parts = []
+            for v in values:
+                v = v(b)
+                if v is None:
+                    raise WOQLError("idgen of an unbound variable")
+                parts.append(urllib.parse.quote(str(v[1] if isinstance(v, tuple) else v), safe=""))
+            return prefix + "_" + "_".join(parts)
+        return self.bind(self.term(args[2]), idgen)
+
+    #
+    #   Updates
+    #
+    def write(self, args, graph=None, delete=False):
+        if len(args) < 3:
+            raise WOQLError("A triple needs a subject,  predicate and object")
+        p = self.term(args[1], "predicate")
+        s = self.term(args[0], "subject")
+        o = self.term(args[2], "object", p[1])
+        store = self.db.graph(graph)
+        terms = self.terms
+        vs, vp, vo = self.value_of(s), self.value_of(p), self.value_of(o)
+        schema = store is self.db.schema
+        self.update = True
+
+        def add(b):
+            values = (vs(b), vp(b), vo(b))
+            if None in values:
+                raise WOQLError("Insert of an unbound variable")
+            si, pi, oi = terms.id(values[0]), terms.id(values[1]), values[2]
+            if not schema and isinstance(oi, tuple):
+                if self.ranges is None:
+                    self.ranges = self.db.property_ranges()
+                ty = self.ranges.get(pi)
+                if ty is not None and ty != oi[0]:
+                    oi = literal(ty, oi[1])             # as the server does,  give the value its declared type
+            oi = terms.id(oi)
+            if (store.remove if delete else store.add)(si, pi, oi):
+                self.writes += 1
+            if schema:
+                self.ranges = None
+            yield b
+        return add
+
+    def op_add_triple(self, args):
+        return self.write(args)
+
+    def op_add_quad(self, args):
+        return self.write(args, args[3] if len(args) > 3 else None)
+
+    def op_delete_triple(self, args):
+        return self.write(args, delete=True)
+
+    def op_delete_quad(self, args):
+        return self.write(args, args[3] if len(args) > 3 else None, delete=True)
+
+    def op_insert(self, args):
+        return self.write([args[0], "rdf:type", args[1]], args[2] if len(args) > 2 else None)
+
+    def op_when(self, args):
+        condition = self.compile(args[0] if args else True)
+        action = self.compile(args[1]) if len(args) > 1 else self.op_true(args)
+
+        def when(b):
+            for b2 in condition(b):
+                yield from action(b2)
+        return when
+
+    #
+    #   Reading .csv files
+    #
+    def op_get(self, args):
+        columns, resource = args[0], args[1]
+        if isinstance(columns, dict):
+            columns = columns.get("list", [columns])
+        specs = []
+        for column in columns:
+            column = column.get("as", column.get("woql:as")) if isinstance(column, dict) else column
+            name = column[0]["@value"] if isinstance(column[0], dict) else column[0]
+            ty = xsd_type(column[2]) if len(column) > 2 else "xsd:string"
+            specs.append((name, self.term(column[1]), ty))
+        kind, source = operator(resource)
+        source = source[0] if isinstance(source, list) else source
+        source = source["@value"] if isinstance(source, dict) else source
+        terms = self.terms
+
+        def get(b):
+            for row in self.read_csv(kind, source):
+                b2 = dict(b)
+                for name, (var_kind, var), ty in specs:
+                    value = row.get(name) if isinstance(name, str) else list(row.values())[name]
+                    if value is None:
+                        raise WOQLError("No column '{}' in {}".format(name, source))
+                    value = literal(ty, value)
+                    if var_kind != "var":
+                        if value != var:
+                            break
+                        continue
+                    i = terms.id(value)
+                    if b2.setdefault(var, i) != i:
+                        break
+                else:
+                    yield b2
+        return get
+
+    def read_csv(self, kind, source):
+        '''
+            :param kind:        string, 'file' or 'remote'
+            :param source:      string, the file name or url
+            :return:            generator of dicts,  one per row,  keyed by column name
+        '''
+        if kind == "remote":
+            response = requests.get(source, stream=True)
+            if response.status_code != 200:
+                raise WOQLError("Could not get {}: HTTP {}".format(source, response.status_code))
+            response.encoding = "utf-8-sig"
+            yield from csv.DictReader(response.iter_lines(decode_unicode=True))
+            return
+        if kind != "file":
+            raise WOQLError("Unsupported get resource '{}'".format(kind))
+        path = source
+        if path.startswith(LOCAL_FILES) and self.local_dir is not None:
+            path = os.path.join(self.local_dir, path[len(LOCAL_FILES):])
+        if not os.path.exists(path):
+            raise WOQLError("No such file " + source)
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+
+
+def run_woql(db, query, local_dir=None):
+    '''
+        Evaluate a woql query against a database
+
+        :param db:          Database
+        :param query:       dict, the woql query JSON
+        :param local_dir:   string, the directory standing in for /app/local_files/ (or None)
+        :return:            dict, the query result as the server would send it
+    '''
+    with db.lock:
+        compiler = Compiler(db, local_dir)
+        top = compiler.compile({k: v for k, v in query.items() if k != "@context"})
+        names = getattr(top, "names", None)
+        render = db.terms.render
+        bindings = []
+        if compiler.update:
+            for _ in top({}):                           # no need to send back the bindings of an update
+                pass
+            return {"bindings": [], "inserts": compiler.writes, "deletes": 0,
+                    "graphs": {}, "terminus:status": "terminus:success"}
+        keys = None if names is None else [(n, VARIABLE + n) for n in names]
+        for b in top({}):
+            if keys is None:
+                bindings.append({VARIABLE + n: render(i) for n, i in b.items()})
+            else:
+                bindings.append({k: render(b[n]) if n in b else UNKNOWN for n, k in keys})
+        return {"bindings": bindings, "inserts": compiler.writes, "deletes": 0,
+                "graphs": {}, "terminus:status": "terminus:success"}
+
+
+#######################################################################################################################
+#
+#   HTTP server
+#
+class StandinServer(http.server.ThreadingHTTPServer):
+    '''
+        The stand-in server:  holds the databases
+    '''
+    daemon_threads = True
+
+    def __init__(self, address, local_dir=None):
+        super().__init__(address, StandinHandler)
+        self.local_dir = local_dir
+        self.databases = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return "http://{}:{}".format(*self.server_address[:2])
+
+
+class StandinHandler(http.server.BaseHTTPRequestHandler):
+    '''
+        Answers the requests of the woqlclient library
+    '''
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def failure(self, status, message):
+        self.reply(status, {"terminus:status": "terminus:failure", "terminus:message": message})
+
+    def path_parts(self):
+        url = urllib.parse.urlsplit(self.path)
+        return [p for p in url.path.split("/") if p], urllib.parse.parse_qs(url.query)
+
+    def body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def capabilities(self):
+        server = self.server
+        scope = [{"@id": "doc:server", "@type": "terminus:Server"}] + \
+                [{"@id": "doc:" + name, "@type": "terminus:Database"} for name in server.databases]
+        return {
+            "@id": "doc:admin",
+            "@type": "terminus:User",
+            "terminus:authority": [{
+                "@id": "doc:access_all_areas",
+                "@type": "terminus:ServerCapability",
+                "terminus:action": [{"@id": "terminus:" + a, "@type": "terminus:DBAction"} for a in ACTIONS],
+                "terminus:authority_scope": scope
+            }]
+        }
+
+    def do_GET(self):
+        parts, params = self.path_parts()
+        if not parts:
+            return self.reply(200, self.capabilities())
+        if len(parts) == 2 and parts[1] == "woql":
+            query = params.get("terminus:query")
+            return self.woql(parts[0], query[0] if query else None)
+        self.failure(404, "No such resource " + self.path)
+
+    def do_POST(self):
+        parts, _ = self.path_parts()
+        body = self.body()
+        if len(parts) == 1:
+            with self.server.lock:
+                if parts[0] in self.server.databases:
+                    return self.failure(400, "Database already exists")
+                doc = json.loads(body or b"{}")
+                label = doc.get("rdfs:label", {})
+                comment = doc.get("rdfs:comment", {})
+                self.server.databases[parts[0]] = Database(
+                    parts[0],
+                    label.get("@value", "") if isinstance(label, dict) else label,
+                    comment.get("@value", "") if isinstance(comment, dict) else comment)
+            return self.reply(200, {"terminus:status": "terminus:success"})
+        if len(parts) == 2 and parts[1] == "woql":
+            return self.woql(parts[0], self.query_from_body(body))
+        self.failure(404, "No such resource " + self.path)
+
+    def do_DELETE(self):
+        parts, _ = self.path_parts()
+        if len(parts) == 1:
+            with self.server.lock:
+                if self.server.databases.pop(parts[0], None) is None:
+                    return self.failure(404, "Database does not exist")
+            return self.reply(200, {"terminus:status": "terminus:success"})
+        self.failure(404, "No such resource " + self.path)
+
+    def query_from_body(self, body):
+        '''
+            Find the woql query in a POST body:  form encoded,  multipart,  or JSON
+        '''
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("multipart/"):
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body)
+            for part in message.iter_parts():
+                if part.get_param("name", header="content-disposition") == "terminus:query":
+                    return part.get_content()
+            return None
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            query = urllib.parse.parse_qs(body.decode("utf-8")).get("terminus:query")
+            return query[0] if query else None
+        doc = json.loads(body or b"{}")
+        query = doc.get("terminus:query", doc)
+        return query if isinstance(query, str) else json.dumps(query)
+
+    def woql(self, name, query):
+        db = self.server.databases.get(name)
+        if db is None:
+            return self.failure(404, "Database does not exist")
+        if query is None:
+            return self.failure(400, "No terminus:query given")
+        try:
+            result = run_woql(db, json.loads(query), self.server.local_dir)
+        except (WOQLError, ValueError, KeyError, IndexError, TypeError) as e:
+            return self.reply(400, {"@type": "vio:WOQLSyntaxError",
+                                    "terminus:message": "Stand-in could not evaluate the query: {}".format(e),
+                                    "vio:query": query[:1000]})
+        except Exception as e:
+            return self.failure(500, "Stand-in failed: {}".format(e))
+        self.reply(200, result)
+
+
+def start_standin(port=0, local_dir=None, host="127.0.0.1"):
+    '''
+        Start the stand-in server on a background thread
+
+        :param port:        integer, port to listen on (0: any free port)
+        :param local_dir:   string, the directory standing in for /app/local_files/ (or None)
+        :param host:        string, address to listen on
+        :return:            the server,  and its url
+    '''
+    server = StandinServer((host, port), local_dir)
+    threading.Thread(target=server.serve_forever, daemon=True, name="woql-standin").start()
+    return server, server.url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="In-process stand-in for the TerminusDB server")
+    parser.add_argument("--port", type=int, default=STANDIN_PORT, help="port to listen on")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--local", default=os.getcwd(), help="directory standing in for " + LOCAL_FILES)
+    args = parser.parse_args()
+
+    server = StandinServer((args.host, args.port), args.local)
+    print("[Stand-in TerminusDB server at {},  local files from '{}']".format(server.url, args.local))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
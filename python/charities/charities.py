@@ -14,20 +14,23 @@
 ##  April 2020
 ##
 
-import pandas as pd
+import os
+import sys
+import argparse
 
-import networkx as nx
-import matplotlib as mplt
-import matplotlib.pyplot
+import pandas as pd
 
 import woqlclient.woqlClient as woql
 from woqlclient import WOQLQuery
-import woqlclient.errors as woqlError
 
 import woqlclient.woqlDataframe as wdf
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))     # for the shared woqlDiagnosis
 import woqlDiagnosis as wary
 
+nx = wary.lazy_import("networkx")                   # only needed by plot_charity,  so imported when it first runs
+plt = wary.lazy_import("matplotlib.pyplot")
+
 #######################################################################################################################
 
 CSV                             = "https://raw.githubusercontent.com/Chrisjhorn/terminusDB/master/charities/raw/quads.csv"
@@ -39,6 +42,9 @@ CSV                             = "https://raw.githubusercontent.com/Chrisjhorn/
 
 PLOT_FILE                       = "charities.png"   # Where to place the plot produced by the networkx module
 
+MANIFEST_FILE                   = "charities_manifest.json"
+                                                    # the rows last loaded,  when syncing (see sync_csv)
+
 server_url                      = "http://localhost:6363"
 dbId                            = "charitiesDB"
 key                             = "root"
@@ -80,12 +86,12 @@ def literal_string(s):
     return {'@type': 'xsd:string', '@value': s}
 
 
-def create_schema(client):
+def schema_query():
     '''
-        Build the schema
-        :param client:      TerminusDB server handle
+        Build the schema query
+        :return:            woql query
     '''
-    schema = WOQLQuery().when(True).woql_and(
+    return WOQLQuery().when(True).woql_and(
 
         #
         # A Charity has a name,  and a registration number
@@ -111,10 +117,29 @@ def create_schema(client):
             property("trustee_of", "Charity").label("Appointed to").
             property("date_appointed", "string").label("appointment date")
     )
+
+
+def schema_types():
+    '''
+        The type declared by the schema for each property,  used to type the columns of query results
+        :return:            dict, property name to type name
+    '''
+    global Schema_Types
+    if Schema_Types is None:
+        Schema_Types = wary.declared_property_types(schema_query())
+    return Schema_Types
+
+Schema_Types = None
+
+
+def create_schema(client):
+    '''
+        Build the schema
+        :param client:      TerminusDB server handle
+    '''
     try:
         print("[Building schema..]")
-        with wary.suppress_Terminus_diagnostics():
-            schema.execute(client)
+        wary.execute_query(schema_query(), client)
     except Exception as e:
         wary.diagnose(e)
 
@@ -176,7 +201,22 @@ def get_inserts():
       )
 
 
-def load_csv(client, url):
+def load_query(url):
+    '''
+        Build the query which reads a .csv file and uses its raw data to initialise a graph in the TerminusDB server
+
+        :param url:         string,  either a local file name or http-style url
+        :return:            woql query
+    '''
+    csv = get_csv_variables(url)
+    wrangles = get_wrangles()
+    inputs = WOQLQuery().woql_and(csv, *wrangles)
+    inserts = get_inserts()
+    return WOQLQuery().when(inputs, inserts)
+
+
+def load_csv(client, url, chunk_rows=wary.LOAD_CHUNK_ROWS, workers=wary.LOAD_WORKERS,
+             client_side=wary.LOAD_CLIENT_SIDE):
     '''
         Read a .csv file and use its raw data to initialise a graph in the TerminusDB server.
         In the case of a local file,  it should be the file path relative to the value of the
@@ -184,19 +224,20 @@ def load_csv(client, url):
 
         :param client:      handle on the TerminusDB server
         :param url:         string,  eiher a local file name or http-style url
+        :param chunk_rows:  integer,  if not 0,  load this many rows at a time,  each in a transaction of its own
+        :param workers:     integer,  number of those chunks loaded at the same time
+        :param client_side: boolean,  whether to read and parse the .csv file here,  rather than on the server
         :return:            None
     '''
-    csv = get_csv_variables(url)
-    wrangles = get_wrangles()
-    inputs = WOQLQuery().woql_and(csv, *wrangles)
-    inserts = get_inserts()
-    answer = WOQLQuery().when(inputs, inserts)
-    try:
-        print("[Loading raw data from '{}'..]".format(url))
-        with wary.suppress_Terminus_diagnostics():
-            answer.execute(client)
-    except woqlError.APIError as e:
-        wary.diagnose(e)
+    if client_side:
+        wary.load_csv_client_side(client, url, load_query,
+                                  chunk_rows or wary.INSERT_BATCH_SIZE, workers, wary.LOAD_PROCESSES)
+        return
+    if chunk_rows:
+        wary.load_csv_chunked(client, url, load_query, chunk_rows, workers)
+        return
+    print("[Loading raw data from '{}'..]".format(url))
+    wary.execute_query(load_query(url), client)
 
 #######################################################################################################################
 #
@@ -212,6 +253,43 @@ def is_empty(q):
     return len(q['bindings']) == 0
 
 
+def sync_csv(client, url):
+    '''
+        Bring the graph in the TerminusDB server up to date with a .csv file,  writing only what the rows added,
+        removed or changed since it was last synced add or take away (see woqlDiagnosis.sync_csv)
+
+        :param client:      handle on the TerminusDB server
+        :param url:         string,  either a local file name or http-style url
+        :return:            dict, the number of rows added,  removed and changed,  and of triples inserted and deleted
+    '''
+    return wary.sync_csv(client, url, load_query, "Appt", MANIFEST_FILE, schema_types())
+
+
+def check_csv(url, exit_on_error=True):
+    '''
+        Check every row of a .csv file before it is loaded,  against the types which the schema declares,  and
+        report all the rows which fail...and then exit (see woqlDiagnosis.check_csv)
+
+        :param url:             string,  either a local file name or http-style url
+        :param exit_on_error:   boolean, whether to exit if there are any problems
+        :return:                pandas DataFrame of the problems found
+    '''
+    return wary.check_csv(url, load_query, schema_types(), exit_on_error=exit_on_error)
+
+
+def build_database(client, force_reload=False):
+    '''
+        Build the database from the raw .csv data:  unless it already holds the same schema and data,  when it is
+        kept as it is;  or,  with WOQL_SYNC set,  brought up to date with only the rows changed since (see
+        woqlDiagnosis.build_database()).
+
+        :param client:          TerminusDB server handle
+        :param force_reload:    boolean,  whether to rebuild the database regardless
+    '''
+    wary.build_database(client, dbId, "Charities", "Irish Charities graphbase", schema_query(), {CSV: load_query(CSV)},
+                        check_csv, load_csv, sync_csv, MANIFEST_FILE, force_reload)
+
+
 def list_all_charities():
     '''
         Return a dataframe with the registration number and name of each charity
@@ -234,43 +312,80 @@ def list_all_trustees():
     return pd.DataFrame(columns=["Trustee_Name"]) if is_empty(result) else wdf.query_to_df(result)
 
 
-def list__all_appointments():
+def all_appointments_query():
     '''
-        Return a dataframe with dates on which each trustee was appointed to each charity
+        Build the query used by list__all_appointments
     '''
-    q = WOQLQuery().select("v:Trustee_Name", "v:Charity_Name", "v:date_appointed").woql_and(
+    return WOQLQuery().select("v:Trustee_Name", "v:Charity_Name", "v:date_appointed").woql_and(
             WOQLQuery().triple("v:Appointment", "trustee", "v:Trustee"),
             WOQLQuery().triple("v:Appointment", "trustee_of", "v:Charity"),
             WOQLQuery().triple("v:Appointment", "date_appointed", "v:date_appointed"),
             WOQLQuery().triple("v:Trustee", "trustee_name", "v:Trustee_Name"),
             WOQLQuery().triple("v:Charity", "charity_name", "v:Charity_Name")
     )
-    result = wary.execute_query(q, client)
+
+
+def list__all_appointments():
+    '''
+        Return a dataframe with dates on which each trustee was appointed to each charity
+    '''
+    result = wary.execute_query(all_appointments_query(), client)
     return pd.DataFrame(columns=["Trustee_Name", "Charity_Name", "date_appointed"]) if is_empty(result) else wdf.query_to_df(result)
 
 
-def lookup_registration(charity):
+def iter__all_appointments(rows=wary.STREAM_CHUNK_ROWS):
     '''
-        Lookup the registration number for a given charity
+        Streaming version of list__all_appointments:  the appointments arrive as a series of dataframes,
+        so that memory use stays flat however large the register of charities
+
+        :param rows:        integer, maximum number of rows in each dataframe
+        :return:            generator of dataframes
+    '''
+    return wary.stream_dataframes(all_appointments_query(), client, rows, key=key, url=dburl + "/woql")
+
+
+def count__all_appointments():
+    '''
+        Count the appointments,  without holding them all in memory at once
+    '''
+    return sum(df.shape[0] for df in iter__all_appointments())
+
+
+def build_registration_query(charity):
+    '''
+        Build the query used by lookup_registration
 
         :param charity:     string, charity name
-        :return:            integer,  registration number or None if unknown
+        :return:            woql query
     '''
 
     #
     #  Terminus currently has a bug with literal values in queries.  Should be able to do:
     #     WOQLQuery().triple("v:Charity", "charity_name", charity) here but instead use @type..
     #
-    q = WOQLQuery().select("v:number").woql_and(
+    return WOQLQuery().select("v:number").woql_and(
                 WOQLQuery().triple("v:Charity", "charity_name", literal_string(charity)),
                 WOQLQuery().triple("v:Charity", "charity_number", "v:number")
         )
-    result = wary.execute_query(q, client)
+
+Registration_Template = wary.QueryTemplate(build_registration_query, "charity")
+
+
+def lookup_registration(charity):
+    '''
+        Lookup the registration number for a given charity
+
+        :param charity:     string, charity name
+        :return:            integer,  registration number or None if unknown
+    '''
+    result = wary.execute_query(Registration_Template.bind(charity=charity), client)
 
     #
-    # Could walk the result binding to extract the (sole) decimal value - but easier just to use a dataframe
+    # Could walk the result binding to extract the (sole) decimal value - but easier just to use a (typed) dataframe
     #
-    return None if is_empty(result) else int(wdf.query_to_df(result)['number'])
+    if is_empty(result):
+        return None
+    return int(wary.bindings_to_df(result, Registration_Template.variable_types(schema_types()))['number'].iloc[0])
 
 
 def reverse_lookup_registration(regNumber):
@@ -291,49 +406,94 @@ def reverse_lookup_registration(regNumber):
     return None if is_empty(result) else wdf.query_to_df(result)["Charity_Name"][0]
 
 
-def list_charities_for(trustee__name):
+def build_charities_for_query(trustee__name):
     '''
-        Find all the charities to which a trustee is appointed
+        Build the query used by list_charities_for
 
         :param trustee__name:       string, a trustee
-        :return:                    dataframe with charities and appointment dates
+        :return:                    woql query
     '''
 
     #
     #  Terminus currently has a bug with literal values in queries.  Should be able to do:
     #     WOQLQuery().triple("v:Trustee", "trustee_name", trustee_name) here but instead use @type..
     #
-    q = WOQLQuery().select("v:Charity_Name", "v:date_appointed").woql_and(
+    return WOQLQuery().select("v:Charity_Name", "v:date_appointed").woql_and(
             WOQLQuery().triple("v:Appointment", "trustee", "v:Trustee"),
             WOQLQuery().triple("v:Appointment", "trustee_of", "v:Charity"),
             WOQLQuery().triple("v:Appointment", "date_appointed", "v:date_appointed"),
             WOQLQuery().triple("v:Trustee", "trustee_name", literal_string(trustee__name)),
             WOQLQuery().triple("v:Charity", "charity_name", "v:Charity_Name")
     )
-    result = wary.execute_query(q, client)
+
+#
+#  Asked once for each trustee,  so build the query just once and bind each trustee's name into it
+#
+Charities_For_Template = wary.QueryTemplate(build_charities_for_query, "trustee__name")
+
+
+def charities_for_query(trustee__name):
+    '''
+        The query used by list_charities_for,  from its template
+
+        :param trustee__name:       string, a trustee
+        :return:                    woql query
+    '''
+    return Charities_For_Template.bind(trustee__name=trustee__name)
+
+
+def charities_for_df(result):
+    '''
+        Convert the result of a charities_for_query to a dataframe
+
+        :param result:      woql query result
+        :return:            dataframe with charities and appointment dates
+    '''
     return pd.DataFrame(columns=["Charity_Name", "date_appointed"]) if is_empty(result) else wdf.query_to_df(result)
 
 
-def query_trustees_for(charity__name):
+def list_charities_for(trustee__name):
     '''
-        Find all the trustees appointed to a given charity
+        Find all the charities to which a trustee is appointed
+
+        :param trustee__name:       string, a trustee
+        :return:                    dataframe with charities and appointment dates
+    '''
+    result = wary.execute_query(charities_for_query(trustee__name), client)
+    return charities_for_df(result)
+
+
+def build_trustees_for_query(charity__name):
+    '''
+        Build the query used by query_trustees_for
 
         :param charity__name:       string, a charity
-        :return:                    dataframe with trustees and appointment dates
+        :return:                    woql query
     '''
 
     #
     #  Terminus currently has a bug with literal values in queries.  Should be able to do:
     #     WOQLQuery().triple("v:Charity", "charity_name", charity) here but instead use @type..
     #
-    q = WOQLQuery().select("v:Trustee_Name", "v:date_appointed").woql_and(
+    return WOQLQuery().select("v:Trustee_Name", "v:date_appointed").woql_and(
             WOQLQuery().triple("v:Appointment", "trustee", "v:Trustee"),
             WOQLQuery().triple("v:Appointment", "trustee_of", "v:Charity"),
             WOQLQuery().triple("v:Appointment", "date_appointed", "v:date_appointed"),
             WOQLQuery().triple("v:Trustee", "trustee_name", "v:Trustee_Name"),
             WOQLQuery().triple("v:Charity", "charity_name", literal_string(charity__name))
     )
-    result = wary.execute_query(q, client)
+
+Trustees_For_Template = wary.QueryTemplate(build_trustees_for_query, "charity__name")
+
+
+def query_trustees_for(charity__name):
+    '''
+        Find all the trustees appointed to a given charity
+
+        :param charity__name:       string, a charity
+        :return:                    dataframe with trustees and appointment dates
+    '''
+    result = wary.execute_query(Trustees_For_Template.bind(charity__name=charity__name), client)
     return pd.DataFrame(columns=["Trustee_Name", "date_appointed"]) if is_empty(result) else wdf.query_to_df(result)
 
 
@@ -418,29 +578,38 @@ def busy_trustees(N):
     return None if is_empty(result) else wdf.query_to_df(result)
 
 
-def query_network(charity_name, trustees=[], charities=[]):
+def query_network(charity_name, trustees=None, charities=None):
     '''
         Given a specific charity as a "seed",  find all trustees and all charities reachable from
-        that specific charity,  via common trustees
+        that specific charity,  via common trustees.
+
+        The network is explored one "ring" at a time outwards from the seed:  the queries for all the
+        charities (or trustees) in a ring are independent of each other,  and so are run concurrently.
 
         :param charity_name:    string, the seed charity
         :param trustees:        a list of trustees reachable from the seed
         :param charities:       a list of charities reachable from the seed
         :return:                a list of all trustees,  and of all charities,  reachable from the seed charity
     '''
-    if charities == []:
-        charities = [charity_name]
-    trustee_list = query_trustees_for(charity_name)["Trustee_Name"]
-    for trustee in trustee_list:
-        if trustee in trustees:
-            continue
-        trustees.append(trustee)
-        charities_list = list_charities_for(trustee)["Charity_Name"]
-        for charity in charities_list:
-            if charity in charities:
-                continue
-            charities.append(charity)
-            trustees, charities = query_network(charity, trustees, charities)
+    trustees = [] if trustees is None else trustees
+    charities = [charity_name] if not charities else charities
+    frontier = [charity_name]
+    while frontier:
+        new_trustees = []
+        for trustee_list in wary.run_concurrently(*[(query_trustees_for, charity) for charity in frontier]):
+            for trustee in trustee_list["Trustee_Name"]:
+                if trustee in trustees:
+                    continue
+                trustees.append(trustee)
+                new_trustees.append(trustee)
+
+        frontier = []
+        for charities_list in wary.run_concurrently(*[(list_charities_for, trustee) for trustee in new_trustees]):
+            for charity in charities_list["Charity_Name"]:
+                if charity in charities:
+                    continue
+                charities.append(charity)
+                frontier.append(charity)
     return trustees, charities
 
 
@@ -457,9 +626,18 @@ def plot_charity(target_charity, trustees):
     '''
     G = nx.Graph()
     G.add_node(target_charity, font_size=24)
-    for trustee in trustees:
+
+    #
+    #  Ask for the charities of all the trustees at once,  rather than one trustee after another
+    #
+    results, errors = wary.execute_many([charities_for_query(trustee) for trustee in trustees], client)
+    for trustee, result, error in zip(trustees, results, errors):
+        if error is not None:
+            print("[Unable to find the charities for trustee {}]".format(trustee))
+            wary.diagnose(error, exit_on_error=False)
+            continue
         # print("getting charities for {}".format(trustee))                         # uncomment this if you wish...
-        charities = list_charities_for(trustee)
+        charities = charities_for_df(result)
         for _, row in charities.iterrows():
             # print("adding edge for {} to {}".format(trustee,row["Charity_Name"])) # uncomment this if you wish...
             G.add_edge(trustee, row["Charity_Name"], date=row["date_appointed"])
@@ -471,17 +649,21 @@ def plot_charity(target_charity, trustees):
         else:
             colour_map.append('blue')
 
-    mplt.pyplot.figure(figsize=(11, 8))
-    mplt.pyplot.title(target_charity)
+    plt.figure(figsize=(11, 8))
+    plt.title(target_charity)
     pos = nx.spring_layout(G)
     nx.draw(G, pos=pos, node_color=colour_map, with_labels=True, font_size=8, node_size=50)
     nx.draw(G.subgraph(target_charity), pos=pos, node_color='green', with_labels=True, font_size=8, node_size=100)
-    mplt.pyplot.savefig(PLOT_FILE)
-    mplt.pyplot.show()
+    plt.savefig(PLOT_FILE)
+    plt.show()
 
 #######################################################################################################################
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Woql demo using Irish charities")
+    parser.add_argument("--force-reload", action="store_true",
+                        help="rebuild the database,  even if it already holds the same schema and data")
+    args = parser.parse_args()
 
     #
     #  Connect to TerminusDB, clean out any previous version of the charities database
@@ -490,67 +672,62 @@ if __name__ == "__main__":
     client = woql.WOQLClient()
     try:
         print("[Connecting to the TerminusDB server..]")
+        wary.use_pooled_session(server_url)             # keep connections to the server alive between queries
         with wary.suppress_Terminus_diagnostics():
             client.connect(server_url, key)
     except Exception as e:
         print("[TerminusDB server is apparently not running?]")
         wary.diagnose(e)
-    try:
-        print("[Removing prior version of the database,  if it exists..]")
-        with wary.suppress_Terminus_diagnostics():
-            client.deleteDatabase(dbId)
-    except Exception as e:
-        print("[No prior database to delete]")
-    try:
-        print("[Creating new database..]")
-        with wary.suppress_Terminus_diagnostics():
-            client.createDatabase(dbId, "Charities", key=None, comment="Irish Charities graphbase")
-    except Exception as e:
-        wary.diagnose(e)
-    create_schema(client)
-    load_csv(client, CSV)
+    build_database(client, args.force_reload)
+    wary.enable_result_cache()                  # the sample queries below ask the same questions many times over
 
 
     #
     #  Some sample queries..
     #
+    #  They are independent of each other,  so set them all going at once (overlapping their round trips
+    #  to the server),  and then print their answers in turn
+    #
+    trustee = "T1796596693580697126"
+    charity = "Irish Scouting Fellowship"
+    nr = 20080846
+    N = 3
+    charities_df, trustees_df, nr_appointments, charity_nr, nr_charity, trustee_df, charity_df, busy_df = \
+        wary.run_concurrently(
+            list_all_charities,
+            list_all_trustees,
+            count__all_appointments,
+            (lookup_registration, charity),
+            (reverse_lookup_registration, nr),
+            (list_charities_for, trustee),
+            (query_trustees_for, charity),
+            (busy_trustees, N))
 
     print("\nList all charities....")
-    df = list_all_charities()
-    print("{:,} charities found".format(df.shape[0]))
+    print("{:,} charities found".format(charities_df.shape[0]))
 
     print("\nList all trustees....")
-    df = list_all_trustees()
-    print("{:,} trustees found".format(df.shape[0]))
+    print("{:,} trustees found".format(trustees_df.shape[0]))
 
     print("\nList all appointments...")
-    df = list__all_appointments()
-    print("{:,} appointments found".format(df.shape[0]))
+    print("{:,} appointments found".format(nr_appointments))
 
     print("\nLookup registration...")
-    charity = "Irish Scouting Fellowship"
-    nr = lookup_registration(charity)
-    print("'{}' has registered number {}".format(charity, 'unknown' if nr is None else nr))
+    print("'{}' has registered number {}".format(charity, 'unknown' if charity_nr is None else charity_nr))
 
     print("\nReverse lookup of registration number...")
-    nr = 20080846
-    charity = reverse_lookup_registration(nr)
-    print("Registered number {} is '{}'".format(nr, 'unknown' if charity is None else charity))
+    print("Registered number {} is '{}'".format(nr, 'unknown' if nr_charity is None else nr_charity))
 
     print("\nFind charities for a given trustee...")
-    trustee = "T1796596693580697126"
-    df = list_charities_for(trustee)
     print("Trustee {} is appointed to the following charities".format(trustee))
-    print(df.to_string(index=False))
+    print(trustee_df.to_string(index=False))
 
     print("\nList the trustees of a given charity...")
-    df = query_trustees_for("Irish Scouting Fellowship")
-    print("The following trustees are appointed to '{}'".format("Irish Scouting Fellowship"))
-    print(df.to_string(index=False))
+    print("The following trustees are appointed to '{}'".format(charity))
+    print(charity_df.to_string(index=False))
 
     print("\nFind sets of charities with a common trustee..")
-    N = 3
-    df = busy_trustees(N)
+    df = busy_df
     print("There are {:,} sets of {} charities linked by a common trustee".format(0 if df is None else df.shape[0], N))
     cap = min(df.shape[0], 5)
     print("{} of them are:".format(cap))
@@ -560,6 +737,8 @@ if __name__ == "__main__":
     print("\nExtract a subgraph..(may take a few seconds..)")
     target_charity = "Daingean Community Childcare Services Limited"
     trustees, charities = query_network(target_charity)
+    print("[Result cache: {hits:,} hits, {misses:,} misses, {entries:,} results held in {bytes:,} bytes]".format(
+        **wary.result_cache_stats()))
     print("Plotting subgraph for '{}'...{:,} trustees in subgraph".format(target_charity, len(trustees)))
     plot_charity(target_charity, trustees)
 
@@ -9,6 +9,9 @@
 ##  April 2020
 ##
 
+import os
+import sys
+
 import pandas as pd
 
 from random import randint                          # used to overcome current lack of a scoping mechanism in woql
@@ -16,9 +19,9 @@ from random import randint                          # used to overcome current l
 
 import woqlclient.woqlClient as woql
 from woqlclient import WOQLQuery
-import woqlclient.errors as woqlError
 import woqlclient.woqlDataframe as wdf
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))     # for the shared woqlDiagnosis
 import woqlDiagnosis as wary
 
 
@@ -289,21 +292,107 @@ def create_schema(client):
     )
     try:
         print("[Building schema..]")
-        with wary.suppress_Terminus_diagnostics():
-            schema.execute(client)
+        wary.execute_query(schema, client)
     except Exception as e:
         wary.diagnose(e)
 
 
+def build_person_insert(person, sex, mother, father):
+    '''
+        Build a woql query to insert a new instance of the Person document into the database
+
+        :param person:      string, the person's name
+        :param sex:         string, "M" or "F"
+        :param mother:      string, the name of the person's mother
+        :param father:      string, the name of the person's father
+        :return:            woql query
+    '''
+
+    #
+    #  The 'when' clause here wraps a transaction-write into the database..
+    #
+    return WOQLQuery().when(
+
+                #
+                #  Create a new TerminusDB identifier for the new document
+                #
+                WOQLQuery().woql_and(
+                            WOQLQuery().idgen("doc:Person", [person], "v:Person_ID"),
+                        ),
+
+                #
+                #  Insert the new document into the database..
+                #
+                #  Note the use of the @types because Terminus currently has a bug with literal values in queries
+                #
+                WOQLQuery().woql_and(
+                              WOQLQuery().insert("v:Person_ID", "Person").label(person).
+                                  property("Name", {'@type' : 'xsd:string', '@value': person}).
+                                  property("Sex", {'@type' : 'xsd:string', '@value': sex}).
+                                  property("Parent1", {'@type' : 'xsd:string', '@value': mother}).
+                                  property("Parent2", {'@type' : 'xsd:string', '@value': father})
+                    )
+        )
+
+#
+#  Built just once,  and then each person's details bound into it
+#
+Person_Insert_Template = wary.QueryTemplate(build_person_insert, "person", "sex", "mother", "father")
+
+
+def insert_people(client, family, batch_size=wary.INSERT_BATCH_SIZE):
+    '''
+        Insert each person of an in-memory dataset into the database
+
+        Inserting each Person one at a time would involve a call out to the database,  and a transaction,  for
+        each person:  slow if there were a lot of data.  Instead the insertions are bundled together,  batch_size
+        people to each woql when clause (and so to each transaction).
+
+        :param client:      handle on the TerminusDB server
+        :param family:      dict,  of Person by name (or any iterable of (name, Person) pairs,  eg a generator)
+        :param batch_size:  integer, number of people inserted in each transaction
+        :return:            integer, number of people inserted
+    '''
+    print("[Inserting data into the database..]")
+    people = family.items() if isinstance(family, dict) else family
+    inserts = (Person_Insert_Template.bind_json(person=person, sex=value.sex, mother=value.mother, father=value.father)
+               for person, value in people)
+    return wary.bulk_insert(client, inserts, batch_size,
+                            progress=lambda done: print("[Inserted {:,} people..]".format(done)))
+
 
 #######################################################################################################################
 #
 #   Some illustrative woql queries
 #
 
-def list_people():
+def result_to_df(result, selects):
     '''
-        Return a dataframe with the name of each person
+        Convert a woql query result to a dataframe
+
+        :param result:      woql query result
+        :param selects:     list of the woql variables selected by the query
+        :return:            dataframe,  with a column for each selected variable
+    '''
+    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+
+
+def query_df(q, selects):
+    '''
+        Do a woql query,  and convert its result to a dataframe
+
+        :param q:           woql query
+        :param selects:     list of the woql variables selected by the query
+        :return:            dataframe,  with a column for each selected variable
+    '''
+    return result_to_df(wary.execute_query(q, client), selects)
+
+
+def list_people_query():
+    '''
+        Build the woql query used by list_people
+
+        :return:            woql query,  and the list of woql variables which it selects
     '''
     selects = ["v:Name", "v:Sex", "v:Parent1", "v:Parent2"]         # so we can return an empty dataframe if no data
     q = WOQLQuery().select(*selects).woql_and(
@@ -312,18 +401,22 @@ def list_people():
             WOQLQuery().triple("v:Person", "Parent1", "v:Parent1"),
             WOQLQuery().triple("v:Person", "Parent2", "v:Parent2")
     )
-    result = wary.execute_query(q, client)
-    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+    return q, selects
 
 
-def list_parents_of(child=None):
+def list_people():
     '''
-        Return a dataframe with the name of both parents of a child.
-        Of course, in real life, a child might have just a single parent, or be an orphan...
+        Return a dataframe with the name of each person
+    '''
+    return query_df(*list_people_query())
 
-        :param child:       string: woql variable or literal
-        :return:            If child is None, then a dataframe with all children and their respective parents.
-                            Otherwise, a dataframe with the two parents of the given child
+
+def list_parents_of_query(child=None):
+    '''
+        Build the woql query used by list_parents_of
+
+        :param child:       see list_parents_of
+        :return:            woql query,  and the list of woql variables which it selects
     '''
     selects = ["v:Child_Name", "v:P1_Name", "v:P2_Name"] if child is None else ["v:P1_Name", "v:P2_Name"]
 
@@ -338,18 +431,27 @@ def list_parents_of(child=None):
             WOQLQuery().triple("v:Parent1", "Name", "v:P1_Name"),
             WOQLQuery().triple("v:Parent2", "Name", "v:P2_Name")
         )
-    result = wary.execute_query(q, client)
-    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+    return q, selects
 
 
-def list_father_of(child=None):
+def list_parents_of(child=None):
     '''
-        Return a dataframe with the name of the father of a child.
-        Of course, in real life, a child might be an orphan...
+        Return a dataframe with the name of both parents of a child.
+        Of course, in real life, a child might have just a single parent, or be an orphan...
 
         :param child:       string: woql variable or literal
-        :return:            If child is None, then a dataframe with all children and their respective fathers.
-                            Otherwise, a dataframe with the father of the given child
+        :return:            If child is None, then a dataframe with all children and their respective parents.
+                            Otherwise, a dataframe with the two parents of the given child
+    '''
+    return query_df(*list_parents_of_query(child))
+
+
+def list_father_of_query(child=None):
+    '''
+        Build the woql query used by list_father_of
+
+        :param child:       see list_father_of
+        :return:            woql query,  and the list of woql variables which it selects
     '''
     selects = ["v:Child_Name", "v:Father_Name"] if child is None else ["v:Father_Name"]
 
@@ -363,18 +465,27 @@ def list_father_of(child=None):
             WOQLQuery().triple("v:Child", "Name", child),
             WOQLQuery().triple("v:Father", "Name", "v:Father_Name")
         )
-    result = wary.execute_query(q, client)
-    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+    return q, selects
 
 
-def list_mother_of(child=None):
+def list_father_of(child=None):
     '''
-        Return a dataframe with the name of the mother of a child.
+        Return a dataframe with the name of the father of a child.
         Of course, in real life, a child might be an orphan...
 
         :param child:       string: woql variable or literal
-        :return:            If child is None, then a dataframe with all children and their respective mothers.
-                            Otherwise, a dataframe with the mother of the given child
+        :return:            If child is None, then a dataframe with all children and their respective fathers.
+                            Otherwise, a dataframe with the father of the given child
+    '''
+    return query_df(*list_father_of_query(child))
+
+
+def list_mother_of_query(child=None):
+    '''
+        Build the woql query used by list_mother_of
+
+        :param child:       see list_mother_of
+        :return:            woql query,  and the list of woql variables which it selects
     '''
     selects = ["v:Child_Name", "v:Mother_Name"] if child is None else ["v:Mother_Name"]
 
@@ -388,34 +499,52 @@ def list_mother_of(child=None):
             WOQLQuery().triple("v:Child", "Name", child),
             WOQLQuery().triple("v:Mother", "Name", "v:Mother_Name")
         )
-    result = wary.execute_query(q, client)
-    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+    return q, selects
 
 
-def list_children_of(parent):
+def list_mother_of(child=None):
     '''
-        Return a dataframe with the names of the children of a parent.
+        Return a dataframe with the name of the mother of a child.
+        Of course, in real life, a child might be an orphan...
 
-        :param parent:      string: name of a parent
+        :param child:       string: woql variable or literal
         :return:            If child is None, then a dataframe with all children and their respective mothers.
                             Otherwise, a dataframe with the mother of the given child
     '''
+    return query_df(*list_mother_of_query(child))
+
+
+def list_children_of_query(parent):
+    '''
+        Build the woql query used by list_children_of
+
+        :param parent:      see list_children_of
+        :return:            woql query,  and the list of woql variables which it selects
+    '''
     selects = ["v:Child_Name"]
     q = WOQLQuery().select(*selects).woql_and(
             children_of(parent)
         )
-    result = wary.execute_query(q, client)
-    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+    return q, selects
 
 
-def list_grandmothers_of(child=None):
+def list_children_of(parent):
     '''
-        Return a dataframe with the names of the grandmothers of a child.
-        Of course, in real life, a child might have 0,1 or 2 grandmothers
+        Return a dataframe with the names of the children of a parent.
 
-        :param child:       string: woql variable or literal
-        :return:            If child is None, then a dataframe with all children and their respective grandmothers.
-                            Otherwise, a dataframe with the grandmothers of the given child
+        :param parent:      string: name of a parent
+        :return:            If child is None, then a dataframe with all children and their respective mothers.
+                            Otherwise, a dataframe with the mother of the given child
+    '''
+    return query_df(*list_children_of_query(parent))
+
+
+def list_grandmothers_of_query(child=None):
+    '''
+        Build the woql query used by list_grandmothers_of
+
+        :param child:       see list_grandmothers_of
+        :return:            woql query,  and the list of woql variables which it selects
     '''
     selects = ["v:Child_Name", "v:GMother1_Name", "v:GMother2_Name"] if child is None else ["v:GMother1_Name", "v:GMother2_Name"]
 
@@ -430,18 +559,27 @@ def list_grandmothers_of(child=None):
             WOQLQuery().triple("v:GMother1", "Name", "v:GMother1_Name"),
             WOQLQuery().triple("v:GMother2", "Name", "v:GMother2_Name")
         )
-    result = wary.execute_query(q, client)
-    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+    return q, selects
 
 
-def list_grandfathers_of(child=None):
+def list_grandmothers_of(child=None):
     '''
-        Return a dataframe with the names of the grandfathers of a child.
-        Of course, in real life, a child might have 0,1 or 2 grandfathers.
+        Return a dataframe with the names of the grandmothers of a child.
+        Of course, in real life, a child might have 0,1 or 2 grandmothers
 
         :param child:       string: woql variable or literal
-        :return:            If child is None, then a dataframe with all children and their respective grandfather.
-                            Otherwise, a dataframe with the grandfathers of the given child.
+        :return:            If child is None, then a dataframe with all children and their respective grandmothers.
+                            Otherwise, a dataframe with the grandmothers of the given child
+    '''
+    return query_df(*list_grandmothers_of_query(child))
+
+
+def list_grandfathers_of_query(child=None):
+    '''
+        Build the woql query used by list_grandfathers_of
+
+        :param child:       see list_grandfathers_of
+        :return:            woql query,  and the list of woql variables which it selects
     '''
     selects = ["v:Child_Name", "v:GFather1_Name", "v:GFather2_Name"] if child is None else ["v:GFather1_Name", "v:GFather2_Name"]
 
@@ -456,24 +594,44 @@ def list_grandfathers_of(child=None):
             WOQLQuery().triple("v:GFather1", "Name", "v:GFather1_Name"),
             WOQLQuery().triple("v:GFather2", "Name", "v:GFather2_Name")
         )
-    result = wary.execute_query(q, client)
-    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+    return q, selects
 
 
-def list_grandchildren_of(gParent):
+def list_grandfathers_of(child=None):
     '''
-        Return a dataframe with the names of the grandchildren of a grandparent.
+        Return a dataframe with the names of the grandfathers of a child.
+        Of course, in real life, a child might have 0,1 or 2 grandfathers.
 
-        :param gParent:     string: name of a grandparent
-        :return:            a dataframe with all the grandchildren
+        :param child:       string: woql variable or literal
+        :return:            If child is None, then a dataframe with all children and their respective grandfather.
+                            Otherwise, a dataframe with the grandfathers of the given child.
+    '''
+    return query_df(*list_grandfathers_of_query(child))
+
+
+def list_grandchildren_of_query(gParent):
+    '''
+        Build the woql query used by list_grandchildren_of
+
+        :param gParent:     see list_grandchildren_of
+        :return:            woql query,  and the list of woql variables which it selects
     '''
 
     selects = ["v:Child_Name"]
     q = WOQLQuery().select(*selects).woql_and(
             grandchildren_of(gParent)
         )
-    result = wary.execute_query(q, client)
-    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+    return q, selects
+
+
+def list_grandchildren_of(gParent):
+    '''
+        Return a dataframe with the names of the grandchildren of a grandparent.
+
+        :param gParent:     string: name of a grandparent
+        :return:            a dataframe with all the grandchildren
+    '''
+    return query_df(*list_grandchildren_of_query(gParent))
 
 #######################################################################################################################
 
@@ -486,6 +644,7 @@ if __name__ == "__main__":
     client = woql.WOQLClient()
     try:
         print("[Connecting to the TerminusDB server..]")
+        wary.use_pooled_session(server_url)             # keep connections to the server alive between queries
         with wary.suppress_Terminus_diagnostics():
             client.connect(server_url, key)
     except Exception as e:
@@ -507,108 +666,41 @@ if __name__ == "__main__":
     #
     #  Use the in-memory dataset to initialise the database
     #
-    print("[Inserting data into the database..]")
-    for person, value in Family.items():
-
-        #
-        #  Build a woql query to insert each new instance of the Person document
-        #  into the database
-        #
-        #  The 'when' clause here wraps a transaction-write into the database..
-        #
-        answer = WOQLQuery().when(
-
-                    #
-                    #  Create a new TerminusDB identifier for the new document
-                    #
-                    WOQLQuery().woql_and(
-                                WOQLQuery().idgen("doc:Person", [person], "v:Person_ID"),
-                            ),
-
-                    #
-                    #  Insert the new document into the database..
-                    #
-                    #  Note the use of the @types because Terminus currently has a bug with literal values in queries
-                    #
-                    WOQLQuery().woql_and(
-                                  WOQLQuery().insert("v:Person_ID", "Person").label(person).
-                                      property("Name", {'@type' : 'xsd:string', '@value': person}).
-                                      property("Sex", {'@type' : 'xsd:string', '@value': value.sex}).
-                                      property("Parent1", {'@type' : 'xsd:string', '@value': value.mother}).
-                                      property("Parent2", {'@type' : 'xsd:string', '@value': value.father})
-                        )
-            )
-
-        #
-        #  We are inserting each Person one at a time into Terminus:  each insertion
-        #  involves a call out to the database,  and would thus be slow if there were a lot of data..
-        #
-        #  We could instead change the woql when clause and both each woql_ands to bundle a number of
-        #  idgens and insertions for different documents together.  This then would be more efficient.
-        #
-        #  For you to try if you wish.. :-)
-        #
-        try:
-            print("[Inserting {}..]".format(person))
-            with wary.suppress_Terminus_diagnostics():
-                answer.execute(client)
-        except Exception as e:
-            wary.diagnose(e)
-
+    insert_people(client, Family)
 
 
     #
     #  Some sample queries..
     #
-
-    print("\nList people....")
-    df = list_people()
-    print("{:,} people found".format(df.shape[0]))
-
-    print("\nList all parents....")
-    df = list_parents_of()
-    print(df.to_string(index=False))
-
-    print("\nList Mary's parents....")
-    df = list_parents_of("Mary")
-    print(df.to_string(index=False))
-
-    print("\nList all fathers....")
-    df = list_father_of()
-    print(df.to_string(index=False))
-
-    print("\nList Mary's father....")
-    df = list_father_of("Mary")
-    print(df.to_string(index=False))
-
-    print("\nList all mothers....")
-    df = list_mother_of()
-    print(df.to_string(index=False))
-
-    print("\nList Mary's mother....")
-    df = list_mother_of("Mary")
-    print(df.to_string(index=False))
-
-    print("\nList Seamus's children....")
-    df = list_children_of("Seamus")
-    print(df.to_string(index=False))
-
-    print("\nList all grandmothers....")
-    df = list_grandmothers_of()
-    print(df.to_string(index=False))
-
-    print("\nList Joe's grandmothers....")
-    df = list_grandmothers_of("Joe")
-    print(df.to_string(index=False))
-
-    print("\nList all grandfathers....")
-    df = list_grandfathers_of()
-    print(df.to_string(index=False))
-
-    print("\nList Joe's grandfathers....")
-    df = list_grandfathers_of("Joe")
-    print(df.to_string(index=False))
-
-    print("\nList Roisin's grandchildren....")
-    df = list_grandchildren_of("Roisin")
-    print(df.to_string(index=False))
+    #  They are independent of each other,  so send them to the server as one concurrent batch,  and
+    #  then print their answers in turn:  each with its own way of showing a dataframe
+    #
+    def count_people(df):
+        return "{:,} people found".format(df.shape[0])
+
+    def table(df):
+        return df.to_string(index=False)
+
+    samples = [
+        ("List people....",                     list_people_query(),                    count_people),
+        ("List all parents....",                list_parents_of_query(),                table),
+        ("List Mary's parents....",             list_parents_of_query("Mary"),          table),
+        ("List all fathers....",                list_father_of_query(),                 table),
+        ("List Mary's father....",              list_father_of_query("Mary"),           table),
+        ("List all mothers....",                list_mother_of_query(),                 table),
+        ("List Mary's mother....",              list_mother_of_query("Mary"),           table),
+        ("List Seamus's children....",          list_children_of_query("Seamus"),       table),
+        ("List all grandmothers....",           list_grandmothers_of_query(),           table),
+        ("List Joe's grandmothers....",         list_grandmothers_of_query("Joe"),      table),
+        ("List all grandfathers....",           list_grandfathers_of_query(),           table),
+        ("List Joe's grandfathers....",         list_grandfathers_of_query("Joe"),      table),
+        ("List Roisin's grandchildren....",     list_grandchildren_of_query("Roisin"),  table)
+    ]
+    results, errors = wary.execute_many([q for _, (q, _), _ in samples], client)
+
+    for (title, (_, selects), show), result, error in zip(samples, results, errors):
+        print("\n" + title)
+        if error is not None:
+            wary.diagnose(error, exit_on_error=False)
+            continue
+        print(show(result_to_df(result, selects)))
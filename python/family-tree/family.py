@@ -9,6 +9,10 @@
 ##  April 2020
 ##
 
+import os
+import sys
+import argparse
+
 import pandas as pd
 
 from random import randint                          # used to overcome current lack of a scoping mechanism in woql
@@ -16,9 +20,9 @@ from random import randint                          # used to overcome current l
 
 import woqlclient.woqlClient as woql
 from woqlclient import WOQLQuery
-import woqlclient.errors as woqlError
 import woqlclient.woqlDataframe as wdf
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))     # for the shared woqlDiagnosis
 import woqlDiagnosis as wary
 
 
@@ -31,6 +35,10 @@ CSV                             = "https://raw.githubusercontent.com/Chrisjhorn/
                                                     # appropriately to reach this as a local file:  see
                                                     #    https://medium.com/terminusdb/loading-your-local-files-in-terminusdb-e0b5dfbe59b4
 
+MANIFEST_FILE                   = "family_manifest.json"
+                                                    # the rows last loaded,  when syncing (see sync_csv)
+UNKNOWN_PARENT                  = "unknown"         # the name given in the .csv for a parent who is not known
+
 server_url                      = "http://localhost:6363"
 dbId                            = "peopleDB"
 key                             = "root"
@@ -256,17 +264,16 @@ def apply_query_to_url(woqlGet, url):
     return woqlGet.file(url)
 
 
-def create_schema(client):
+def schema_query():
     '''
-        Build the schema.
+        The schema.
 
         For this example,  it is very simple:
         just a doctype for a Person with various attributes
 
-
-        :param client:      TerminusDB server handle
+        :return:            woql query which builds the schema
     '''
-    schema = WOQLQuery().when(True).woql_and(
+    return WOQLQuery().when(True).woql_and(
         WOQLQuery().doctype("Person").
             label("Person").description("Somebody").
             property("Name", "string").
@@ -274,10 +281,16 @@ def create_schema(client):
             property("Parent1", "string").
             property("Parent2", "string")
     )
+
+
+def create_schema(client):
+    '''
+        Build the schema
+        :param client:      TerminusDB server handle
+    '''
     try:
         print("[Building schema..]")
-        with wary.suppress_Terminus_diagnostics():
-            schema.execute(client)
+        wary.execute_query(schema_query(), client)
     except Exception as e:
         wary.diagnose(e)
 
@@ -332,7 +345,22 @@ def get_inserts():
       )
 
 
-def load_csv(client, url):
+def load_query(url):
+    '''
+        Build the query which reads a .csv file and uses its raw data to initialise a graph in the TerminusDB server
+
+        :param url:         string,  either a local file name or http-style url
+        :return:            woql query
+    '''
+    csv = get_csv_variables(url)
+    wrangles = get_wrangles()
+    inputs = WOQLQuery().woql_and(csv, *wrangles)
+    inserts = get_inserts()
+    return WOQLQuery().when(inputs, inserts)
+
+
+def load_csv(client, url, chunk_rows=wary.LOAD_CHUNK_ROWS, workers=wary.LOAD_WORKERS,
+             client_side=wary.LOAD_CLIENT_SIDE):
     '''
         Read a .csv file and use its raw data to initialise a graph in the TerminusDB server.
         In the case of a local file,  it should be the file path relative to the value of the
@@ -340,19 +368,60 @@ def load_csv(client, url):
 
         :param client:      handle on the TerminusDB server
         :param url:         string,  eiher a local file name or http-style url
+        :param chunk_rows:  integer,  if not 0,  load this many rows at a time,  each in a transaction of its own
+        :param workers:     integer,  number of those chunks loaded at the same time
+        :param client_side: boolean,  whether to read and parse the .csv file here,  rather than on the server
         :return:            None
     '''
-    csv = get_csv_variables(url)
-    wrangles = get_wrangles()
-    inputs = WOQLQuery().woql_and(csv, *wrangles)
-    inserts = get_inserts()
-    answer = WOQLQuery().when(inputs, inserts)
-    try:
-        print("[Loading raw data from '{}'..]".format(url))
-        with wary.suppress_Terminus_diagnostics():
-            answer.execute(client)
-    except woqlError.APIError as e:
-        wary.diagnose(e)
+    if client_side:
+        wary.load_csv_client_side(client, url, load_query,
+                                  chunk_rows or wary.INSERT_BATCH_SIZE, workers, wary.LOAD_PROCESSES)
+        return
+    if chunk_rows:
+        wary.load_csv_chunked(client, url, load_query, chunk_rows, workers)
+        return
+    print("[Loading raw data from '{}'..]".format(url))
+    wary.execute_query(load_query(url), client)
+
+
+def sync_csv(client, url):
+    '''
+        Bring the graph in the TerminusDB server up to date with a .csv file,  writing only what the rows added,
+        removed or changed since it was last synced add or take away (see woqlDiagnosis.sync_csv)
+
+        :param client:      handle on the TerminusDB server
+        :param url:         string,  either a local file name or http-style url
+        :return:            dict, the number of rows added,  removed and changed,  and of triples inserted and deleted
+    '''
+    return wary.sync_csv(client, url, load_query, "Nr", MANIFEST_FILE)
+
+
+def check_csv(url, exit_on_error=True):
+    '''
+        Check every row of a .csv file before it is loaded,  against the types which the schema declares and for
+        a parent who is not named in the file,  and report all the rows which fail...and then exit (see
+        woqlDiagnosis.check_csv)
+
+        :param url:             string,  either a local file name or http-style url
+        :param exit_on_error:   boolean, whether to exit if there are any problems
+        :return:                pandas DataFrame of the problems found
+    '''
+    return wary.check_csv(url, load_query, wary.declared_property_types(schema_query()),
+                          allowed={"Parent1": [UNKNOWN_PARENT], "Parent2": [UNKNOWN_PARENT]},
+                          references={"Parent1": "Name", "Parent2": "Name"}, exit_on_error=exit_on_error)
+
+
+def build_database(client, force_reload=False):
+    '''
+        Build the database from the raw .csv data:  unless it already holds the same schema and data,  when it is
+        kept as it is;  or,  with WOQL_SYNC set,  brought up to date with only the rows changed since (see
+        woqlDiagnosis.build_database()).
+
+        :param client:          TerminusDB server handle
+        :param force_reload:    boolean,  whether to rebuild the database regardless
+    '''
+    wary.build_database(client, dbId, "People", "People graphbase", schema_query(), {CSV: load_query(CSV)},
+                        check_csv, load_csv, sync_csv, MANIFEST_FILE, force_reload)
 
 
 #######################################################################################################################
@@ -360,9 +429,33 @@ def load_csv(client, url):
 #   Some illustrative woql queries
 #
 
-def list_people():
+def result_to_df(result, selects):
     '''
-        Return a dataframe with the name of each person
+        Convert a woql query result to a dataframe
+
+        :param result:      woql query result
+        :param selects:     list of the woql variables selected by the query
+        :return:            dataframe,  with a column for each selected variable
+    '''
+    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+
+
+def query_df(q, selects):
+    '''
+        Do a woql query,  and convert its result to a dataframe
+
+        :param q:           woql query
+        :param selects:     list of the woql variables selected by the query
+        :return:            dataframe,  with a column for each selected variable
+    '''
+    return result_to_df(wary.execute_query(q, client), selects)
+
+
+def list_people_query():
+    '''
+        Build the woql query used by list_people
+
+        :return:            woql query,  and the list of woql variables which it selects
     '''
     selects = ["v:Name", "v:Sex", "v:Parent1", "v:Parent2"]         # so we can return an empty dataframe if no data
     q = WOQLQuery().select(*selects).woql_and(
@@ -371,18 +464,22 @@ def list_people():
             WOQLQuery().triple("v:Person", "Parent1", "v:Parent1"),
             WOQLQuery().triple("v:Person", "Parent2", "v:Parent2")
     )
-    result = wary.execute_query(q, client)
-    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+    return q, selects
 
 
-def list_parents_of(child=None):
+def list_people():
     '''
-        Return a dataframe with the name of both parents of a child.
-        Of course, in real life, a child might have just a single parent, or be an orphan...
+        Return a dataframe with the name of each person
+    '''
+    return query_df(*list_people_query())
 
-        :param child:       string: woql variable or literal
-        :return:            If child is None, then a dataframe with all children and their respective parents.
-                            Otherwise, a dataframe with the two parents of the given child
+
+def list_parents_of_query(child=None):
+    '''
+        Build the woql query used by list_parents_of
+
+        :param child:       see list_parents_of
+        :return:            woql query,  and the list of woql variables which it selects
     '''
     selects = ["v:Child_Name", "v:P1_Name", "v:P2_Name"] if child is None else ["v:P1_Name", "v:P2_Name"]
 
@@ -397,18 +494,27 @@ def list_parents_of(child=None):
             WOQLQuery().triple("v:Parent1", "Name", "v:P1_Name"),
             WOQLQuery().triple("v:Parent2", "Name", "v:P2_Name")
         )
-    result = wary.execute_query(q, client)
-    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+    return q, selects
 
 
-def list_father_of(child=None):
+def list_parents_of(child=None):
     '''
-        Return a dataframe with the name of the father of a child.
-        Of course, in real life, a child might be an orphan...
+        Return a dataframe with the name of both parents of a child.
+        Of course, in real life, a child might have just a single parent, or be an orphan...
 
         :param child:       string: woql variable or literal
-        :return:            If child is None, then a dataframe with all children and their respective fathers.
-                            Otherwise, a dataframe with the father of the given child
+        :return:            If child is None, then a dataframe with all children and their respective parents.
+                            Otherwise, a dataframe with the two parents of the given child
+    '''
+    return query_df(*list_parents_of_query(child))
+
+
+def list_father_of_query(child=None):
+    '''
+        Build the woql query used by list_father_of
+
+        :param child:       see list_father_of
+        :return:            woql query,  and the list of woql variables which it selects
     '''
     selects = ["v:Child_Name", "v:Father_Name"] if child is None else ["v:Father_Name"]
 
@@ -422,18 +528,27 @@ def list_father_of(child=None):
             WOQLQuery().triple("v:Child", "Name", child),
             WOQLQuery().triple("v:Father", "Name", "v:Father_Name")
         )
-    result = wary.execute_query(q, client)
-    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+    return q, selects
 
 
-def list_mother_of(child=None):
+def list_father_of(child=None):
     '''
-        Return a dataframe with the name of the mother of a child.
+        Return a dataframe with the name of the father of a child.
         Of course, in real life, a child might be an orphan...
 
         :param child:       string: woql variable or literal
-        :return:            If child is None, then a dataframe with all children and their respective mothers.
-                            Otherwise, a dataframe with the mother of the given child
+        :return:            If child is None, then a dataframe with all children and their respective fathers.
+                            Otherwise, a dataframe with the father of the given child
+    '''
+    return query_df(*list_father_of_query(child))
+
+
+def list_mother_of_query(child=None):
+    '''
+        Build the woql query used by list_mother_of
+
+        :param child:       see list_mother_of
+        :return:            woql query,  and the list of woql variables which it selects
     '''
     selects = ["v:Child_Name", "v:Mother_Name"] if child is None else ["v:Mother_Name"]
 
@@ -447,34 +562,52 @@ def list_mother_of(child=None):
             WOQLQuery().triple("v:Child", "Name", child),
             WOQLQuery().triple("v:Mother", "Name", "v:Mother_Name")
         )
-    result = wary.execute_query(q, client)
-    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+    return q, selects
 
 
-def list_children_of(parent):
+def list_mother_of(child=None):
     '''
-        Return a dataframe with the names of the children of a parent.
+        Return a dataframe with the name of the mother of a child.
+        Of course, in real life, a child might be an orphan...
 
-        :param parent:      string: name of a parent
+        :param child:       string: woql variable or literal
         :return:            If child is None, then a dataframe with all children and their respective mothers.
                             Otherwise, a dataframe with the mother of the given child
     '''
+    return query_df(*list_mother_of_query(child))
+
+
+def list_children_of_query(parent):
+    '''
+        Build the woql query used by list_children_of
+
+        :param parent:      see list_children_of
+        :return:            woql query,  and the list of woql variables which it selects
+    '''
     selects = ["v:Child_Name"]
     q = WOQLQuery().select(*selects).woql_and(
             children_of(parent)
         )
-    result = wary.execute_query(q, client)
-    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+    return q, selects
 
 
-def list_grandmothers_of(child=None):
+def list_children_of(parent):
     '''
-        Return a dataframe with the names of the grandmothers of a child.
-        Of course, in real life, a child might have 0,1 or 2 grandmothers
+        Return a dataframe with the names of the children of a parent.
 
-        :param child:       string: woql variable or literal
-        :return:            If child is None, then a dataframe with all children and their respective grandmothers.
-                            Otherwise, a dataframe with the grandmothers of the given child
+        :param parent:      string: name of a parent
+        :return:            If child is None, then a dataframe with all children and their respective mothers.
+                            Otherwise, a dataframe with the mother of the given child
+    '''
+    return query_df(*list_children_of_query(parent))
+
+
+def list_grandmothers_of_query(child=None):
+    '''
+        Build the woql query used by list_grandmothers_of
+
+        :param child:       see list_grandmothers_of
+        :return:            woql query,  and the list of woql variables which it selects
     '''
     selects = ["v:Child_Name", "v:GMother1_Name", "v:GMother2_Name"] if child is None else ["v:GMother1_Name", "v:GMother2_Name"]
 
@@ -489,18 +622,27 @@ def list_grandmothers_of(child=None):
             WOQLQuery().triple("v:GMother1", "Name", "v:GMother1_Name"),
             WOQLQuery().triple("v:GMother2", "Name", "v:GMother2_Name")
         )
-    result = wary.execute_query(q, client)
-    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+    return q, selects
 
 
-def list_grandfathers_of(child=None):
+def list_grandmothers_of(child=None):
     '''
-        Return a dataframe with the names of the grandfathers of a child.
-        Of course, in real life, a child might have 0,1 or 2 grandfathers.
+        Return a dataframe with the names of the grandmothers of a child.
+        Of course, in real life, a child might have 0,1 or 2 grandmothers
 
         :param child:       string: woql variable or literal
-        :return:            If child is None, then a dataframe with all children and their respective grandfather.
-                            Otherwise, a dataframe with the grandfathers of the given child.
+        :return:            If child is None, then a dataframe with all children and their respective grandmothers.
+                            Otherwise, a dataframe with the grandmothers of the given child
+    '''
+    return query_df(*list_grandmothers_of_query(child))
+
+
+def list_grandfathers_of_query(child=None):
+    '''
+        Build the woql query used by list_grandfathers_of
+
+        :param child:       see list_grandfathers_of
+        :return:            woql query,  and the list of woql variables which it selects
     '''
     selects = ["v:Child_Name", "v:GFather1_Name", "v:GFather2_Name"] if child is None else ["v:GFather1_Name", "v:GFather2_Name"]
 
@@ -515,28 +657,52 @@ def list_grandfathers_of(child=None):
             WOQLQuery().triple("v:GFather1", "Name", "v:GFather1_Name"),
             WOQLQuery().triple("v:GFather2", "Name", "v:GFather2_Name")
         )
-    result = wary.execute_query(q, client)
-    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+    return q, selects
 
 
-def list_grandchildren_of(gParent):
+def list_grandfathers_of(child=None):
     '''
-        Return a dataframe with the names of the grandchildren of a grandparent.
+        Return a dataframe with the names of the grandfathers of a child.
+        Of course, in real life, a child might have 0,1 or 2 grandfathers.
 
-        :param gParent:     string: name of a grandparent
-        :return:            a dataframe with all the grandchildren
+        :param child:       string: woql variable or literal
+        :return:            If child is None, then a dataframe with all children and their respective grandfather.
+                            Otherwise, a dataframe with the grandfathers of the given child.
+    '''
+    return query_df(*list_grandfathers_of_query(child))
+
+
+def list_grandchildren_of_query(gParent):
+    '''
+        Build the woql query used by list_grandchildren_of
+
+        :param gParent:     see list_grandchildren_of
+        :return:            woql query,  and the list of woql variables which it selects
     '''
 
     selects = ["v:Child_Name"]
     q = WOQLQuery().select(*selects).woql_and(
             grandchildren_of(gParent)
         )
-    result = wary.execute_query(q, client)
-    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+    return q, selects
+
+
+def list_grandchildren_of(gParent):
+    '''
+        Return a dataframe with the names of the grandchildren of a grandparent.
+
+        :param gParent:     string: name of a grandparent
+        :return:            a dataframe with all the grandchildren
+    '''
+    return query_df(*list_grandchildren_of_query(gParent))
 
 #######################################################################################################################
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Woql demo using a (fictitious) family tree")
+    parser.add_argument("--force-reload", action="store_true",
+                        help="rebuild the database,  even if it already holds the same schema and data")
+    args = parser.parse_args()
 
     #
     #  Connect to TerminusDB, clean out any previous version of the charities database
@@ -545,78 +711,46 @@ if __name__ == "__main__":
     client = woql.WOQLClient()
     try:
         print("[Connecting to the TerminusDB server..]")
+        wary.use_pooled_session(server_url)             # keep connections to the server alive between queries
         with wary.suppress_Terminus_diagnostics():
             client.connect(server_url, key)
     except Exception as e:
         wary.diagnose(e)
-    try:
-        print("[Removing prior version of the database,  if it exists..]")
-        with wary.suppress_Terminus_diagnostics():
-            client.deleteDatabase(dbId)
-    except Exception as e:
-        print("[No prior database to delete]")
-    try:
-        print("[Creating new database..]")
-        with wary.suppress_Terminus_diagnostics():
-            client.createDatabase(dbId, "People", key=None, comment="People graphbase")
-    except Exception as e:
-        wary.diagnose(e)
-    create_schema(client)
-    load_csv(client, CSV)
+    build_database(client, args.force_reload)
 
 
     #
     #  Some sample queries..
     #
-
-    print("\nList people....")
-    df = list_people()
-    print("{:,} people found".format(df.shape[0]))
-
-    print("\nList all parents....")
-    df = list_parents_of()
-    print(df.to_string(index=False))
-
-    print("\nList Mary's parents....")
-    df = list_parents_of("Mary")
-    print(df.to_string(index=False))
-
-    print("\nList all fathers....")
-    df = list_father_of()
-    print(df.to_string(index=False))
-
-    print("\nList Mary's father....")
-    df = list_father_of("Mary")
-    print(df.to_string(index=False))
-
-    print("\nList all mothers....")
-    df = list_mother_of()
-    print(df.to_string(index=False))
-
-    print("\nList Mary's mother....")
-    df = list_mother_of("Mary")
-    print(df.to_string(index=False))
-
-    print("\nList Seamus's children....")
-    df = list_children_of("Seamus")
-    print(df.to_string(index=False))
-
-    print("\nList all grandmothers....")
-    df = list_grandmothers_of()
-    print(df.to_string(index=False))
-
-    print("\nList Joe's grandmothers....")
-    df = list_grandmothers_of("Joe")
-    print(df.to_string(index=False))
-
-    print("\nList all grandfathers....")
-    df = list_grandfathers_of()
-    print(df.to_string(index=False))
-
-    print("\nList Joe's grandfathers....")
-    df = list_grandfathers_of("Joe")
-    print(df.to_string(index=False))
-
-    print("\nList Roisin's grandchildren....")
-    df = list_grandchildren_of("Roisin")
-    print(df.to_string(index=False))
\ No newline at end of file
+    #  They are independent of each other,  so send them to the server as one concurrent batch,  and
+    #  then print their answers in turn:  each with its own way of showing a dataframe
+    #
+    def count_people(df):
+        return "{:,} people found".format(df.shape[0])
+
+    def table(df):
+        return df.to_string(index=False)
+
+    samples = [
+        ("List people....",                     list_people_query(),                    count_people),
+        ("List all parents....",                list_parents_of_query(),                table),
+        ("List Mary's parents....",             list_parents_of_query("Mary"),          table),
+        ("List all fathers....",                list_father_of_query(),                 table),
+        ("List Mary's father....",              list_father_of_query("Mary"),           table),
+        ("List all mothers....",                list_mother_of_query(),                 table),
+        ("List Mary's mother....",              list_mother_of_query("Mary"),           table),
+        ("List Seamus's children....",          list_children_of_query("Seamus"),       table),
+        ("List all grandmothers....",           list_grandmothers_of_query(),           table),
+        ("List Joe's grandmothers....",         list_grandmothers_of_query("Joe"),      table),
+        ("List all grandfathers....",           list_grandfathers_of_query(),           table),
+        ("List Joe's grandfathers....",         list_grandfathers_of_query("Joe"),      table),
+        ("List Roisin's grandchildren....",     list_grandchildren_of_query("Roisin"),  table)
+    ]
+    results, errors = wary.execute_many([q for _, (q, _), _ in samples], client)
+
+    for (title, (_, selects), show), result, error in zip(samples, results, errors):
+        print("\n" + title)
+        if error is not None:
+            wary.diagnose(error, exit_on_error=False)
+            continue
+        print(show(result_to_df(result, selects)))
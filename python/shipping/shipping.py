@@ -9,21 +9,26 @@
 ##  May 2020
 ##
 
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-from matplotlib.widgets import Slider
-import matplotlib.dates as mdt
 import datetime
 import sys
+import argparse
 import math
 import pandas as pd
 import os.path
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))     # for the shared woqlDiagnosis
 import woqlDiagnosis as wary
 import woqlclient.woqlClient as woql
 from woqlclient import WOQLQuery
-import woqlclient.errors as woqlError
-import woqlclient.woqlDataframe as wdf
+
+#
+#  matplotlib is only needed for the map and its animation:  so import it when they first use it,  leaving the
+#  loading and querying of the data free of it
+#
+plt = wary.lazy_import("matplotlib.pyplot")
+animation = wary.lazy_import("matplotlib.animation")
+mwidgets = wary.lazy_import("matplotlib.widgets")
+mdt = wary.lazy_import("matplotlib.dates")
 
 
 
@@ -39,6 +44,9 @@ DOCKINGS_CSV                        = "dockings.csv"
 
 MAP_FILE                        = "./port.png"
 
+MANIFEST_FILE                   = "shipping_manifest.json"
+                                                    # the rows last loaded,  when syncing (see sync_csv)
+
 server_url                      = "http://localhost:6363"
 dbId                            = "shippingDB"
 key                             = "root"
@@ -61,14 +69,25 @@ END_DATETIME            = datetime.datetime(2020, 4, 30, 15, 0, 0)  # end date/t
 
 
 #
-#  Derive some floating number equivalents of various tumes and intervals..
+#  Floating number equivalents of various times and intervals,  as used by the matplotlib plot:  see plot_times()
 #
-Start_DateTime_Num      = mdt.date2num(START_DATETIME)
-End_DateTime_Num        = mdt.date2num(END_DATETIME)
+Start_DateTime_Num      = None
+End_DateTime_Num        = None
+Transit_Time_Num        = None
+One_Second_Num          = None
 
 
-Transit_Time_Num = mdt.date2num(datetime.datetime(2020,4,2,12+TRANSIT_TIME,0,0)) - mdt.date2num(datetime.datetime(2020,4,2,12,0,0))
-One_Second_Num = mdt.date2num(datetime.datetime(2020,4,2,12,0,1)) - mdt.date2num(datetime.datetime(2020,4,2,12,0,0))
+def plot_times():
+    '''
+        Derive some floating number equivalents of various times and intervals..
+
+        Done when the plot is set up (rather than on import),  since it needs matplotlib
+    '''
+    global Start_DateTime_Num, End_DateTime_Num, Transit_Time_Num, One_Second_Num
+    Start_DateTime_Num = mdt.date2num(START_DATETIME)
+    End_DateTime_Num = mdt.date2num(END_DATETIME)
+    Transit_Time_Num = mdt.date2num(datetime.datetime(2020,4,2,12+TRANSIT_TIME,0,0)) - mdt.date2num(datetime.datetime(2020,4,2,12,0,0))
+    One_Second_Num = mdt.date2num(datetime.datetime(2020,4,2,12,0,1)) - mdt.date2num(datetime.datetime(2020,4,2,12,0,0))
 
 
 ########################################################################################################################
@@ -635,7 +654,12 @@ def active_Voyages(currentNumber, af=None):
     if len(df) == 0:
         return active, ships
 
-    for ship, shipdf in df.groupby("Ship"):
+    #
+    #  Convert all the start times to plot numbers in one go,  rather than ship by ship
+    #
+    df["Start_Num"] = mdt.date2num(df["Start"].values)
+
+    for ship, shipdf in df.groupby("Ship", observed=True):
         #
         #  For each ship currently operating..
         #
@@ -657,8 +681,8 @@ def active_Voyages(currentNumber, af=None):
             #  Derive the X and Y plot positions, based on the 'point' index
             #    value into the Route tables;  and process the ship
             #
-            start = shipdf["Start"].values[0]
-            point = int(NR_STEPS * ((currentNumber - mdt.date2num(start)) / Transit_Time_Num))
+            start = shipdf["Start_Num"].values[0]
+            point = int(NR_STEPS * ((currentNumber - start) / Transit_Time_Num))
             xPos = RoutesX[route][point]
             yPos = RoutesY[route][point]
             active.append((xPos, yPos))
@@ -811,9 +835,9 @@ def apply_query_to_url(woqlGet, url):
     return woqlGet.file(url)
 
 
-def create_schema(client):
+def schema_query():
     '''
-        Build the schema.
+        Build the schema query.
 
         For this demo,  there is a base document to capture ephemeral events.
 
@@ -825,7 +849,7 @@ def create_schema(client):
             'Ship_Event' document.  If instead it is placed in 'Voyage' and also in 'Base',  then
             TerminusDB will complain with a "class subsumption" error...
 
-        :param client:      TerminusDB server handle
+        :return:            woql query
     '''
 
     base = WOQLQuery().doctype("Ship_Event").label("Ship Event").description("An ephemeral")
@@ -839,15 +863,36 @@ def create_schema(client):
     docking = WOQLQuery().add_class("Docking").label("Docking").description("A ship docked at a berth").parent("Ship_Event")
     docking.property("berth", "string").label("Berth")
 
-    schema = WOQLQuery().when(True).woql_and(
+    return WOQLQuery().when(True).woql_and(
         base,
         docking,
         voyage
     )
+
+
+def schema_types():
+    '''
+        The type declared by the schema for each property,  used to type the columns of query results
+
+        :return:            dict, property name to type name
+    '''
+    global Schema_Types
+    if Schema_Types is None:
+        Schema_Types = wary.declared_property_types(schema_query())
+    return Schema_Types
+
+Schema_Types = None
+
+
+def create_schema(client):
+    '''
+        Build the schema
+
+        :param client:      TerminusDB server handle
+    '''
     try:
         print("[Building schema..]")
-        with wary.suppress_Terminus_diagnostics():
-            schema.execute(client)
+        wary.execute_query(schema_query(), client)
     except Exception as e:
         wary.diagnose(e)
 
@@ -922,7 +967,23 @@ def get_inserts(voyages):
 
 
 
-def load_csv(client, url, voyages):
+def load_query(url, voyages):
+    '''
+        Build the query which reads a .csv file and uses its raw data to initialise a graph in the TerminusDB server
+
+        :param url:         string,  either a local file name or http-style url
+        :param voyages:     boolean,  whether a Voyage or Berth document set are to be created
+        :return:            woql query
+    '''
+    csv = get_csv_variables(url, voyages)
+    wrangles = get_wrangles(voyages)
+    inputs = WOQLQuery().woql_and(csv, *wrangles)
+    inserts = get_inserts(voyages)
+    return WOQLQuery().when(inputs, inserts)
+
+
+def load_csv(client, url, voyages, chunk_rows=wary.LOAD_CHUNK_ROWS, workers=wary.LOAD_WORKERS,
+             client_side=wary.LOAD_CLIENT_SIDE):
     '''
         Read a .csv file and use its raw data to initialise a graph in the TerminusDB server.
         In the case of a local file,  it should be the file path relative to the value of the
@@ -931,33 +992,82 @@ def load_csv(client, url, voyages):
         :param client:      handle on the TerminusDB server
         :param url:         string,  eiher a local file name or http-style url
         :param voyages:     boolean,  whether a Voyage or Berth document set are to be created
+        :param chunk_rows:  integer,  if not 0,  load this many rows at a time,  each in a transaction of its own
+        :param workers:     integer,  number of those chunks loaded at the same time
+        :param client_side: boolean,  whether to read and parse the .csv file here,  rather than on the server
         :return:            None
     '''
-    csv = get_csv_variables(url, voyages)
-    wrangles = get_wrangles(voyages)
-    inputs = WOQLQuery().woql_and(csv, *wrangles)
-    inserts = get_inserts(voyages)
-    answer = WOQLQuery().when(inputs, inserts)
-    try:
-        print("[Loading raw data from '{}'..]".format(url))
-        with wary.suppress_Terminus_diagnostics():
-            answer.execute(client)
-    except woqlError.APIError as e:
-        wary.diagnose(e)
+    if client_side:
+        wary.load_csv_client_side(client, url, lambda chunk: load_query(chunk, voyages),
+                                  chunk_rows or wary.INSERT_BATCH_SIZE, workers, wary.LOAD_PROCESSES)
+        return
+    if chunk_rows:
+        wary.load_csv_chunked(client, url, lambda chunk: load_query(chunk, voyages), chunk_rows, workers)
+        return
+    print("[Loading raw data from '{}'..]".format(url))
+    wary.execute_query(load_query(url, voyages), client)
 
 
-#######################################################################################################################
+def sync_csv(client, url, voyages):
+    '''
+        Bring the graph in the TerminusDB server up to date with a .csv file,  writing only what the rows added,
+        removed or changed since it was last synced add or take away (see woqlDiagnosis.sync_csv)
 
-def query_status(time):
+        :param client:      handle on the TerminusDB server
+        :param url:         string,  either a local file name or http-style url
+        :param voyages:     boolean,  whether a Voyage or Berth document set are to be created
+        :return:            dict, the number of rows added,  removed and changed,  and of triples inserted and deleted
     '''
-        Query TerminusDB about the state of the system,  at a particular date/time
+    return wary.sync_csv(client, url, lambda chunk: load_query(chunk, voyages),
+                         "voyage" if voyages else "docking", MANIFEST_FILE, schema_types())
 
-        :param time:        string, date/time
-        :return:
+
+def check_csv(url, voyages, exit_on_error=True):
+    '''
+        Check every row of a .csv file before it is loaded,  against the types which the schema declares and the
+        routes and berths on the map,  and report all the rows which fail...and then exit (see
+        woqlDiagnosis.check_csv)
+
+        :param url:             string,  either a local file name or http-style url
+        :param voyages:         boolean,  whether the file holds Voyages or Berths
+        :param exit_on_error:   boolean, whether to exit if there are any problems
+        :return:                pandas DataFrame of the problems found
     '''
-    selects = ["v:Ship", "v:Start", "v:End", "v:Route", "v:Berth"]         # so we can return an empty dataframe if no data
+    return wary.check_csv(url, lambda chunk: load_query(chunk, voyages), schema_types(),
+                          allowed={"route": RoutesX} if voyages else {"berth": BerthsX},
+                          exit_on_error=exit_on_error)
 
-    q = WOQLQuery().select(*selects).woql_and(
+
+def build_database(client, force_reload=False):
+    '''
+        Build the database from the raw .csv data:  unless it already holds the same schema and data,  when it is
+        kept as it is;  or,  with WOQL_SYNC set,  brought up to date with only the rows changed since (see
+        woqlDiagnosis.build_database()).
+
+        :param client:          TerminusDB server handle
+        :param force_reload:    boolean,  whether to rebuild the database regardless
+    '''
+    voyages = {VOYAGES_CSV: True, DOCKINGS_CSV: False}  # whether each file holds Voyages,  or Dockings
+    wary.build_database(client, dbId, "Shipping", "Shipping graphbase", schema_query(),
+                        {url: load_query(url, v) for url, v in voyages.items()},
+                        lambda url: check_csv(url, voyages[url]),
+                        lambda client, url: load_csv(client, url, voyages[url]),
+                        lambda client, url: sync_csv(client, url, voyages[url]), MANIFEST_FILE, force_reload)
+
+
+#######################################################################################################################
+
+STATUS_SELECTS = ["v:Ship", "v:Start", "v:End", "v:Route", "v:Berth"]    # so we can return an empty dataframe if no data
+
+
+def status_query(time):
+    '''
+        Build the query used by query_status
+
+        :param time:        string, date/time as 'YYYY-MM-DD HH:MM:SS'
+        :return:            woql query
+    '''
+    return WOQLQuery().select(*STATUS_SELECTS).woql_and(
 
             #
             #  Look for Events with a start and end times
@@ -968,7 +1078,7 @@ def query_status(time):
             #
             #  Make v:Time the current date/time in which we're interested
             #
-            WOQLQuery().cast(literal_string(mdt.num2date(time).strftime('%Y-%m-%d %H:%M:%S')), "xsd:dateTime", "v:Time"),
+            WOQLQuery().cast(literal_string(time), "xsd:dateTime", "v:Time"),
 
             #
             #  Want the start time before the current time,  and end time after the current time
@@ -985,13 +1095,36 @@ def query_status(time):
             WOQLQuery().opt().triple("v:Event", "route", "v:Route"),
             WOQLQuery().opt().triple("v:Event", "berth", "v:Berth")
     )
+
+#
+#  The query is asked once per animation frame,  with only the time changing:  so build it just once
+#
+Status_Template = wary.QueryTemplate(status_query, "time")
+
+
+def query_status(time):
+    '''
+        Query TerminusDB about the state of the system,  at a particular date/time
+
+        :param time:        datetime,  or float, date/time (as a matplotlib date number)
+        :return:            dataframe of the ships,  their start and end times,  and their routes or berths
+    '''
+    if not isinstance(time, datetime.datetime):
+        time = mdt.num2date(time)
+    q = Status_Template.bind(time=time.strftime('%Y-%m-%d %H:%M:%S'))
     result = wary.execute_query(q, client)
-    return pd.DataFrame(columns=selects) if is_empty(result) else wdf.query_to_df(result)
+    if is_empty(result):
+        return pd.DataFrame(columns=STATUS_SELECTS)
+    return wary.bindings_to_df(result, Status_Template.variable_types(schema_types()))
 
 
 #######################################################################################################################
 #######################################################################################################################
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Woql demo of shipping movements at Dublin port")
+    parser.add_argument("--force-reload", action="store_true",
+                        help="rebuild the database,  even if it already holds the same schema and data")
+    args = parser.parse_args()
 
     #
     #  Connect to TerminusDB, clean out any previous version of the charities database
@@ -1000,29 +1133,18 @@ if __name__ == "__main__":
     client = woql.WOQLClient()
     try:
         print("[Connecting to the TerminusDB server..]")
+        wary.use_pooled_session(server_url)             # keep connections to the server alive between queries
         with wary.suppress_Terminus_diagnostics():
             client.connect(server_url, key)
     except Exception as e:
         wary.diagnose(e)
-    try:
-        print("[Removing prior version of the database,  if it exists..]")
-        with wary.suppress_Terminus_diagnostics():
-            client.deleteDatabase(dbId)
-    except Exception as e:
-        print("[No prior database to delete]")
-    try:
-        print("[Creating new database..]")
-        with wary.suppress_Terminus_diagnostics():
-            client.createDatabase(dbId, "Shipping", key=None, comment="Shipping graphbase")
-    except Exception as e:
-        wary.diagnose(e)
-    create_schema(client)
+    build_database(client, args.force_reload)
 
     #
-    #  Read the two raw data sets into TerminusDB.
+    #  The animation loops around the same slider values,  so cache the status of each one
     #
-    load_csv(client, VOYAGES_CSV, True)
-    load_csv(client, DOCKINGS_CSV, False)
+    plot_times()
+    wary.enable_result_cache(max_entries=int((End_DateTime_Num - Start_DateTime_Num) / scale) + 1)
 
     #
     #  Build the basic plot map
@@ -1055,7 +1177,7 @@ if __name__ == "__main__":
     axfreq = plt.axes([0.25, 0.1, 0.65, 0.03], facecolor=axcolor)
     initVal = Start_DateTime_Num
     stepSize = (End_DateTime_Num - Start_DateTime_Num) / NR_STEPS
-    sfreq = Slider(axfreq, 'Time', Start_DateTime_Num, End_DateTime_Num, valinit=initVal, valstep=stepSize)
+    sfreq = mwidgets.Slider(axfreq, 'Time', Start_DateTime_Num, End_DateTime_Num, valinit=initVal, valstep=stepSize)
     sfreq.valtext.set_visible(False)
     txt = ax.text(-6.190000, 53.33500, sliderToDateTime(initVal))
     sfreq.on_changed(slider_changed)                                # attach slider click handler
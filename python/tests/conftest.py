@@ -0,0 +1,64 @@
+##
+##  Fixtures shared by the tests:  an in-process woqlStandin server (see benchmark/woqlStandin.py),  and a client
+##  connected to a fresh database in it for each test.
+##
+##  Usage (from the python directory):
+##      python -m pytest tests
+##
+
+import os
+import sys
+import shutil
+import tempfile
+
+import pytest
+
+HERE                    = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "..", "benchmark"))
+
+LOCAL_DIR               = tempfile.mkdtemp(prefix="woql_tests_")
+os.environ["TERMINUS_LOCAL"] = LOCAL_DIR        # where woqlDiagnosis reads and writes the server's local files
+
+import woqlStandin
+import woqlDiagnosis as wary
+
+
+KEY                     = "root"
+DB_ID                   = "tests"
+
+
+@pytest.fixture(scope="session")
+def standin():
+    '''
+        :return:    the stand-in server,  and its url
+    '''
+    server, url = woqlStandin.start_standin(local_dir=LOCAL_DIR)
+    wary.use_pooled_session(url, warm_up=0)
+    yield server, url
+    server.shutdown()
+    shutil.rmtree(LOCAL_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def local_dir(standin):
+    '''
+        :return:    the directory standing in for the server's local files
+    '''
+    return LOCAL_DIR
+
+
+@pytest.fixture
+def client(standin):
+    '''
+        :return:    a client connected to an empty database
+    '''
+    import woqlclient.woqlClient as woql
+
+    server, url = standin
+    client = woql.WOQLClient()
+    with wary.suppress_Terminus_diagnostics():
+        client.connect(url, KEY)
+        client.createDatabase(DB_ID, DB_ID, key=None, comment="tests")
+    yield client
+    server.databases.clear()
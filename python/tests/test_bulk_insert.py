@@ -0,0 +1,56 @@
+##
+##  Batched inserts (see woqlDiagnosis.bulk_insert()) must write just what the 'when' queries batched would have
+##  written one by one,  their variables renamed apart (see rename_variables()),  in one transaction per batch.
+##
+
+import pytest
+
+import woqlDiagnosis as wary
+from woqlclient import WOQLQuery
+
+
+def insert_person(nr, name):
+    return WOQLQuery().when(
+        WOQLQuery().idgen("doc:Person", [{"@type": "xsd:string", "@value": nr}], "v:Person_ID"),
+        WOQLQuery().add_triple("v:Person_ID", "scm:name", {"@type": "xsd:string", "@value": name})
+    )
+
+
+def triples(client):
+    result = wary.run_query(WOQLQuery().triple("v:S", "v:P", "v:O"), client, use_cache=False)
+    return sorted(wary.canonical_json(b) for b in result["bindings"])
+
+
+def test_rename_variables():
+    j = {"when": [{"eq": ["v:A", "v:B_1"]}, {"add_triple": ["v:A", "scm:name", {"@value": "Ann"}]}]}
+    assert wary.rename_variables(j, "_7") == {
+        "when": [{"eq": ["v:A_7", "v:B_1_7"]},
+                 {"add_triple": ["v:A_7", "scm:name", {"@value": "Ann"}]}]}
+    assert j["when"][0]["eq"] == ["v:A", "v:B_1"]               # the original is left alone
+
+
+def test_batched_when_writes_as_the_queries_would(client):
+    people = [("1", "Ann"), ("2", "Bob"), ("3", "Cy")]
+    for nr, name in people:
+        wary.run_query(insert_person(nr, name), client)
+    one_by_one = triples(client)
+    wary.run_query(WOQLQuery().when(WOQLQuery().triple("v:S", "v:P", "v:O"),
+                                    WOQLQuery().delete_triple("v:S", "v:P", "v:O")), client)
+    wary.run_query(wary.batched_when([insert_person(nr, name) for nr, name in people]), client)
+    assert triples(client) == one_by_one
+    assert len(one_by_one) == len(people)
+    with pytest.raises(ValueError):
+        wary.batched_when([WOQLQuery().triple("v:S", "v:P", "v:O")])
+
+
+def test_bulk_insert_in_batches(client, monkeypatch):
+    transactions = []
+    execute_query = wary.execute_query
+    monkeypatch.setattr(wary, "execute_query", lambda q, *args, **kwargs: (transactions.append(q),
+                                                                           execute_query(q, *args, **kwargs))[1])
+    done = []
+    people = (insert_person(str(nr), "person {}".format(nr)) for nr in range(7))
+    assert wary.bulk_insert(client, people, batch_size=3, progress=done.append) == 7
+    assert done == [3, 6, 7]
+    assert len(transactions) == 3
+    assert len(triples(client)) == 7
@@ -0,0 +1,82 @@
+##
+##  A .csv file loaded client-side (see woqlDiagnosis.load_csv_client_side()) must write just the triples which the
+##  server's own load of it would:  with the documents given the server's own ids,  however their keys are spelt.
+##
+
+import os
+import csv
+
+import woqlDiagnosis as wary
+from woqlclient import WOQLQuery
+
+
+ROWS                    = [
+    ["Id",          "Name",     "Born",     "Club"],
+    ["p1",          "Ann",      "1970",     "chess_club"],
+    ["p_2",         "Bob",      "1971",     "chess_club"],
+    ["p/3",         "Cy",       "1972",     "Bob's (go) club"],
+    ["p 4",         "Di",       "1973",     "Bob's (go) club"],
+    ["p'5",         "Ed",       "1974",     "rowing/sculls"],
+    ["p%6",         "Flo",      "1975",     "chess\\_club"],
+    ["pé7",         "Gé",       "1976",     "café society"],
+]
+
+
+def schema_query():
+    return WOQLQuery().woql_and(
+        WOQLQuery().doctype("Person").
+            property("name", "string").
+            property("born", "decimal").
+            property("member_of", "Club"),
+        WOQLQuery().doctype("Club").
+            property("club_name", "string")
+    )
+
+
+def load_query(url):
+    return WOQLQuery().when(
+        WOQLQuery().woql_and(
+            WOQLQuery().get(
+                WOQLQuery().woql_as("Id", "v:Id").
+                            woql_as("Name", "v:Name").
+                            woql_as("Born", "v:Born").
+                            woql_as("Club", "v:Club")
+            ).file("/app/local_files/" + url),
+            WOQLQuery().idgen("doc:Person", ["v:Id"], "v:Person_ID"),
+            WOQLQuery().idgen("doc:Club", ["v:Club"], "v:Club_ID"),
+            WOQLQuery().cast("v:Born", "xsd:decimal", "v:Born_Number")
+        ),
+        WOQLQuery().woql_and(
+            WOQLQuery().insert("v:Person_ID", "Person").label("v:Name").
+                property("name", "v:Name").
+                property("born", "v:Born_Number").
+                property("member_of", "v:Club_ID"),
+            WOQLQuery().insert("v:Club_ID", "Club").label("v:Club").
+                property("club_name", "v:Club")
+        )
+    )
+
+
+def triples(client):
+    result = wary.run_query(WOQLQuery().triple("v:S", "v:P", "v:O"), client, use_cache=False)
+    return sorted(wary.canonical_json(b) for b in result["bindings"])
+
+
+def clear(client):
+    wary.run_query(WOQLQuery().when(WOQLQuery().triple("v:S", "v:P", "v:O"),
+                                    WOQLQuery().delete_triple("v:S", "v:P", "v:O")), client, use_cache=False)
+
+
+def test_client_side_load_matches_the_servers(client, local_dir):
+    wary.run_query(schema_query(), client)
+    url = "members.csv"
+    with open(os.path.join(local_dir, url), "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(ROWS)
+    wary.run_query(load_query(url), client, use_cache=False)
+    loaded = triples(client)
+
+    clear(client)
+    report = wary.load_csv_client_side(client, url, load_query, chunk_rows=3, workers=2, local_dir=local_dir)
+    assert (report["rows"], report["chunks"]) == (len(ROWS) - 1, 3)
+    assert triples(client) == loaded
+    assert len(loaded) == (len(ROWS) - 1) * 5 + 5 * 3       # each club's triples once,  for all its members
@@ -0,0 +1,40 @@
+##
+##  execute_many() (see woqlDiagnosis/__init__.py) must hand back each query's result or error in the order of the
+##  queries,  and carry on with the rest of a batch when one of them fails.
+##
+
+import pytest
+
+import woqlDiagnosis as wary
+import woqlclient.errors as woqlError
+from woqlclient import WOQLQuery
+
+
+def name_query(person):
+    return WOQLQuery().triple("doc:" + person, "scm:name", "v:Name")
+
+
+def bound_name(result):
+    (value,), = [b.values() for b in result["bindings"]]
+    return value["@value"] if isinstance(value, dict) else value
+
+
+def bad_query():
+    return WOQLQuery().json({"no_such_operator": []})
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_failing_query_does_not_stop_the_batch(client, max_workers):
+    for person, name in (("p1", "Ann"), ("p2", "Bob")):
+        wary.run_query(WOQLQuery().add_triple("doc:" + person, "scm:name",
+                                              {'@type': 'xsd:string', '@value': name}), client)
+    results, errors = wary.execute_many([name_query("p1"), bad_query(), name_query("p2")], client,
+                                        max_workers=max_workers, use_cache=False)
+    assert [e is None for e in errors] == [True, False, True]
+    assert isinstance(errors[1], woqlError.APIError)
+    assert results[1] is None
+    assert [bound_name(results[0]), bound_name(results[2])] == ["Ann", "Bob"]
+
+
+def test_empty_batch(client):
+    assert wary.execute_many([], client) == ([], [])
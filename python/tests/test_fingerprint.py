@@ -0,0 +1,86 @@
+##
+##  A demo's fingerprint (see woqlDiagnosis.store_fingerprint()) must be kept in the schema graph woqlclient writes,
+##  and read back;  a database which does not exist has none.  A start up (see woqlDiagnosis.build_database()) with
+##  a client which has only connected to the server must find the fingerprint,  and keep the database.
+##
+
+import os
+
+import pytest
+
+import woqlDiagnosis as wary
+import woqlclient.errors as woqlError
+from woqlclient import WOQLQuery
+
+
+def test_fingerprint_is_stored_in_the_schema(client):
+    assert wary.stored_fingerprint(client) is None
+    wary.store_fingerprint(client, "queries:data")
+    wary.store_fingerprint(client, "queries:other data")
+    assert wary.stored_fingerprint(client) == "queries:other data"
+    result = wary.run_query(WOQLQuery().quad(wary.FINGERPRINT_CLASS, "rdfs:comment", "v:C", "db:schema"), client,
+                            use_cache=False)
+    assert len(result["bindings"]) == 1
+
+
+def test_no_fingerprint_without_a_database(client, standin):
+    server, _ = standin
+    server.databases.clear()
+    assert wary.stored_fingerprint(client) is None
+
+
+def connected(url):
+    import woqlclient.woqlClient as woql
+
+    client = woql.WOQLClient()
+    with wary.suppress_Terminus_diagnostics():
+        client.connect(url, "root")
+    return client
+
+
+def test_no_database_chosen_is_an_error(standin):
+    _, url = standin
+    with pytest.raises(woqlError.InvalidURIError):
+        wary.stored_fingerprint(connected(url))
+
+
+def schema_query():
+    return WOQLQuery().doctype("Person").property("name", "string")
+
+
+def load_query(url):
+    return WOQLQuery().when(
+        WOQLQuery().woql_and(
+            WOQLQuery().get(WOQLQuery().woql_as("Id", "v:Id").woql_as("Name", "v:Name")).file(
+                "/app/local_files/" + url),
+            WOQLQuery().idgen("doc:Person", ["v:Id"], "v:Person_ID")
+        ),
+        WOQLQuery().insert("v:Person_ID", "Person").property("name", "v:Name")
+    )
+
+
+def start(url, csv_url, manifest):
+    '''
+        :return:    the triples in the database,  once a client which has only connected has built it
+    '''
+    client = connected(url)
+    wary.build_database(client, "warm", "Warm", "warm starts", schema_query(), {csv_url: load_query(csv_url)},
+                        lambda csv_url: None, lambda client, csv_url: wary.execute_query(load_query(csv_url), client),
+                        None, manifest)
+    result = wary.run_query(WOQLQuery().triple("v:S", "v:P", "v:O"), client, use_cache=False)
+    return sorted(wary.canonical_json(b) for b in result["bindings"])
+
+
+def test_second_start_keeps_the_database(standin, local_dir, capsys):
+    server, url = standin
+    with open(os.path.join(local_dir, "warm.csv"), "w") as f:
+        f.write("Id,Name\np1,Ann\np2,Bob\n")
+    manifest = os.path.join(local_dir, "warm_manifest.json")
+    try:
+        first = start(url, "warm.csv", manifest)
+        assert "[Creating new database..]" in capsys.readouterr().out
+        assert start(url, "warm.csv", manifest) == first
+        said = capsys.readouterr().out
+        assert "keeping it" in said and "[Creating new database..]" not in said
+    finally:
+        server.databases.clear()
@@ -0,0 +1,79 @@
+##
+##  The query optimizer (see woqlDiagnosis/optimizer.py) must leave the bindings of every query unchanged.  Each of
+##  the demos' queries (those of benchmark/optimizer_check.py) is run against its bundled data in the stand-in
+##  server as written,  and after each rewrite in turn,  planned both from the heuristic estimates and from the
+##  predicate statistics.
+##
+
+import os
+import io
+import sys
+import json
+import contextlib
+
+import pytest
+
+import woqlDiagnosis as wary
+from woqlclient import WOQLQuery
+from woqlDiagnosis.optimizer import optimize_json, heuristic_estimate, REWRITES
+
+import optimizer_check
+from scaling_bench import DEMOS, DEMOS_DIR, KEY
+
+
+@pytest.fixture(scope="module", params=sorted(optimizer_check.QUERIES))
+def loaded(request, standin, local_dir):
+    '''
+        :return:    the demo's name,  the demo,  a client connected to its database,  loaded at 1x,  and the
+                    statistics estimate for it
+    '''
+    import woqlclient.woqlClient as woql
+
+    server, url = standin
+    name = request.param
+    directory, module, _ = DEMOS[name]
+    sys.path.insert(0, os.path.join(DEMOS_DIR, directory))
+    with contextlib.redirect_stdout(io.StringIO()):
+        demo = __import__(module)
+    client = woql.WOQLClient()
+    with wary.suppress_Terminus_diagnostics():
+        client.connect(url, KEY)
+    demo.client = client
+    wary.enable_statistics(None)                    # so that the load marks its predicates to be counted
+    try:
+        optimizer_check.load(name, demo, client, local_dir, 1)
+        estimate = wary.statistics_estimate(client)
+    finally:
+        wary.disable_statistics()
+    yield name, demo, client, estimate
+    sys.path.remove(os.path.join(DEMOS_DIR, directory))
+    server.databases.clear()
+
+
+def run(j, client):
+    return wary.run_query(WOQLQuery().json(json.loads(json.dumps(j))), client, use_cache=False)
+
+
+@pytest.mark.parametrize("planner", ["heuristic", "statistics"])
+def test_rewrites_keep_bindings(loaded, planner):
+    name, demo, client, statistics = loaded
+    estimate = heuristic_estimate if planner == "heuristic" else statistics
+    for query, q in optimizer_check.QUERIES[name](demo):
+        written = wary.query_json(q)
+        expected = run(written, client)
+        assert wary.binding_count(expected) > 0, query
+        for i, rewrite in enumerate(REWRITES):
+            j = optimize_json(json.loads(json.dumps(written)), estimate, rewrites=REWRITES[:i + 1])
+            assert wary.same_bindings(run(j, client), expected), "{}:  {} changed the bindings".format(query, rewrite)
+
+
+def test_optimized_run_query_keeps_bindings(loaded):
+    name, demo, client, _ = loaded
+    queries = optimizer_check.QUERIES[name](demo)
+    expected = [wary.run_query(q, client, use_cache=False) for _, q in queries]
+    wary.enable_query_optimizer()
+    try:
+        for (query, q), e in zip(optimizer_check.QUERIES[name](demo), expected):
+            assert wary.same_bindings(wary.run_query(q, client, use_cache=False), e), query
+    finally:
+        wary.disable_query_optimizer()
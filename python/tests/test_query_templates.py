@@ -0,0 +1,62 @@
+##
+##  A QueryTemplate (see woqlDiagnosis/__init__.py) bound with some values must give just the query which building
+##  it with those values would,  without changing the template;  and must type its variables from the property
+##  types it is given each time.
+##
+
+import pytest
+
+import woqlDiagnosis as wary
+from woqlclient import WOQLQuery
+
+
+def people_named(name):
+    return WOQLQuery().woql_and(
+        WOQLQuery().triple("v:Person", "scm:name", {"@type": "xsd:string", "@value": name}),
+        WOQLQuery().triple("v:Person", "scm:age", "v:Age"),
+        WOQLQuery().triple("v:Person", "scm:nickname", {"@type": "xsd:string", "@value": name})
+    )
+
+
+def test_bind_json_matches_the_query_built():
+    template = wary.QueryTemplate(people_named, "name")
+    original = wary.canonical_json(template.compile().json)
+    for name in ("Ann", "Bob"):
+        assert template.bind_json(name=name) == wary.query_json(people_named(name))
+    assert wary.canonical_json(template.json) == original            # the template is left as it was
+
+
+def test_bind_keys_and_update():
+    template = wary.QueryTemplate(people_named, "name")
+    ann, bob = template.bind(name="Ann"), template.bind(name="Bob")
+    assert ann._woql_key != bob._woql_key
+    assert ann._woql_key == template.bind(name="Ann")._woql_key
+    assert ann._woql_update is False
+    add = wary.QueryTemplate(lambda name: WOQLQuery().add_triple("doc:p1", "scm:name",
+                                                                 {"@type": "xsd:string", "@value": name}), "name")
+    assert add.bind(name="Ann")._woql_update is True
+
+
+def test_missing_placeholder():
+    with pytest.raises(ValueError):
+        wary.QueryTemplate(lambda name, age: people_named(name), "name", "age").compile()
+
+
+def test_variable_types_follow_the_property_types():
+    template = wary.QueryTemplate(people_named, "name")
+    assert template.variable_types({"age": "integer"}) == {"Age": "integer"}
+    assert template.variable_types({"age": "decimal"}) == {"Age": "decimal"}
+    assert template.variable_types({"age": "integer"}) == {"Age": "integer"}
+
+
+def test_bound_query_runs(client):
+    for person, name, age in (("p1", "Ann", 40), ("p2", "Bob", 35)):
+        wary.run_query(WOQLQuery().woql_and(
+            WOQLQuery().add_triple("doc:" + person, "scm:name", {"@type": "xsd:string", "@value": name}),
+            WOQLQuery().add_triple("doc:" + person, "scm:nickname", {"@type": "xsd:string", "@value": name}),
+            WOQLQuery().add_triple("doc:" + person, "scm:age", {"@type": "xsd:integer", "@value": age})), client)
+    template = wary.QueryTemplate(people_named, "name")
+    for name, age in (("Ann", 40), ("Bob", 35)):
+        df = wary.bindings_to_df(wary.run_query(template.bind(name=name), client),
+                                 template.variable_types({"age": "integer"}))
+        assert list(df["Age"]) == [age]
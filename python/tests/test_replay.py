@@ -0,0 +1,58 @@
+##
+##  A recording of the traffic to the server (see woqlDiagnosis.record_transport()) must replay each query's own
+##  response,  under the query's own variable names,  however those were numbered in the run recorded;  and a query
+##  which was not recorded must fail rather than be given another's response.
+##
+
+import os
+
+import pytest
+import requests
+
+import woqlDiagnosis as wary
+from woqlclient import WOQLQuery
+
+
+def names_query(variable):
+    return WOQLQuery().triple("v:Person", "scm:name", variable)
+
+
+def add_name(client, person, name):
+    wary.run_query(WOQLQuery().add_triple("doc:" + person, "scm:name", {'@type': 'xsd:string', '@value': name}), client)
+
+
+def names(result, variable):
+    key = "http://terminusdb.com/woql/variable/" + variable[2:]
+    return sorted(b[key]["@value"] for b in result["bindings"])
+
+
+def run(client, suffixes):
+    add_name(client, "p1", "Ann")
+    first = wary.run_query(names_query("v:Name" + suffixes[0]), client, use_cache=False)
+    add_name(client, "p2", "Bob")
+    second = wary.run_query(names_query("v:Name" + suffixes[1]), client, use_cache=False)
+    return names(first, "v:Name" + suffixes[0]), names(second, "v:Name" + suffixes[1])
+
+
+@pytest.fixture
+def transport():
+    '''
+        :return:    function to restore the session's own transport adapter,  which is also done afterwards
+    '''
+    adapter = wary._session.get_adapter("http://")
+    restore = lambda: wary._mount(adapter)
+    yield restore
+    restore()
+
+
+def test_replay_renames_variables(client, local_dir, transport):
+    path = os.path.join(local_dir, "recording.jsonl.gz")
+    recorder = wary.record_transport(path)
+    recorded = run(client, ("123", "4567"))
+    recorder.close()
+    transport()
+
+    wary.replay_transport(path)
+    with pytest.raises(requests.exceptions.ConnectionError):      # while the recorded responses are all unused
+        wary.run_query(WOQLQuery().triple("v:Person", "scm:age", "v:Age"), client, use_cache=False)
+    assert run(client, ("98", "7")) == recorded == (["Ann"], ["Ann", "Bob"])
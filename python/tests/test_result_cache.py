@@ -0,0 +1,71 @@
+##
+##  The result cache (see woqlDiagnosis.enable_result_cache()) must never hand back a result which a write has made
+##  stale:  not even that of a read which was in flight while the write was made.
+##
+
+import threading
+
+import pytest
+
+import woqlDiagnosis as wary
+from woqlclient import WOQLQuery
+
+
+class HeldRead(WOQLQuery):
+    '''
+        A read query which,  once the server has answered it,  waits to be released before returning its result
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self.answered = threading.Event()
+        self.release = threading.Event()
+
+    def execute(self, client, fileList=None):
+        result = super().execute(client, fileList)
+        self.answered.set()
+        self.release.wait(10)
+        return result
+
+
+def names_query(q=None):
+    return (q or WOQLQuery()).triple("v:Person", "scm:name", "v:Name")
+
+
+def names(result):
+    values = [{wary.local_name(k): v for k, v in b.items()}["Name"] for b in result["bindings"]]
+    return sorted(v["@value"] if isinstance(v, dict) else v for v in values)
+
+
+def add_name(client, person, name):
+    wary.run_query(WOQLQuery().add_triple("doc:" + person, "scm:name", {'@type': 'xsd:string', '@value': name}), client)
+
+
+@pytest.fixture
+def cache():
+    yield wary.enable_result_cache()
+    wary.disable_result_cache()
+
+
+def test_write_empties_cache(client, cache):
+    add_name(client, "p1", "Ann")
+    assert names(wary.run_query(names_query(), client)) == ["Ann"]
+    assert names(wary.run_query(names_query(), client)) == ["Ann"]
+    assert cache.stats()["hits"] == 1
+    add_name(client, "p2", "Bob")
+    assert names(wary.run_query(names_query(), client)) == ["Ann", "Bob"]
+
+
+def test_read_in_flight_during_write_is_not_cached(client, cache):
+    add_name(client, "p1", "Ann")
+    held = names_query(HeldRead())
+    results = []
+    reader = threading.Thread(target=lambda: results.append(wary.run_query(held, client)))
+    reader.start()
+    assert held.answered.wait(10)
+    add_name(client, "p2", "Bob")                   # made after the read was answered,  but before it is cached
+    held.release.set()
+    reader.join(10)
+    assert names(results[0]) == ["Ann"]
+    assert cache.stats()["entries"] == 0
+    assert names(wary.run_query(names_query(), client)) == ["Ann", "Bob"]
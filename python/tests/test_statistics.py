@@ -0,0 +1,36 @@
+##
+##  The statistics catalog (see woqlDiagnosis/catalog.py) must mark as stale the statistics of every predicate which
+##  an update query writes to,  however it is written.
+##
+
+import woqlDiagnosis as wary
+from woqlclient import WOQLQuery
+from woqlDiagnosis.catalog import StatisticsCatalog, written_predicates, ALL_PREDICATES
+
+
+def test_written_predicates():
+    assert written_predicates(wary.query_json(
+        WOQLQuery().insert("v:X", "Person").property("Name", "v:N"))) == {"rdf:type", "scm:Name"}
+    assert written_predicates(wary.query_json(WOQLQuery().woql_and(
+        WOQLQuery().add_quad("v:X", "scm:Name", "v:N", "db:main"),
+        WOQLQuery().delete_quad("v:X", "scm:Sex", "v:S", "db:main")))) == {"scm:Name", "scm:Sex"}
+    assert written_predicates({"update_quad": ["v:X", "scm:Name", "v:N", "db:main"]}) == {"scm:Name"}
+    assert written_predicates(wary.query_json(WOQLQuery().delete_triple("v:X", "v:P", "v:O"))) == {ALL_PREDICATES}
+    assert written_predicates({"delete_object": ["doc:x"]}) == {ALL_PREDICATES}
+
+
+def test_variable_predicate_makes_every_predicate_stale(client):
+    catalog = StatisticsCatalog(wary._scan_predicate)
+    database = wary._database_of(client)
+    wary.run_query(WOQLQuery().woql_and(
+        WOQLQuery().add_triple("doc:p1", "scm:Name", {"@type": "xsd:string", "@value": "Ann"}),
+        WOQLQuery().add_triple("doc:p1", "scm:Sex", {"@type": "xsd:string", "@value": "F"})), client)
+    catalog.refresh(client, database, ["scm:Name", "scm:Sex"])
+    assert catalog.statistics(database, "scm:Name")["triples"] == 1
+
+    delete = WOQLQuery().when(WOQLQuery().triple("doc:p1", "v:P", "v:O"), WOQLQuery().delete_triple("doc:p1", "v:P",
+                                                                                                    "v:O"))
+    wary.run_query(delete, client)
+    catalog.note_update(database, wary.query_json(delete))
+    assert catalog.refresh_stale(client, database).keys() == {"scm:Name", "scm:Sex"}
+    assert catalog.statistics(database, "scm:Name")["triples"] == 0
@@ -0,0 +1,83 @@
+##
+##  Streamed query results (see woqlDiagnosis.stream_bindings()) must be decoded from the top level 'bindings' key
+##  however the response is split up,  and the stream must count towards the queries in flight,  and be answered
+##  from the result cache,  as run_query() is.
+##
+
+import json
+import threading
+
+import woqlDiagnosis as wary
+from woqlclient import WOQLQuery
+
+
+RESPONSE                = {"terminus:message": 'not the "bindings": [1, 2] wanted',
+                           "graphs": {"bindings": [{"x": 0}]},
+                           "count": 12345,
+                           "bindings": [{"a": 1, "b": "]"}, {"a": 2.5, "b": {"c": [3, 4]}}, {"a": None}],
+                           "inserts": 0}
+
+
+def pieces(text, size):
+    data = text.encode("utf-8")
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_iter_json_array_finds_the_top_level_key():
+    text = json.dumps(RESPONSE, indent=1)
+    for size in (1, 2, 7, 64, len(text)):
+        assert list(wary.iter_json_array(pieces(text, size))) == RESPONSE["bindings"]
+
+
+def test_iter_json_array_without_the_key():
+    text = json.dumps({"terminus:status": "terminus:success", "graphs": {"bindings": [1]}})
+    assert list(wary.iter_json_array(pieces(text, 3))) == []
+    assert list(wary.iter_json_array([])) == []
+
+
+def names_query():
+    return WOQLQuery().triple("v:Person", "scm:name", "v:Name")
+
+
+def add_names(client, n):
+    for i in range(n):
+        wary.run_query(WOQLQuery().add_triple("doc:p{}".format(i), "scm:name",
+                                              {'@type': 'xsd:string', '@value': "name {}".format(i)}), client)
+
+
+def test_stream_matches_run_query(client):
+    add_names(client, 5)
+    streamed = list(wary.stream_bindings(names_query(), client))
+    assert sorted(map(wary.canonical_json, streamed)) == \
+        sorted(map(wary.canonical_json, wary.run_query(names_query(), client)["bindings"]))
+
+
+def test_stream_counts_towards_queries_in_flight(client):
+    add_names(client, 2)
+    wary.set_max_in_flight(1)
+    try:
+        stream = wary.stream_bindings(names_query(), client)
+        next(stream)
+        done = threading.Event()
+        reader = threading.Thread(target=lambda: (wary.run_query(names_query(), client, use_cache=False),
+                                                  done.set()))
+        reader.start()
+        assert not done.wait(0.5)                   # held back while the stream is open
+        stream.close()
+        assert done.wait(10)
+        reader.join(10)
+    finally:
+        wary.set_max_in_flight(wary.MAX_IN_FLIGHT)
+
+
+def test_stream_answered_from_the_cache(client, standin):
+    add_names(client, 3)
+    cache = wary.enable_result_cache()
+    try:
+        expected = wary.run_query(names_query(), client)["bindings"]
+        server, _ = standin
+        server.databases.clear()                    # so that only the cache can answer
+        assert list(wary.stream_bindings(names_query(), client)) == expected
+        assert cache.stats()["hits"] == 1
+    finally:
+        wary.disable_result_cache()
@@ -0,0 +1,141 @@
+##
+##  A database synced with a changed .csv file (see woqlDiagnosis.sync_csv()) must hold just the triples which a
+##  fresh load of the file would:  including for rows whose keys have characters an id must escape.  A start up
+##  (see woqlDiagnosis.build_database()) with a client which has only connected to the server must sync the
+##  database it kept,  as the one before it left it.
+##
+
+import os
+import csv
+
+import woqlDiagnosis as wary
+from woqlclient import WOQLQuery
+
+
+COLUMNS                 = ["Id", "Name", "Born", "Joined", "Club"]
+
+ROWS                    = [
+    ["p1",          "Ann",      "1970", "2001-02-03T00:00:00", "chess_club"],
+    ["p_2",         "Bob",      "1971", "2002-03-04T00:00:00", "chess_club"],
+    ["p/3",         "Cy",       "1972", "2003-04-05T00:00:00", "Bob's (go) club"],
+    ["p 4",         "Di",       "1973", "2004-05-06T00:00:00", "Bob's (go) club"],
+    ["p'5",         "Ed",       "1974", "2005-06-07T00:00:00", "rowing/sculls"],
+]
+
+CHANGED_ROWS            = [
+    ["p1",          "Ann",      "1970", "2001-02-03T00:00:00", "chess_club"],                 # unchanged
+    ["p_2",         "Bob",      "1980", "2002-03-04T00:00:00", "Bob's (go) club"],            # changed
+    ["p 4",         "Di",       "1973", "2004-05-06T00:00:00", "Bob's (go) club"],            # unchanged
+    ["p'5",         "Edward",   "1974", "2009-06-07T00:00:00", "rowing/sculls"],              # changed
+    ["p_(6)",       "Flo",      "1976", "2006-07-08T00:00:00", "chess\\_club"],               # added
+]                                                                                               # p/3 removed
+
+
+def schema_query():
+    return WOQLQuery().woql_and(
+        WOQLQuery().doctype("Person").
+            property("name", "string").
+            property("born", "decimal").
+            property("joined", "dateTime").
+            property("member_of", "Club"),
+        WOQLQuery().doctype("Club").
+            property("club_name", "string")
+    )
+
+
+def load_query(url):
+    return WOQLQuery().when(
+        WOQLQuery().woql_and(
+            WOQLQuery().get(
+                WOQLQuery().woql_as("Id", "v:Id").
+                            woql_as("Name", "v:Name").
+                            woql_as("Born", "v:Born").
+                            woql_as("Joined", "v:Joined").
+                            woql_as("Club", "v:Club")
+            ).file("/app/local_files/" + url),
+            WOQLQuery().idgen("doc:Person", ["v:Id"], "v:Person_ID"),
+            WOQLQuery().idgen("doc:Club", ["v:Club"], "v:Club_ID"),
+            WOQLQuery().cast("v:Joined", "xsd:dateTime", "v:Joined_Time")
+        ),
+        WOQLQuery().woql_and(
+            WOQLQuery().insert("v:Person_ID", "Person").label("v:Name").
+                property("name", "v:Name").
+                property("born", "v:Born").
+                property("joined", "v:Joined_Time").
+                property("member_of", "v:Club_ID"),
+            WOQLQuery().insert("v:Club_ID", "Club").label("v:Club").
+                property("club_name", "v:Club")
+        )
+    )
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
+
+
+def triples(client):
+    result = wary.run_query(WOQLQuery().triple("v:S", "v:P", "v:O"), client, use_cache=False)
+    return sorted(wary.canonical_json(b) for b in result["bindings"])
+
+
+def fresh_load(client, url):
+    wary.run_query(WOQLQuery().when(WOQLQuery().triple("v:S", "v:P", "v:O"),
+                                    WOQLQuery().delete_triple("v:S", "v:P", "v:O")), client, use_cache=False)
+    wary.run_query(load_query(url), client, use_cache=False)
+    return triples(client)
+
+
+def test_sync_matches_fresh_load(client, local_dir):
+    wary.run_query(schema_query(), client)
+    types = wary.declared_property_types(schema_query())
+    url = "people.csv"
+    path = os.path.join(local_dir, url)
+    manifest = os.path.join(local_dir, "people_manifest.json")
+    write_csv(path, ROWS)
+
+    report = wary.sync_csv(client, url, load_query, "Id", manifest, types, local_dir)
+    assert report["added"] == len(ROWS)
+    assert wary.sync_csv(client, url, load_query, "Id", manifest, types, local_dir)["inserted"] == 0
+
+    write_csv(path, CHANGED_ROWS)
+    report = wary.sync_csv(client, url, load_query, "Id", manifest, types, local_dir)
+    assert (report["added"], report["removed"], report["changed"]) == (1, 1, 2)
+    assert report["deleted"] and report["inserted"]
+    synced = triples(client)
+    assert synced == fresh_load(client, url)
+    os.remove(manifest)
+
+
+def test_sync_through_separate_clients(standin, local_dir, monkeypatch, capsys):
+    import woqlclient.woqlClient as woql
+
+    monkeypatch.setattr(wary, "SYNC_LOADS", True)
+    server, server_url = standin
+    types = wary.declared_property_types(schema_query())
+    url = "members.csv"
+    manifest = os.path.join(local_dir, "members_manifest.json")
+
+    def start(rows):
+        write_csv(os.path.join(local_dir, url), rows)
+        client = woql.WOQLClient()
+        with wary.suppress_Terminus_diagnostics():
+            client.connect(server_url, "root")
+        wary.build_database(client, "members", "Members", "syncs", schema_query(), {url: load_query(url)},
+                            lambda url: None, None,
+                            lambda client, url: wary.sync_csv(client, url, load_query, "Id", manifest, types,
+                                                              local_dir), manifest)
+        return client, capsys.readouterr().out
+
+    try:
+        _, said = start(ROWS)
+        assert "[Creating new database..]" in said
+        client, said = start(CHANGED_ROWS)
+        assert "[Syncing '{}':  1 rows added,  1 removed,  2 changed".format(url) in said
+        assert "[Creating new database..]" not in said
+        assert triples(client) == fresh_load(client, url)
+    finally:
+        server.databases.clear()
+        wary.remove_manifest(manifest)
@@ -0,0 +1,69 @@
+##
+##  bindings_to_df() (see woqlDiagnosis/__init__.py) must give each column the type of its values:  from the
+##  types given,  or else from the '@type' of the values themselves;  and a query's columns must be typed from the
+##  schema by typed_query_to_df().
+##
+
+import pandas as pd
+
+import woqlDiagnosis as wary
+from woqlclient import WOQLQuery
+
+
+VARIABLE                = "http://terminusdb.com/woql/variable/"
+
+
+def literal(ty, value):
+    return {"@type": "http://www.w3.org/2001/XMLSchema#" + ty, "@value": value}
+
+
+BINDINGS                = [
+    {VARIABLE + "Person": "doc:p1", VARIABLE + "Age": literal("integer", 40),
+     VARIABLE + "Height": literal("decimal", 1.75), VARIABLE + "Born": literal("dateTime", "1980-01-02T03:04:05"),
+     VARIABLE + "Name": literal("string", "Ann"), VARIABLE + "Code": literal("string", "7")},
+    {VARIABLE + "Person": "doc:p2", VARIABLE + "Age": literal("integer", 35),
+     VARIABLE + "Height": literal("decimal", 1.8), VARIABLE + "Born": literal("dateTime", "1985-06-07T00:00:00"),
+     VARIABLE + "Name": literal("string", "Bob"), VARIABLE + "Code": literal("string", "8")},
+]
+
+
+def test_columns_typed_from_their_values():
+    df = wary.bindings_to_df({"bindings": BINDINGS})
+    assert list(df.columns) == ["Person", "Age", "Height", "Born", "Name", "Code"]
+    assert df["Age"].dtype == "int64"
+    assert df["Height"].dtype == "float64"
+    assert df["Born"].dtype == "datetime64[ns]"
+    assert df["Born"][1] == pd.Timestamp("1985-06-07")
+    assert isinstance(df["Name"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["Person"].dtype, pd.CategoricalDtype)
+    assert list(df["Person"]) == ["doc:p1", "doc:p2"]
+
+
+def test_types_given_take_precedence():
+    df = wary.bindings_to_df(BINDINGS, {"Code": "integer"}, categorical=False)
+    assert df["Code"].dtype == "int64"
+    assert df["Name"].dtype == object
+
+
+def test_unknown_values_are_missing():
+    bindings = [dict(BINDINGS[0]), dict(BINDINGS[1])]
+    bindings[1][VARIABLE + "Age"] = "terminus:unknown"            # as an opt() leaves it
+    df = wary.bindings_to_df(bindings)
+    assert str(df["Age"].dtype) == "Int64"
+    assert df["Age"][0] == 40 and pd.isna(df["Age"][1])
+    assert wary.bindings_to_df({"bindings": []}).empty
+
+
+def test_query_columns_typed_from_the_schema(client):
+    schema = WOQLQuery().doctype("Person").property("age", "integer").property("born", "dateTime")
+    wary.run_query(schema, client)
+    for person, age, born in (("p1", 40, "1980-01-02T03:04:05"), ("p2", 35, "1985-06-07T00:00:00")):
+        wary.run_query(WOQLQuery().woql_and(
+            WOQLQuery().add_triple("doc:" + person, "scm:age", {"@type": "xsd:integer", "@value": age}),
+            WOQLQuery().add_triple("doc:" + person, "scm:born", {"@type": "xsd:dateTime", "@value": born})), client)
+    q = WOQLQuery().woql_and(WOQLQuery().triple("v:Person", "scm:age", "v:Age"),
+                             WOQLQuery().triple("v:Person", "scm:born", "v:Born"))
+    df = wary.typed_query_to_df(q, wary.run_query(q, client), wary.declared_property_types(schema))
+    assert df["Age"].dtype == "int64"
+    assert df["Born"].dtype == "datetime64[ns]"
+    assert sorted(df["Age"]) == [35, 40]
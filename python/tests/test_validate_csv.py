@@ -0,0 +1,71 @@
+##
+##  validate_csv() (see woqlDiagnosis/__init__.py) must report every bad row of a .csv file,  by line,  before
+##  anything is loaded:  and nothing for a good file.
+##
+
+import os
+
+import woqlDiagnosis as wary
+from woqlclient import WOQLQuery
+
+
+COLUMNS                 = "Nr,Name,Parent,Born,Joined,Club\n"
+
+GOOD_ROWS               = ("1,Ann,unknown,1970,2001-02-03T00:00:00,chess\n"
+                           "2,Bob,Ann,1995,2002-03-04T00:00:00,go\n")
+
+BAD_ROWS                = ("3,,Ann,1971,2003-04-05T00:00:00,chess\n"               # line 4:  no name
+                           "4,Cy,Ann,19x1,2004-05-06T00:00:00,chess\n"             # line 5:  not a decimal
+                           "5,Di,Ann,1973,yesterday,chess\n"                       # line 6:  not a dateTime
+                           "6,Ed,Ann,1974,2006-07-08T00:00:00,bridge\n"            # line 7:  not an allowed club
+                           "7,Flo,Gus,1975,2007-08-09T00:00:00,go\n")              # line 8:  no such parent
+
+PROPERTY_TYPES          = {"name": "string", "born": "decimal", "parent": "Person", "joined": "dateTime"}
+
+
+def load_query(url):
+    return WOQLQuery().when(
+        WOQLQuery().woql_and(
+            WOQLQuery().get(
+                WOQLQuery().woql_as("Nr", "v:Nr").
+                            woql_as("Name", "v:Name").
+                            woql_as("Parent", "v:Parent").
+                            woql_as("Born", "v:Born").
+                            woql_as("Joined", "v:Joined").
+                            woql_as("Club", "v:Club")
+            ).file("/app/local_files/" + url),
+            WOQLQuery().idgen("doc:Person", ["v:Name"], "v:Person_ID"),
+            WOQLQuery().idgen("doc:Person", ["v:Parent"], "v:Parent_ID"),
+            WOQLQuery().cast("v:Joined", "xsd:dateTime", "v:Joined_Time")
+        ),
+        WOQLQuery().insert("v:Person_ID", "Person").
+            property("name", "v:Name").
+            property("born", "v:Born").
+            property("parent", "v:Parent_ID").
+            property("joined", "v:Joined_Time").
+            property("club", "v:Club").
+            property("nr", "v:Nr")
+    )
+
+
+def validate(local_dir, rows):
+    with open(os.path.join(local_dir, "people.csv"), "w") as f:
+        f.write(COLUMNS + rows)
+    return wary.validate_csv("people.csv", load_query, PROPERTY_TYPES, allowed={"Club": ("chess", "go"),
+                                                                                "Parent": ("unknown",)},
+                             references={"Parent": "Name"}, local_dir=local_dir)
+
+
+def test_good_rows_pass(local_dir):
+    assert len(validate(local_dir, GOOD_ROWS)) == 0
+
+
+def test_bad_rows_are_reported(local_dir):
+    problems = validate(local_dir, GOOD_ROWS + BAD_ROWS)
+    assert [tuple(p) for p in problems[["line", "column", "problem"]].itertuples(index=False)] == [
+        (4, "Name", "missing value"),
+        (5, "Born", "not a valid decimal"),
+        (6, "Joined", "not a valid dateTime"),
+        (7, "Club", "not one of the allowed values"),
+        (8, "Parent", "no such Name"),
+    ]
@@ -0,0 +1,3249 @@
+##
+##  Helper module to provide support for making and diagnosing
+##  woqlClient calls.
+##
+##  Attempts to diagnose unexpected exceptions,  and suggest
+##  a possible reason for why things do not work..
+##
+##  Shared by all of the examples:  each puts this (python) directory on
+##  its sys.path,  and then does 'import woqlDiagnosis as wary'.
+##
+##  Chris Horn
+##  April 2020
+##
+
+import io
+import os
+import sys
+import csv
+import gzip
+import json
+import time
+import base64
+import codecs
+import atexit
+import asyncio
+import logging
+import logging.handlers
+import contextvars
+import threading
+import functools
+import itertools
+import collections
+import concurrent.futures
+import requests
+import requests.adapters
+
+import woqlclient.errors as woqlError
+from woqlclient import WOQLQuery
+
+from .lazy import lazy_import
+from .optimizer import optimize_json, heuristic_estimate, same_bindings
+from .catalog import StatisticsCatalog
+
+
+
+SUPPRESS_TERMINUS_DIAGNOSICS    = True              # whether to hide TerminusDB connection messages
+TERMINUS_DIAGNOSTICS_MODE       = "discard"         # what to do with them:  "discard",  or "log" to the logger below
+TERMINUS_LOGGER                 = "woqlclient"      # name of the logger which receives them,  in "log" mode
+
+POOL_CONNECTIONS                = 4                 # number of distinct hosts for which a connection pool is kept
+POOL_MAXSIZE                    = 8                 # maximum number of keep-alive connections kept per host
+POOL_BLOCK                      = True              # whether to wait for a free connection,  rather than exceed POOL_MAXSIZE
+POOL_WARM_UP                    = 2                 # number of connections to open to the server ahead of the first query
+
+RECORD_FILE                     = os.environ.get("WOQL_RECORD_FILE")
+                                                    # if set,  every request to the server and its response are
+                                                    # recorded to this (gzipped JSON lines) file
+REPLAY_FILE                     = os.environ.get("WOQL_REPLAY_FILE")
+                                                    # if set,  responses are replayed from this recording,  with no server
+REPLAY_LATENCY                  = float(os.environ.get("WOQL_REPLAY_LATENCY", "0"))
+                                                    # fraction of each recorded latency waited for when replaying
+                                                    # (0: full speed,  1: as recorded)
+
+CACHE_MAX_ENTRIES               = 256               # maximum number of query results kept by the result cache
+CACHE_MAX_BYTES                 = 32 * 1024 * 1024  # maximum total (JSON) size of the query results kept by the cache
+
+METRICS_FILE                    = os.environ.get("WOQL_METRICS_FILE")
+                                                    # if set,  per-query metrics are dumped to this file:  as
+                                                    # Prometheus text if it ends in .prom,  else as JSON
+METRICS_INTERVAL                = float(os.environ.get("WOQL_METRICS_INTERVAL", "0"))
+                                                    # seconds between dumps of the metrics file (0: only at exit)
+METRICS_SECONDS_BUCKETS         = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_BYTES_BUCKETS           = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+METRICS_BINDINGS_BUCKETS        = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+SLOW_QUERY_SECONDS              = float(os.environ.get("WOQL_SLOW_QUERY_SECONDS", "0"))
+                                                    # queries taking at least this long are logged (0: none are)
+SLOW_QUERY_LOG                  = os.environ.get("WOQL_SLOW_QUERY_LOG", "woql_slow_queries.log")
+                                                    # file to which the slow queries are logged
+SLOW_QUERY_LOG_BYTES            = 10 * 1024 * 1024  # size at which the slow query log file is rotated
+SLOW_QUERY_LOG_BACKUPS          = 3                 # number of rotated slow query log files kept
+SLOW_QUERY_LOG_REWRITES         = True              # whether a rewritten query is logged as sent,  too
+
+OPTIMIZE_QUERIES                = os.environ.get("WOQL_OPTIMIZE", "")
+                                                    # if set,  read queries are rewritten before being sent (see
+                                                    # enable_query_optimizer());  if "verify",  each is also run as
+                                                    # written,  and the results compared
+
+STATISTICS_FILE                 = os.environ.get("WOQL_STATISTICS_FILE")
+                                                    # if set,  per-predicate statistics are kept up to date,  and
+                                                    # kept in this file between runs (see enable_statistics())
+
+STREAM_CHUNK_BYTES              = 64 * 1024         # size of the pieces in which a streamed response is read
+STREAM_CHUNK_ROWS               = 10000             # default number of bindings in each chunk of a streamed result
+
+INSERT_BATCH_SIZE               = 1000              # default number of documents written in each transaction by bulk_insert()
+
+LOCAL_FILES_DIR                 = os.environ.get("TERMINUS_LOCAL")
+                                                    # the directory which the server reads as /app/local_files/
+LOAD_CHUNK_ROWS                 = int(os.environ.get("WOQL_LOAD_CHUNK_ROWS", "0"))
+                                                    # if not 0,  the demos' load_csv loads this many rows of the .csv
+                                                    # in each transaction (see load_csv_chunked());  0: all at once
+LOAD_WORKERS                    = int(os.environ.get("WOQL_LOAD_WORKERS", "4"))
+                                                    # number of those chunks loaded at the same time
+LOAD_CLIENT_SIDE                = bool(os.environ.get("WOQL_LOAD_CLIENT_SIDE"))
+                                                    # if set,  the demos' load_csv reads the .csv here,  and sends the
+                                                    # server its rows (see load_csv_client_side())
+LOAD_PROCESSES                  = int(os.environ.get("WOQL_LOAD_PROCESSES", "1"))
+                                                    # number of processes across which its queries are built
+SYNC_LOADS                      = bool(os.environ.get("WOQL_SYNC"))
+                                                    # if set,  the demos keep their database,  and bring it up to date
+                                                    # with only the rows of the .csv changed since (see sync_csv())
+
+QUERY_WORKERS                   = 8                 # number of threads used to run woql queries concurrently
+MAX_IN_FLIGHT                   = 8                 # maximum number of queries sent to the server at the same time
+
+UPDATE_OPERATORS                = ("when", "insert", "delete", "add_triple", "add_quad",
+                                   "delete_triple", "delete_quad", "update_triple", "update_quad",
+                                   "delete_object", "update_object")
+                                                    # woql operators which write to the database
+
+
+#######################################################################################################################
+#
+#  Some utility functions
+#
+def diagnose_api_error(e, terminusMsg, errorMsg, diagnosis):
+    '''
+        Try and diagnose an API error by giving a hint as to what is wrong
+
+        :param e:               Exception object
+        :param terminusMsg:     string, the TerminusDB error message category
+        :param errorMsg:        string, the TerminusDB error message header
+        :param diagnosis:       string, hint as to perhaps what is wrong
+        :return:                boolean, True if the Exception matches the terminusMsg and errorMsg
+    '''
+    eVal = e.errorObj.get(terminusMsg, None)
+    if eVal is None:
+        return False
+    if eVal[:len(errorMsg)] != errorMsg:
+        return False
+    print(diagnosis)
+    return True
+
+
+def diagnose_api_witness_error(e, violation, errorMsg, diagnosis):
+    '''
+        Try and diagnose an API witness error by giving a hint as to what is wrong
+
+        :param e:               Exception object
+        :param violation:       string, the TerminusDB violation message
+        :param errorMsg:        string, the TerminusDB error message header
+        :param diagnosis:       string, hint as to perhaps what is wrong
+        :return:                boolean, True if the Exception matches the violation and errorMsg
+    '''
+    eVal = e.errorObj.get("terminus:status", None)
+    if eVal is None:
+        return False
+    if eVal != "terminus:failure":
+        return False
+    wDict= e.errorObj["terminus:witnesses"][0]
+    if wDict["@type"] != violation:
+        return False
+    if violation != "vio:PropertyWithUndefinedDomain":
+        if violation == "vio:ViolationWithDatatypeObject":
+            if wDict["vio:message"] != errorMsg:
+                return False
+        elif wDict["vio:literal"][1:len(errorMsg)+1] != errorMsg:
+            return False
+    print(diagnosis)
+    return True
+
+
+def diagnose_api_query_error(e, errorMsg, diagnosis):
+    '''
+        Try and diagnose an API query parsing error by giving a hint as to what is wrong
+
+        :param e:               Exception object
+        :param errorMsg:        string, the TerminusDB error message header
+        :param diagnosis:       string, hint as to perhaps what is wrong
+        :return:                boolean, True if the Exception matches the violation and errorMsg
+    '''
+    eTyp = e.errorObj.get("@type", None)
+    if eTyp is None:
+        return False
+    if eTyp != "vio:WOQLSyntaxError":
+        return False
+    eMsg = e.errorObj.get("terminus:message", None)
+    if eMsg is None:
+        return False
+    if eMsg != errorMsg:
+        return False
+    print(diagnosis)
+    return True
+
+
+#######################################################################################################################
+#
+#   Connection pooling
+#
+#   The woqlclient library calls requests.get(),  requests.post() and requests.delete() directly.  Each of those
+#   builds (and then throws away) its own requests.Session,  so that every query pays for a new TCP connection to
+#   the server.  Instead,  we hand the library a stand-in for the 'requests' module which sends everything through
+#   a single long-lived Session,  whose connections are kept alive and re-used from one query to the next.
+#
+
+_session = None                                     # the shared pooled Session,  once use_pooled_session() is called
+
+_response_bytes = contextvars.ContextVar("woql_response_bytes", default=None)
+                                                    # size of the last response body seen in this thread/task
+_request_bytes = contextvars.ContextVar("woql_request_bytes", default=None)
+                                                    # size of the last request body sent in this thread/task
+
+
+def _note_response(response):
+    '''
+        Remember the size of a request body and of its response,  for the query metrics
+
+        :param response:    requests.Response
+        :return:            the same response
+    '''
+    if _metrics is not None:
+        body = response.request.body
+        _request_bytes.set(0 if body is None else len(body) if isinstance(body, (bytes, str)) else None)
+        _response_bytes.set(len(response.content))
+    return response
+
+
+class _PooledRequests:
+    '''
+        Stand-in for the 'requests' module,  as seen by the woqlclient library.
+
+        The get/post/delete calls are routed through a shared,  pooled Session.  Anything else
+        (eg requests.exceptions) is simply passed on to the real 'requests' module.
+    '''
+
+    def __init__(self, session):
+        self.session = session
+
+    def get(self, url, **kwargs):
+        return _note_response(self.session.get(url, **kwargs))
+
+    def post(self, url, **kwargs):
+        return _note_response(self.session.post(url, **kwargs))
+
+    def delete(self, url, **kwargs):
+        return _note_response(self.session.delete(url, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+
+def warm_up_pool(session, server_url, nr_connections=POOL_WARM_UP):
+    '''
+        Open some connections to the server ahead of time,  so that the first few queries do not pay for the
+        TCP setup.  The connections are opened concurrently (otherwise the pool would simply re-use the first one),
+        and are left in the pool once their response is read.
+
+        :param session:         requests.Session, the pooled session
+        :param server_url:      string, the TerminusDB server url
+        :param nr_connections:  integer, how many connections to open
+    '''
+    def touch():
+        try:
+            session.get(server_url, timeout=5).close()
+        except requests.exceptions.RequestException:
+            pass                                    # leave it to the real connect() to report a problem
+
+    threads = [threading.Thread(target=touch) for _ in range(nr_connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def use_pooled_session(server_url=None, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                       pool_block=POOL_BLOCK, warm_up=POOL_WARM_UP):
+    '''
+        Route all woqlclient traffic through a single keep-alive connection pool.
+
+        Call this once,  before client.connect(...).  Calling it again replaces the previous pool.
+
+        :param server_url:          string, the TerminusDB server url to warm up (or None, for no warm up)
+        :param pool_connections:    integer, number of distinct hosts for which a connection pool is kept
+        :param pool_maxsize:        integer, maximum number of keep-alive connections kept per host
+        :param pool_block:          boolean, whether to wait for a free connection when all pool_maxsize are busy
+        :param warm_up:             integer, number of connections to open to server_url straight away
+        :return:                    the requests.Session now in use
+    '''
+    global _session
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections,
+                                            pool_maxsize=pool_maxsize,
+                                            pool_block=pool_block)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    try:
+        import woqlclient.dispatchRequest as woqlDispatch
+        woqlDispatch.requests = _PooledRequests(session)
+    except ImportError:
+        print("[Unable to find the woqlclient dispatcher: connection pooling is disabled]")
+        return None
+
+    if _session is not None:
+        _session.close()
+    _session = session
+
+    if REPLAY_FILE:
+        replay_transport(REPLAY_FILE, REPLAY_LATENCY)
+    elif RECORD_FILE:
+        record_transport(RECORD_FILE)
+
+    if server_url is not None and warm_up > 0:
+        warm_up_pool(session, server_url, warm_up)
+    return session
+
+
+#######################################################################################################################
+#
+#   Recording and replaying the traffic to the server
+#
+#   A transport adapter mounted on the pooled session sees every request to the server:  those made by the
+#   woqlclient library and the streamed queries alike.  The recording adapter passes each request on to the real
+#   (pooled) adapter,  and appends it to a file with its response and latency.  The replaying adapter answers
+#   each request from such a file instead,  so that a demo can be re-run at full speed (or with its recorded
+#   latencies) with no server at all,  leaving only the client side costs to be profiled.  Opt-in:  see
+#   record_transport() and replay_transport(),  or set the WOQL_RECORD_FILE or WOQL_REPLAY_FILE environment
+#   variables.
+#
+
+RECORDING_FORMAT                = "woql-transport/1"    # first line of a recording
+
+
+def _encode_body(body):
+    '''
+        :param body:    bytes, string or None:  a request or response body
+        :return:        dict, the body as JSON
+    '''
+    if body is None:
+        return {}
+    if isinstance(body, str):
+        return {"text": body}
+    try:
+        return {"text": body.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(body).decode("ascii")}
+
+
+def _decode_body(j):
+    '''
+        :param j:       dict, a body as made by _encode_body
+        :return:        bytes
+    '''
+    if "base64" in j:
+        return base64.b64decode(j["base64"])
+    return j.get("text", "").encode("utf-8")
+
+
+def _normalised_body(body):
+    '''
+        Take out of a request body the names of the woql variables in it,  which may differ from one run to the next
+        (eg the family-tree demos' local_variable() adds a random number to a name).  Each variable is replaced by
+        its name less any digits at its end,  and its place in the order in which the variables first appear;  the
+        query (posted as a JSON string within the JSON body) is looked into.
+
+        :param body:    dict, the request body as made by _encode_body
+        :return:        tuple of the normalised body (string),  and the list of its variables,  in order
+    '''
+    names = {}
+
+    def normalise(node):
+        if isinstance(node, dict):
+            return {k: normalise(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [normalise(v) for v in node]
+        if isinstance(node, str):
+            if node.startswith("v:"):
+                return "v:{}#{}".format(node[2:].rstrip("0123456789"), names.setdefault(node, len(names)))
+            if node.startswith("{"):
+                try:
+                    return json.dumps(normalise(json.loads(node)), sort_keys=True)
+                except ValueError:
+                    pass
+        return node
+
+    text = body.get("text")
+    try:
+        j = json.loads(text) if text is not None else body
+    except ValueError:
+        j = body
+    return json.dumps(normalise(j), sort_keys=True), list(names)
+
+
+def _request_key(method, url, body):
+    '''
+        The key on which a recorded response is matched to a request:  the server's own address is left out,
+        so that a recording can be replayed whatever the server url
+
+        :param method:  string, the http method
+        :param url:     string, the request url
+        :param body:    dict, the request body as made by _encode_body
+        :return:        tuple of the method,  the url's path,  its query,  and the request body (see
+                        _normalised_body());  and the list of the variables in the body
+    '''
+    parts = requests.utils.urlparse(url)
+    normalised, variables = _normalised_body(body)
+    return (method, parts.path, parts.query, normalised), variables
+
+
+def _renamed_bindings(content, renames):
+    '''
+        :param content:     bytes, a recorded query response
+        :param renames:     dict, each variable name (without 'v:') in the recorded request to its name in the request
+                            being answered
+        :return:            bytes, the response,  with its bindings under the names of the request being answered
+    '''
+    try:
+        result = json.loads(content.decode("utf-8"))
+    except ValueError:
+        return content
+    if not isinstance(result, dict) or not isinstance(result.get("bindings"), list):
+        return content
+
+    def renamed(key):
+        name = local_name(key)
+        return key[:len(key) - len(name)] + renames[name] if name in renames else key
+
+    result["bindings"] = [{renamed(k): v for k, v in b.items()} for b in result["bindings"]]
+    return json.dumps(result).encode("utf-8")
+
+
+class _RecordingAdapter(requests.adapters.BaseAdapter):
+    '''
+        Transport adapter which records each request and its response,  as sent and received by another adapter
+    '''
+
+    def __init__(self, adapter, path):
+        super().__init__()
+        self.adapter = adapter
+        self.path = path
+        self.file = gzip.open(path, "wt", encoding="utf-8")
+        self.file.write(json.dumps({"format": RECORDING_FORMAT}) + "\n")
+        self.lock = threading.Lock()
+        self.nr_recorded = 0
+        atexit.register(self.close)
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        response = self.adapter.send(request, **kwargs)
+        content = response.content                      # read it all:  a streamed caller then gets it from memory
+        elapsed = time.perf_counter() - start
+        record = {
+            "method": request.method,
+            "url": request.url,
+            "body": _encode_body(request.body or None),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {"Content-Type": response.headers.get("Content-Type", "application/json")},
+            "content": _encode_body(content),
+            "seconds": round(elapsed, 6),
+        }
+        with self.lock:
+            if self.file is not None:
+                self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+                self.nr_recorded += 1
+        return response
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+        self.adapter.close()
+
+
+class _ReplayingAdapter(requests.adapters.BaseAdapter):
+    '''
+        Transport adapter which answers each request from a recording,  without any server.
+
+        A request is given the next unused response recorded for the same method,  path,  query and body,  the
+        body's variables being matched by their place rather than their name (see _normalised_body()):  the
+        response's bindings are then renamed to the request's own variables.  Once all of the responses for such a
+        request have been used,  the last of them is given again.  A request with no recorded response is an error.
+    '''
+
+    def __init__(self, path, latency=0.0):
+        super().__init__()
+        self.path = path
+        self.latency = latency
+        self.records = []
+        self.by_request = collections.defaultdict(collections.deque)
+        self.variables = []                             # of each record's request
+        self.last = {}
+        self.used = set()
+        self.lock = threading.Lock()
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("format") != RECORDING_FORMAT:
+                raise ValueError("'{}' is not a woql transport recording".format(path))
+            for line in f:
+                record = json.loads(line)
+                i = len(self.records)
+                self.records.append(record)
+                key, variables = _request_key(record["method"], record["url"], record["body"])
+                self.by_request[key].append(i)
+                self.variables.append(variables)
+
+    def _next(self, queue):
+        while queue:
+            i = queue.popleft()
+            if i not in self.used:
+                self.used.add(i)
+                return i
+        return None
+
+    def find(self, request):
+        '''
+            :param request:     requests.PreparedRequest
+            :return:            dict, the recorded response for it (or None);  and dict,  each of the recorded
+                                request's variables (without 'v:') to the request's own,  where they differ
+        '''
+        key, variables = _request_key(request.method, request.url, _encode_body(request.body or None))
+        with self.lock:
+            i = self._next(self.by_request.get(key, ()))
+            if i is None:
+                i = self.last.get(key)
+                if i is None:
+                    return None, {}
+            self.last[key] = i
+        renames = {recorded[2:]: name[2:] for recorded, name in zip(self.variables[i], variables) if recorded != name}
+        return self.records[i], renames
+
+    def send(self, request, **kwargs):
+        record, renames = self.find(request)
+        if record is None:
+            raise requests.exceptions.ConnectionError(
+                "No recorded response in '{}' for {} {}".format(self.path, request.method, request.url),
+                request=request)
+        if self.latency > 0:
+            time.sleep(record["seconds"] * self.latency)
+        response = requests.Response()
+        response.status_code = record["status"]
+        response.reason = record.get("reason")
+        response.headers = requests.structures.CaseInsensitiveDict(record["headers"])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        content = _decode_body(record["content"])
+        response.raw = io.BytesIO(_renamed_bindings(content, renames) if renames else content)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
+
+
+def _mount(adapter):
+    for prefix in ("http://", "https://"):
+        _session.mount(prefix, adapter)
+
+
+def record_transport(path):
+    '''
+        Record every request made to the server,  and its response,  to a file for replay_transport().
+        Uses the pooled session (see use_pooled_session()),  setting one up if need be.
+
+        :param path:        string, the recording to write (gzipped JSON lines)
+        :return:            the recording adapter
+    '''
+    if _session is None and use_pooled_session() is None:
+        return None
+    adapter = _RecordingAdapter(_session.get_adapter("http://"), path)
+    _mount(adapter)
+    return adapter
+
+
+def replay_transport(path, latency=0.0):
+    '''
+        Answer every request from a recording made by record_transport(),  rather than from the server.
+        Uses the pooled session (see use_pooled_session()),  setting one up if need be.
+
+        :param path:        string, the recording to read
+        :param latency:     float, fraction of each recorded latency to wait before replying (0: full speed)
+        :return:            the replaying adapter
+    '''
+    if _session is None and use_pooled_session(warm_up=0) is None:
+        return None
+    adapter = _ReplayingAdapter(path, latency)
+    _mount(adapter)
+    return adapter
+
+
+#######################################################################################################################
+#
+#   Result cache for read queries
+#
+#   Opt-in:  see enable_result_cache().  Results are keyed on the canonical JSON of the woql query,  and evicted
+#   least-recently-used first when either the number of results or their total size grows too large.  Any write
+#   made through execute_query(),  or a change of database head (see set_database_head()),  empties the cache,  and
+#   a read which was in flight meanwhile is not cached.  The cache only sees the writes made through this module:
+#   nothing here polls the server for its head,  so a commit by another client goes unnoticed unless the caller
+#   reports it with set_database_head().
+#
+
+def query_json(q):
+    '''
+        Return the JSON (as a python dict) for a woql query
+
+        :param q:       a woql query
+        :return:        dict
+    '''
+    j = q.json()
+    return json.loads(j) if isinstance(j, str) else j
+
+
+def canonical_json(j):
+    '''
+        Serialise a woql query's JSON the same way each time,  whatever the order in which it was built
+
+        :param j:       dict, the woql query JSON
+        :return:        string
+    '''
+    return json.dumps(j, sort_keys=True, separators=(",", ":"))
+
+
+def is_update_query(q, j=None):
+    '''
+        Whether a woql query writes to the database
+
+        :param q:       a woql query
+        :param j:       dict, the woql query JSON (or None, to get it from q)
+        :return:        boolean
+    '''
+    update = getattr(q, "_woql_update", None)          # set on queries bound from a QueryTemplate
+    if update is not None:
+        return update
+    if getattr(q, "contains_update", False):
+        return True
+
+    def contains(node):
+        if isinstance(node, dict):
+            return any(k in UPDATE_OPERATORS or contains(v) for k, v in node.items())
+        if isinstance(node, list):
+            return any(contains(v) for v in node)
+        return False
+
+    return contains(query_json(q) if j is None else j)
+
+
+class QueryResultCache:
+    '''
+        A size-bounded LRU cache of woql query results
+    '''
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        '''
+            :param max_entries:     integer, maximum number of results kept
+            :param max_bytes:       integer, maximum total JSON size of the results kept
+        '''
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()        # canonical query JSON -> (result, size)
+        self.nr_bytes = 0
+        self.head = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.generation = 0                             # incremented by each invalidation
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        '''
+            :param key:     string, canonical query JSON
+            :return:        the cached result,  or None if not in the cache
+        '''
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, result, generation=None):
+        '''
+            :param key:         string, canonical query JSON
+            :param result:      the query result
+            :param generation:  integer, the cache's generation when the query was sent (or None):  if the cache
+                                has been invalidated since,  the result may predate a write,  and is not kept
+        '''
+        size = len(json.dumps(result))
+        if size > self.max_bytes:
+            return                                      # would evict everything else,  and still not fit
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self.entries:
+                self.nr_bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (result, size)
+            self.nr_bytes += size
+            while len(self.entries) > self.max_entries or self.nr_bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.nr_bytes -= evicted
+                self.evictions += 1
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.nr_bytes = 0
+
+    def set_head(self, head):
+        '''
+            :param head:    the current head (eg commit id) of the database
+        '''
+        if head != self.head:
+            self.invalidate()
+            self.head = head
+
+    def stats(self):
+        '''
+            :return:    dict of the cache counters
+        '''
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self.entries),
+                "bytes": self.nr_bytes
+            }
+
+
+_result_cache = None                                # the QueryResultCache,  once enable_result_cache() is called
+
+
+def enable_result_cache(max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+    '''
+        Start caching the results of read queries made through execute_query()
+
+        :param max_entries:     integer, maximum number of results kept
+        :param max_bytes:       integer, maximum total JSON size of the results kept
+        :return:                the QueryResultCache
+    '''
+    global _result_cache
+    _result_cache = QueryResultCache(max_entries, max_bytes)
+    return _result_cache
+
+
+def disable_result_cache():
+    global _result_cache
+    _result_cache = None
+
+
+def invalidate_result_cache():
+    '''
+        Empty the result cache:  eg after writing to the database other than through execute_query()
+    '''
+    if _result_cache is not None:
+        _result_cache.invalidate()
+
+
+def set_database_head(head):
+    '''
+        Tell the result cache the current head of the database.  If it has moved,  the cache is emptied.
+        Only the caller can do so:  the cache does not itself notice commits made by other clients.
+
+        :param head:    the current head (eg commit id) of the database
+    '''
+    if _result_cache is not None:
+        _result_cache.set_head(head)
+
+
+def result_cache_stats():
+    '''
+        :return:    dict of the result cache counters (hits, misses, evictions,...),  or None if there is no cache
+    '''
+    return None if _result_cache is None else _result_cache.stats()
+
+
+#######################################################################################################################
+#
+#   Suppressing,  capturing or logging the messages printed by the woqlclient library
+#
+
+_diagnostics_sink = contextvars.ContextVar("woql_diagnostics_sink", default=None)
+                                                    # where library messages go in this thread/task, or None for stdout
+
+
+class _StdoutRouter:
+    '''
+        Stand-in for sys.stdout,  which sends each write either to the sink of the current
+        thread/asyncio task (if it is suppressing library messages) or else to the real stdout
+    '''
+
+    def __init__(self, stdout):
+        self._stdout = stdout
+
+    def write(self, text):
+        sink = _diagnostics_sink.get()
+        return (self._stdout if sink is None else sink).write(text)
+
+    def flush(self):
+        sink = _diagnostics_sink.get()
+        if sink is None:
+            self._stdout.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stdout, name)
+
+
+class _DiscardSink:
+    '''
+        Throws away whatever is written to it:  a single instance is shared by everyone
+    '''
+
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class _LoggingSink:
+    '''
+        Sends each complete line written to it to a logger,  at debug level.
+        Partial lines are held per thread,  until their newline arrives.
+    '''
+
+    def __init__(self, logger):
+        self.logger = logger
+        self._partial = threading.local()
+
+    def write(self, text):
+        pending = getattr(self._partial, "text", "") + text
+        *lines, self._partial.text = pending.split("\n")
+        for line in lines:
+            if line.strip():
+                self.logger.debug(line)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class CaptureSink:
+    '''
+        Keeps the lines written to it,  in its 'lines' list
+    '''
+
+    def __init__(self):
+        self.lines = []
+        self._partial = ""
+
+    def write(self, text):
+        *lines, self._partial = (self._partial + text).split("\n")
+        self.lines.extend(lines)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+_discard_sink = _DiscardSink()
+_logging_sink = _LoggingSink(logging.getLogger(TERMINUS_LOGGER))
+
+
+def default_sink():
+    '''
+        :return:    the sink for suppressed library messages,  depending on TERMINUS_DIAGNOSTICS_MODE
+    '''
+    return _logging_sink if TERMINUS_DIAGNOSTICS_MODE == "log" else _discard_sink
+
+
+def log_Terminus_diagnostics(logger_name=TERMINUS_LOGGER):
+    '''
+        Send the woqlclient library's messages to a logger (at debug level),  instead of throwing them away
+
+        :param logger_name:     string, name of the logger
+    '''
+    global TERMINUS_DIAGNOSTICS_MODE, _logging_sink
+    TERMINUS_DIAGNOSTICS_MODE = "log"
+    _logging_sink = _LoggingSink(logging.getLogger(logger_name))
+
+
+def capture_Terminus_diagnostics():
+    '''
+        Capture the woqlclient library's messages,  eg:
+
+            with capture_Terminus_diagnostics() as captured:
+                result = q.execute(client)
+            print(captured.lines)
+
+        :return:    context manager,  giving a CaptureSink
+    '''
+    return suppress_Terminus_diagnostics(CaptureSink())
+
+
+#######################################################################################################################
+#
+#   Per-query metrics
+#
+#   For each query:  its wall time,  the size of the request and response JSON,  and the number of bindings in
+#   its result.  These are aggregated into histograms per calling function (eg 'query_status', 'load_csv'),  and
+#   can be dumped to a file as JSON or Prometheus text.  Opt-in:  see enable_metrics(),  or set the
+#   WOQL_METRICS_FILE environment variable.
+#
+
+def caller_site():
+    '''
+        :return:    tuple of the name,  file name and line number of the nearest calling function outside this module
+    '''
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get("__name__") == __name__:
+        frame = frame.f_back
+    if frame is None:
+        return "unknown", "unknown", 0
+    return frame.f_code.co_name, frame.f_code.co_filename, frame.f_lineno
+
+
+def caller_tag():
+    '''
+        :return:    string, the name of the nearest calling function outside this module
+    '''
+    return caller_site()[0]
+
+
+def binding_count(result):
+    '''
+        :param result:  woql query result
+        :return:        integer, number of bindings in the result
+    '''
+    return len(result.get("bindings", [])) if isinstance(result, dict) else 0
+
+
+def request_size(j):
+    '''
+        :param j:       dict, the woql query JSON sent
+        :return:        integer, size of the request body:  as seen by the pooled session if possible,
+                        else that of the body which the woqlclient library posts for the query
+    '''
+    size = _request_bytes.get()
+    return len(json.dumps({"terminus:query": json.dumps(j)})) if size is None else size
+
+
+def response_size(result):
+    '''
+        :param result:  woql query result
+        :return:        integer, size of the response body:  as seen by the pooled session if possible,
+                        else that of the result re-serialised as JSON
+    '''
+    size = _response_bytes.get()
+    return len(json.dumps(result)) if size is None else size
+
+
+class Histogram:
+    '''
+        Cumulative histogram,  in the Prometheus style
+    '''
+
+    def __init__(self, buckets):
+        '''
+            :param buckets:     tuple of the upper bounds of the buckets,  in increasing order
+        '''
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)          # last one is the +Inf bucket
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        '''
+            :return:    list of (upper bound, cumulative count) pairs,  ending with ("+Inf", count)
+        '''
+        pairs = []
+        total = 0
+        for bound, n in zip(list(self.buckets) + ["+Inf"], self.counts):
+            total += n
+            pairs.append((bound, total))
+        return pairs
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.sum, "buckets": self.cumulative()}
+
+
+class QueryMetrics:
+    '''
+        Histograms of query wall time,  request size,  response size and binding count,  per calling function
+    '''
+
+    SERIES = (
+        ("seconds", "woql_query_seconds", "Wall time of woql queries", METRICS_SECONDS_BUCKETS),
+        ("request_bytes", "woql_request_bytes", "Size of the woql query request", METRICS_BYTES_BUCKETS),
+        ("response_bytes", "woql_response_bytes", "Size of the woql query response", METRICS_BYTES_BUCKETS),
+        ("bindings", "woql_query_bindings", "Number of bindings in the woql query result", METRICS_BINDINGS_BUCKETS)
+    )
+
+    def __init__(self):
+        self.functions = {}                             # function name -> {series name -> Histogram}
+        self.cache_hits = collections.Counter()         # function name -> number of answers from the result cache
+        self.lock = threading.Lock()
+
+    def record(self, function, seconds, request_bytes, response_bytes, bindings):
+        with self.lock:
+            histograms = self.functions.get(function)
+            if histograms is None:
+                histograms = {name: Histogram(buckets) for name, _, _, buckets in QueryMetrics.SERIES}
+                self.functions[function] = histograms
+            histograms["seconds"].observe(seconds)
+            histograms["request_bytes"].observe(request_bytes)
+            histograms["response_bytes"].observe(response_bytes)
+            histograms["bindings"].observe(bindings)
+
+    def record_cache_hit(self, function):
+        with self.lock:
+            self.cache_hits[function] += 1
+
+    def to_json(self):
+        '''
+            :return:    string, the metrics as JSON
+        '''
+        with self.lock:
+            return json.dumps({
+                function: dict({name: h.to_dict() for name, h in histograms.items()},
+                               cache_hits=self.cache_hits[function])
+                for function, histograms in sorted(self.functions.items())
+            }, indent=2)
+
+    def to_prometheus(self):
+        '''
+            :return:    string, the metrics in the Prometheus text exposition format
+        '''
+        lines = []
+        with self.lock:
+            for name, metric, description, _ in QueryMetrics.SERIES:
+                lines.append("# HELP {} {}".format(metric, description))
+                lines.append("# TYPE {} histogram".format(metric))
+                for function, histograms in sorted(self.functions.items()):
+                    h = histograms[name]
+                    for bound, n in h.cumulative():
+                        lines.append('{}_bucket{{function="{}",le="{}"}} {}'.format(metric, function, bound, n))
+                    lines.append('{}_sum{{function="{}"}} {}'.format(metric, function, h.sum))
+                    lines.append('{}_count{{function="{}"}} {}'.format(metric, function, h.count))
+            lines.append("# HELP woql_cache_hits_total Woql queries answered from the result cache")
+            lines.append("# TYPE woql_cache_hits_total counter")
+            for function, n in sorted(self.cache_hits.items()):
+                lines.append('woql_cache_hits_total{{function="{}"}} {}'.format(function, n))
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        '''
+            Write the metrics to a file:  as Prometheus text if its name ends in .prom,  else as JSON
+
+            :param path:    string, file name
+        '''
+        text = self.to_prometheus() if path.endswith(".prom") else self.to_json()
+        temporary = path + ".tmp"
+        with open(temporary, "w") as f:
+            f.write(text)
+        os.replace(temporary, path)                     # so a reader never sees a half-written file
+
+
+_metrics = None                                     # the QueryMetrics,  once enable_metrics() is called
+
+
+def enable_metrics(path=None, interval=0):
+    '''
+        Start recording metrics for each query made through execute_query()
+
+        :param path:        string, file to dump the metrics to at exit (or None, for no dump)
+        :param interval:    float, if not 0:  also dump the metrics every 'interval' seconds
+        :return:            the QueryMetrics
+    '''
+    global _metrics
+    _metrics = QueryMetrics()
+    if path is not None:
+        metrics = _metrics
+        atexit.register(metrics.dump, path)
+        if interval > 0:
+            def dump_periodically():
+                while not stop.wait(interval):
+                    metrics.dump(path)
+            stop = threading.Event()
+            atexit.register(stop.set)
+            threading.Thread(target=dump_periodically, name="woql-metrics", daemon=True).start()
+    return _metrics
+
+
+def query_metrics():
+    '''
+        :return:    the QueryMetrics,  or None if metrics are not being recorded
+    '''
+    return _metrics
+
+
+#######################################################################################################################
+#
+#   Slow query log
+#
+#   Any query taking at least the threshold is appended (as one line of JSON) to a rotating log file,  with its woql
+#   JSON as written (and as sent,  if the optimizer rewrote it),  so that it can be re-run and investigated later.
+#   Opt-in:  see enable_slow_query_log(),  or set the WOQL_SLOW_QUERY_SECONDS environment variable.
+#
+
+_slow_query_logger = None                           # the logger for slow queries,  once enable_slow_query_log() is called
+_slow_query_seconds = SLOW_QUERY_SECONDS
+_slow_query_rewrites = SLOW_QUERY_LOG_REWRITES
+
+
+def enable_slow_query_log(seconds=1.0, path=SLOW_QUERY_LOG, max_bytes=SLOW_QUERY_LOG_BYTES,
+                          backups=SLOW_QUERY_LOG_BACKUPS, rewrites=SLOW_QUERY_LOG_REWRITES):
+    '''
+        Start logging queries which take at least a given time
+
+        :param seconds:     float, the slow query threshold
+        :param path:        string, file to which the slow queries are logged
+        :param max_bytes:   integer, size at which the log file is rotated
+        :param backups:     integer, number of rotated log files kept
+        :param rewrites:    boolean, whether a query rewritten by the optimizer is also logged as sent
+        :return:            the logger
+    '''
+    global _slow_query_logger, _slow_query_seconds, _slow_query_rewrites
+    logger = logging.getLogger("woql.slow_queries")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False                            # keep the (large) query JSON out of the ordinary logs
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    _slow_query_seconds = seconds
+    _slow_query_rewrites = rewrites
+    _slow_query_logger = logger
+    return logger
+
+
+def disable_slow_query_log():
+    global _slow_query_logger
+    _slow_query_logger = None
+
+
+def log_slow_query(j, seconds, result, site, sent=None):
+    '''
+        Append a slow query to the slow query log
+
+        :param j:           dict, the woql query JSON,  as written
+        :param seconds:     float, the query's wall time
+        :param result:      the query's result
+        :param site:        tuple of function name,  file name and line number from which the query was made
+        :param sent:        dict, the woql query JSON as sent,  if the optimizer rewrote it (or None)
+    '''
+    function, filename, line = site
+    entry = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seconds": round(seconds, 6),
+        "rows": binding_count(result),
+        "function": function,
+        "call_site": "{}:{}".format(filename, line),
+        "woql": j
+    }
+    if sent is not None and _slow_query_rewrites:
+        entry["woql_sent"] = sent
+    _slow_query_logger.info(json.dumps(entry))
+
+
+#######################################################################################################################
+#
+#   Query optimizer
+#
+#   Read queries are rewritten before being sent (see optimizer.py):  nested woql_and/woql_or flattened,  nested
+#   selects hoisted,  unused variables dropped,  and the clauses of each woql_and ordered most selective first.
+#   Opt-in:  see enable_query_optimizer(),  or set the WOQL_OPTIMIZE environment variable.  In "verify" mode each
+#   query is also run as written,  and any difference in the bindings is logged (and the unoptimized result used).
+#
+
+_optimizer = None                                   # the estimate function and verify flag,  once enabled
+_optimizer_logger = logging.getLogger("woql.optimizer")
+
+
+def enable_query_optimizer(estimate=None, verify=False):
+    '''
+        Rewrite each read query made through execute_query(),  before it is sent
+
+        :param estimate:    function(s, p, o, bound),  giving the expected number of rows matched by a triple
+                            (default:  from the statistics catalog if enabled,  else heuristic_estimate)
+        :param verify:      boolean, whether to also run each query as written,  and compare the results
+    '''
+    global _optimizer
+    _optimizer = (estimate, verify)
+
+
+def disable_query_optimizer():
+    global _optimizer
+    _optimizer = None
+
+
+def optimize_query(q, estimate=heuristic_estimate):
+    '''
+        :param q:           a woql read query
+        :param estimate:    function(s, p, o, bound),  giving the expected number of rows matched by a triple
+        :return:            the query,  rewritten to be quicker to run but give the same bindings
+    '''
+    optimized = WOQLQuery().json(optimize_json(query_json(q), estimate))
+    optimized._woql_key = getattr(q, "_woql_key", None)
+    optimized._woql_update = False
+    return optimized
+
+
+def _estimate_for(client, estimate):
+    '''
+        :return:    the estimate function to optimize a query to the client's database with
+    '''
+    return estimate if estimate is not None else statistics_estimate(client)
+
+
+def _verify_optimized(q, optimized, result, client):
+    '''
+        Run a query as written,  and check that its optimized form gave the same bindings
+
+        :return:        the result of the query as written
+    '''
+    expected = q.execute(client)
+    if not same_bindings(result, expected):
+        _optimizer_logger.warning("Optimized query gave different bindings:\n  written:   %s\n  optimized: %s",
+                                  canonical_json(query_json(q)), canonical_json(query_json(optimized)))
+    return expected
+
+
+#######################################################################################################################
+#
+#   Predicate statistics
+#
+#   For each predicate:  the number of triples,  and of distinct subjects and objects (see catalog.py),  from which
+#   the query optimizer estimates how many rows each triple of a query will match.  Opt-in:  see enable_statistics(),
+#   or set the WOQL_STATISTICS_FILE environment variable.  The statistics of each predicate written by a query made
+#   through execute_query() (eg by load_csv) are then recomputed before the next read query is optimized.
+#
+
+_catalog = None                                     # the StatisticsCatalog,  once enable_statistics() is called
+
+
+def _database_of(client):
+    '''
+        :return:    string, the url of the client's database,  under which its statistics are kept
+    '''
+    return _client_attribute(client, "conConfig.dbURL", "conConfig.db_url") or ""
+
+
+def _scan_predicate(client, predicate):
+    '''
+        :return:    generator of the subject and object of each triple with the predicate
+    '''
+    q = WOQLQuery().select("v:S", "v:O").triple("v:S", predicate, "v:O")
+    for binding in stream_bindings(q, client):
+        values = {local_name(k): v for k, v in binding.items()}
+        yield values.get("S"), values.get("O")
+
+
+def enable_statistics(path=STATISTICS_FILE):
+    '''
+        Start keeping statistics for each predicate,  and use them in the query optimizer
+
+        :param path:    string, file in which the statistics are kept between runs (or None, to not keep them)
+        :return:        the StatisticsCatalog
+    '''
+    global _catalog
+    _catalog = StatisticsCatalog(_scan_predicate, path)
+    return _catalog
+
+
+def disable_statistics():
+    global _catalog
+    _catalog = None
+
+
+def statistics_catalog():
+    '''
+        :return:    the StatisticsCatalog,  or None if statistics are not being kept
+    '''
+    return _catalog
+
+
+def refresh_statistics(client, predicates=None):
+    '''
+        Recompute the statistics of some predicates of the client's database (eg on first using a database
+        loaded by an earlier run without statistics)
+
+        :param client:          TerminusDB server connection
+        :param predicates:      iterable of the predicates (eg 'scm:trustee'),  or None for those written to since
+                                they were last counted
+        :return:                dict, the new statistics of each predicate
+    '''
+    if predicates is None:
+        return _catalog.refresh_stale(client, _database_of(client))
+    return _catalog.refresh(client, _database_of(client), predicates)
+
+
+def statistics_estimate(client):
+    '''
+        :param client:      TerminusDB server connection
+        :return:            function(s, p, o, bound),  estimating the number of rows a triple will match in the
+                            client's database:  from the statistics catalog if enabled (bringing it up to date
+                            first),  else heuristic_estimate
+    '''
+    if _catalog is None:
+        return heuristic_estimate
+    database = _database_of(client)
+    _catalog.refresh_stale(client, database)
+    return _catalog.estimator(database)
+
+
+#######################################################################################################################
+#
+#   Chief functions
+#
+
+def diagnose(e, exit_on_error=True):
+    '''
+        Try and provide some help in diagnosing an unexpected exception e...and then exit.
+
+        :param e:               Exception object
+        :param exit_on_error:   boolean, whether to exit after the diagnosis
+    '''
+    print(e)
+    if type(e) == requests.exceptions.ConnectionError:
+        print("Is your TerminusDB server running?..")
+    elif type(e) == woqlError.APIError:
+        if diagnose_api_error(e, "terminus:message", "Error: existence_error",
+                "Did you forget to correctly set the 'TERMINUS_LOCAL' for the TerminusDB server?.."):
+            pass
+        elif diagnose_api_error(e, "terminus:message", "Not a valid key",
+                "It appears you have an invalid server key, or are trying to contact the wrong server?"):
+            pass
+        elif diagnose_api_error(e, "terminus:message", "The variables: ",
+                "Coding error:\n" +
+                " Possibly one of your schema doctypes is uninitialised from your .csv file?\n"):
+            pass
+        elif diagnose_api_error(e, "terminus:status", "The variables: ",
+                 "Coding error: Possibly one of your schema doctypes is uninitialised from your .csv file?"):
+            pass
+        elif diagnose_api_witness_error(e, "vio:ViolationWithDatatypeObject", "No such indexed name in get:",
+                "Coding error:\n" +
+                "   Did you read a .csv column,  but then not use it?\n" +
+                "   Or try to read a variable which does not appear in your .csv columns?"):
+            pass
+        elif diagnose_api_witness_error(e, "vio:ViolationWithDataObject", "Too few values in get:",
+                "Data error:\n" +
+                "   Is at least one of your rows of your .csv file missing a value?"):
+            pass
+        elif diagnose_api_witness_error(e, "vio:PropertyWithUndefinedDomain", "",
+                "Data error:\n" +
+                "   Is your schema missing a defintion for one of your .csv columns?"):
+            pass
+        elif diagnose_api_witness_error(e, "vio:ViolationWithDatatypeObject", "Expected atom, found term as element.",
+                "Data error:\n" +
+                "   Is there a type mismatch between data in one of your .csv columns and its schema counterpart?"):
+            pass
+        elif diagnose_api_query_error(e, "Un-parsable Query",
+                "Coding error (malformed query):\n" +
+                "   Perhaps you selected a V: variable which is not in the query?\n" +
+                "   Or a malformed/mistyped V: variable?\n"):
+            pass
+        else:
+            print("Unable to suggest a diagnosis for the error,  sorry...")
+    if exit_on_error:
+        sys.exit(-1)
+
+
+class suppress_Terminus_diagnostics:
+    '''
+        Suppress information messages from the TerminusDB libraries.
+
+        At some point,  the woqlclient library will probably have an explicit setting to do this.
+
+        In the meantime,  sys.stdout is (once only) replaced by a router,  which sends anything written
+        while a suppression is active in the current thread or asyncio task to a sink,  and everything
+        else on to the real stdout.  So queries in other threads,  and ordinary prints,  are unaffected.
+
+        :param sink:    object with a write() method to receive the messages,  or None for the default sink
+                        (which discards them,  or logs them:  see TERMINUS_DIAGNOSTICS_MODE)
+    '''
+
+    def __init__(self, sink=None):
+        self.sink = sink
+        self._token = None
+
+    def __enter__(self):
+        if SUPPRESS_TERMINUS_DIAGNOSICS:
+            if not isinstance(sys.stdout, _StdoutRouter):
+                sys.stdout = _StdoutRouter(sys.stdout)
+            self._token = _diagnostics_sink.set(self.sink if self.sink is not None else default_sink())
+        return self.sink
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._token is not None:
+            _diagnostics_sink.reset(self._token)
+            self._token = None
+
+
+_in_flight = threading.BoundedSemaphore(MAX_IN_FLIGHT)
+                                                    # limits the number of queries sent to the server at the same time
+
+
+def set_max_in_flight(n):
+    '''
+        Change the maximum number of queries sent to the server at the same time,  however many threads
+        are running queries.  Best done before any queries are running.
+
+        :param n:       integer, maximum number of queries in flight
+    '''
+    global _in_flight
+    _in_flight = threading.BoundedSemaphore(n)
+
+
+def run_query(q, client, use_cache=True, tag=None, site=None):
+    '''
+        Do a woql query,  leaving any exception to the caller.
+
+        If the result cache is enabled,  a read query may be answered from the cache;  a write
+        query empties it.  Callers should not modify a result they are given.
+
+        :param q:           a woql query
+        :param client:      TerminusDB server connection
+        :param use_cache:   boolean, whether a read query may be answered from the result cache
+        :param tag:         string, name under which the query's metrics are recorded (default: the calling function)
+        :param site:        tuple of function name,  file name and line number from which the query was made,
+                            for the slow query log (default: the calling function)
+        :return:            the result of the woql query
+    '''
+    cache = _result_cache
+    metrics = _metrics
+    optimizer = _optimizer
+    catalog = _catalog
+    key = None
+    generation = None
+    update = False
+    j = None
+    if cache is not None or optimizer is not None or catalog is not None:
+        j = query_json(q)
+        update = is_update_query(q, j)
+    if cache is not None:
+        if update:
+            cache.invalidate()
+        elif use_cache:
+            key = getattr(q, "_woql_key", None) or canonical_json(j)
+            generation = cache.generation
+            result = cache.get(key)
+            if result is not None:
+                if metrics is not None:
+                    metrics.record_cache_hit(tag or caller_tag())
+                return result
+    sent = q
+    if optimizer is not None and not update:
+        sent = optimize_query(q, _estimate_for(client, optimizer[0]))
+    with _in_flight:
+        with suppress_Terminus_diagnostics():
+            _request_bytes.set(None)
+            _response_bytes.set(None)
+            start = time.perf_counter()
+            result = sent.execute(client)
+            elapsed = time.perf_counter() - start
+            if metrics is not None:                     # before any verifying query replaces them
+                sizes = request_size(query_json(sent)), response_size(result)
+            if sent is not q and optimizer[1]:
+                result = _verify_optimized(q, sent, result, client)
+    if _slow_query_logger is not None and elapsed >= _slow_query_seconds:
+        log_slow_query(query_json(q) if j is None else j, elapsed, result, site or caller_site(),
+                       None if sent is q else query_json(sent))
+    if update and catalog is not None:
+        catalog.note_update(_database_of(client), j)
+    if update and cache is not None:
+        cache.invalidate()                              # so that no read in flight during the write is cached
+    elif key is not None:
+        cache.put(key, result, generation)              # unless a write was made while the query was in flight
+    if metrics is not None:
+        metrics.record(tag or caller_tag(), elapsed, sizes[0], sizes[1], binding_count(result))
+    return result
+
+
+def execute_query(q, client, use_cache=True, tag=None, site=None):
+    '''
+        Carefully do a woql query:  diagnose any error reported by the server,  and exit.
+
+        :param q:           a woql query
+        :param client:      TerminusDB server connection
+        :param use_cache:   boolean, whether a read query may be answered from the result cache
+        :param tag:         string, name under which the query's metrics are recorded (default: the calling function)
+        :param site:        tuple of function name,  file name and line number from which the query was made,
+                            for the slow query log (default: the calling function)
+        :return:            the result of the woql query
+    '''
+    try:
+        return run_query(q, client, use_cache, tag, site)
+    except woqlError.APIError as e:
+        diagnose(e)
+
+
+#######################################################################################################################
+#
+#   Running queries concurrently
+#
+#   The woqlclient library is synchronous,  so queries are run on a shared pool of threads.  Independent queries
+#   can then be in flight at the same time,  overlapping their round trips to the server rather than adding them up.
+#
+
+_query_executor = None                              # the shared thread pool,  created on first use
+_query_executor_lock = threading.Lock()
+
+
+def query_executor():
+    '''
+        :return:    the shared thread pool on which queries are run concurrently
+    '''
+    global _query_executor
+    with _query_executor_lock:
+        if _query_executor is None:
+            _query_executor = concurrent.futures.ThreadPoolExecutor(max_workers=QUERY_WORKERS,
+                                                                    thread_name_prefix="woql")
+        return _query_executor
+
+
+def _as_call(call):
+    '''
+        Accept either a function,  or a (function, arg1, arg2, ...) tuple
+
+        :param call:    function,  or tuple
+        :return:        function of no arguments
+    '''
+    if isinstance(call, tuple):
+        return functools.partial(*call)
+    return call
+
+
+async def execute_query_async(q, client, use_cache=True):
+    '''
+        Asyncio counterpart of execute_query:  await the result of a woql query,  without blocking the event loop
+
+        :param q:           a woql query
+        :param client:      TerminusDB server connection
+        :param use_cache:   boolean, whether a read query may be answered from the result cache
+        :return:            the result of the woql query
+    '''
+    loop = asyncio.get_running_loop()
+    site = caller_site()
+    return await loop.run_in_executor(query_executor(), execute_query, q, client, use_cache, site[0], site)
+
+
+async def gather_queries(queries, client, use_cache=True):
+    '''
+        Run several woql queries at once
+
+        :param queries:     list of woql queries
+        :param client:      TerminusDB server connection
+        :param use_cache:   boolean, whether read queries may be answered from the result cache
+        :return:            list of the query results,  in the same order as the queries
+    '''
+    return await asyncio.gather(*[execute_query_async(q, client, use_cache) for q in queries])
+
+
+async def call_async(call):
+    '''
+        Await any (blocking) function which does woql queries:  eg one of the demo list_... functions
+
+        :param call:    function,  or (function, arg1, arg2, ...) tuple
+        :return:        what the function returns
+    '''
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(query_executor(), _as_call(call))
+
+
+async def gather_calls(*calls):
+    '''
+        Run several (blocking) functions which do woql queries at once
+
+        :param calls:   functions,  or (function, arg1, arg2, ...) tuples
+        :return:        list of what each function returns,  in the same order as the calls
+    '''
+    return await asyncio.gather(*[call_async(call) for call in calls])
+
+
+def run_concurrently(*calls):
+    '''
+        Plain (non-asyncio) way of running several functions which do woql queries at once.
+        Useful from ordinary code,  or where an event loop is already running (eg Jupyter)
+
+        :param calls:   functions,  or (function, arg1, arg2, ...) tuples
+        :return:        list of what each function returns,  in the same order as the calls
+    '''
+    if threading.current_thread().name.startswith("woql"):
+        return [_as_call(call)() for call in calls]    # already on the pool:  waiting on it again could deadlock
+    executor = query_executor()
+    futures = [executor.submit(_as_call(call)) for call in calls]
+    return [future.result() for future in futures]
+
+
+def execute_many(queries, client, max_workers=QUERY_WORKERS, use_cache=True):
+    '''
+        Run a batch of woql queries concurrently.
+
+        Unlike execute_query(),  a failing query does not exit:  its error is handed back instead,  and
+        the rest of the batch carries on.  The number of queries actually sent to the server at the same
+        time is further limited by MAX_IN_FLIGHT (see set_max_in_flight()).
+
+        :param queries:     list of woql queries
+        :param client:      TerminusDB server connection
+        :param max_workers: integer, maximum number of the queries run at the same time
+        :param use_cache:   boolean, whether read queries may be answered from the result cache
+        :return:            list of results,  and list of errors,  each in the same order as the queries:
+                            for each query,  either its result or its error (Exception object) is None
+    '''
+    site = caller_site()
+
+    def attempt(q):
+        try:
+            return run_query(q, client, use_cache, site[0], site), None
+        except (woqlError.APIError, requests.exceptions.RequestException) as e:
+            return None, e
+
+    if len(queries) == 0:
+        return [], []
+    if max_workers <= 1 or threading.current_thread().name.startswith("woql"):
+        outcomes = [attempt(q) for q in queries]
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(queries)),
+                                                   thread_name_prefix="woql-batch") as executor:
+            outcomes = list(executor.map(attempt, queries))
+    return [result for result, _ in outcomes], [error for _, error in outcomes]
+
+
+#######################################################################################################################
+#
+#   Batched writes
+#
+#   Each woql 'when' query is one transaction,  and one round trip to the server.  Writing many documents one query
+#   at a time thus pays for a round trip and a commit per document.  bulk_insert() instead gathers the documents'
+#   queries into batches,  each of which is sent as a single 'when' (and so a single transaction).
+#
+
+def rename_variables(node, suffix):
+    '''
+        :param node:        a woql query JSON,  or any part of it
+        :param suffix:      string, added to the name of each variable
+        :return:            a copy,  with each variable renamed (eg 'v:Person_ID' to 'v:Person_ID_7')
+    '''
+    if isinstance(node, str):
+        return node + suffix if node.startswith("v:") else node
+    if isinstance(node, dict):
+        return {k: rename_variables(v, suffix) for k, v in node.items()}
+    if isinstance(node, list):
+        return [rename_variables(v, suffix) for v in node]
+    return node
+
+
+def batched_when(queries):
+    '''
+        Combine several 'when' queries into one,  which does all of their writes in a single transaction.
+        The variables of each are renamed apart,  so that they do not interfere with each other.
+
+        :param queries:     list of woql 'when' queries (or their JSON)
+        :return:            woql query
+    '''
+    conditions = []
+    updates = []
+    for i, q in enumerate(queries):
+        j = q if isinstance(q, dict) else query_json(q)
+        parts = j.get("when")
+        if not isinstance(parts, list) or len(parts) != 2:
+            raise ValueError("Only woql 'when' queries can be batched")
+        condition, update = rename_variables(parts, "_{}".format(i))
+        conditions.append(condition)
+        updates.append(update)
+    return WOQLQuery().json({"when": [{"and": conditions}, {"and": updates}]})
+
+
+def bulk_insert(client, queries, batch_size=INSERT_BATCH_SIZE, progress=None):
+    '''
+        Do many 'when' queries (eg one per document to insert),  in batches of one transaction each.
+        The queries are read from the iterable as they are needed,  so it may be a generator.
+
+        :param client:      TerminusDB server connection
+        :param queries:     iterable of woql 'when' queries (or their JSON)
+        :param batch_size:  integer, number of queries in each transaction
+        :param progress:    function, if given called with the number of queries done after each batch
+        :return:            integer, number of queries done
+    '''
+    site = caller_site()
+    queries = iter(queries)
+    done = 0
+    while True:
+        batch = list(itertools.islice(queries, batch_size))
+        if not batch:
+            return done
+        execute_query(batched_when(batch), client, use_cache=False, tag=site[0], site=site)
+        done += len(batch)
+        if progress is not None:
+            progress(done)
+
+
+#######################################################################################################################
+#
+#   Chunked loading of .csv files
+#
+#   A demo's load_csv reads its whole .csv file with a single woql get,  and so writes all of it in one transaction
+#   (one commit,  on the server,  of however many triples).  load_csv_chunked() instead splits the file into chunks
+#   of rows,  each written as a .csv file of its own into the server's local files directory,  and loads the chunks
+#   with the demo's own query:  several at a time,  each in a transaction of its own.  Opt-in:  see the demos'
+#   load_csv,  or set the WOQL_LOAD_CHUNK_ROWS (and WOQL_LOAD_WORKERS) environment variables.
+#
+
+SERVER_LOCAL_FILES              = "/app/local_files/"   # where the TerminusDB server expects local files to be
+
+
+def read_csv_rows(url, local_dir=LOCAL_FILES_DIR):
+    '''
+        Read a .csv file,  as the server would for a woql get
+
+        :param url:         string,  either a local file name (relative to local_dir) or http-style url
+        :param local_dir:   string,  the directory which the server reads as /app/local_files/
+        :return:            generator of rows (lists of strings),  the first being the column names
+    '''
+    if url.startswith("http"):
+        response = requests.get(url, stream=True)
+        try:
+            response.raise_for_status()
+            response.encoding = "utf-8-sig"
+            yield from csv.reader(response.iter_lines(decode_unicode=True))
+        finally:
+            response.close()
+        return
+    if url.startswith(SERVER_LOCAL_FILES):
+        url = url[len(SERVER_LOCAL_FILES):]
+    path = url if local_dir is None else os.path.join(local_dir, url)
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        yield from csv.reader(f)
+
+
+def count_writes(q):
+    '''
+        :param q:       a woql query (or its JSON)
+        :return:        integer, the number of triples it writes for each row of its conditions
+    '''
+    j = q if isinstance(q, dict) else query_json(q)
+    return sum(1 for node in _walk(j) for k in node if k in ("add_triple", "add_quad"))
+
+
+def load_csv_chunked(client, url, load_query, chunk_rows=10000, workers=LOAD_WORKERS, local_dir=LOCAL_FILES_DIR):
+    '''
+        Load a .csv file in chunks of rows,  several at a time,  each chunk in a transaction of its own,  and
+        report the rows and triples loaded per second as it goes.
+
+        The chunks are written to local_dir (the server's TERMINUS_LOCAL directory),  and each removed once
+        loaded.  No more than workers of them are on disk at a time.  Rows already loaded stay loaded if a
+        later chunk fails (the error is then diagnosed,  and the program exits).  Note that MAX_IN_FLIGHT (see
+        set_max_in_flight()) also limits the number of chunks loaded at the same time.
+
+        :param client:      TerminusDB server connection
+        :param url:         string,  either a local file name (relative to local_dir) or http-style url
+        :param load_query:  function(url),  building the woql query which loads a whole .csv file (eg with a get
+                            of its columns,  idgens and inserts)
+        :param chunk_rows:  integer, number of rows in each chunk (and transaction)
+        :param workers:     integer, number of chunks loaded at the same time
+        :param local_dir:   string,  the directory which the server reads as /app/local_files/
+        :return:            dict, with the number of 'rows',  'triples' and 'chunks' loaded,  and the 'seconds' taken
+    '''
+    if local_dir is None:
+        raise ValueError("Chunked loading needs the server's local files directory:  set TERMINUS_LOCAL")
+    site = caller_site()
+    per_row = count_writes(load_query(SERVER_LOCAL_FILES + "chunk.csv"))
+    stem = "{}.{}".format(os.path.splitext(os.path.basename(url))[0], os.getpid())
+    rows = read_csv_rows(url, local_dir)
+    header = next(rows, None)
+    if header is None:
+        return {"rows": 0, "triples": 0, "chunks": 0, "seconds": 0.0}
+
+    def chunks():
+        for n in itertools.count():
+            chunk = list(itertools.islice(rows, chunk_rows))
+            if not chunk:
+                return
+            name = "{}.chunk{}.csv".format(stem, n)
+            with open(os.path.join(local_dir, name), "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(chunk)
+            yield name, len(chunk)
+
+    def load(name):
+        try:
+            run_query(load_query(SERVER_LOCAL_FILES + name), client, use_cache=False, tag=site[0], site=site)
+        finally:
+            os.remove(os.path.join(local_dir, name))
+
+    print("[Loading raw data from '{}' in chunks of {:,} rows,  {} at a time..]".format(url, chunk_rows, workers))
+    return _load_batches(url, chunks(), load, workers, per_row)
+
+
+def _load_batches(url, batches, load, workers, per_row, unit="rows"):
+    '''
+        Load batches of rows,  several at a time,  reporting the rows and triples loaded per second as they complete.
+        The batches are read from the iterable only as a worker becomes free for them.
+
+        :param url:         string, the .csv file being loaded,  for the reports
+        :param batches:     iterable of (batch, number of rows) pairs
+        :param load:        function(batch),  loading a batch in a transaction of its own
+        :param workers:     integer, number of batches loaded at the same time
+        :param per_row:     integer, number of triples written for each row
+        :param unit:        string, what the batches count:  'rows' (or 'triples',  when per_row is 1)
+        :return:            dict, with the number of 'rows',  'triples' and 'chunks' loaded,  and the 'seconds' taken
+    '''
+    batches = iter(batches)
+    start = time.perf_counter()
+    loaded = 0
+    chunks = 0
+    error = None
+    pending = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="woql-load") as executor:
+        while True:
+            if error is None and len(pending) < workers:
+                batch = next(batches, None)
+                if batch is not None:
+                    pending[executor.submit(load, batch[0])] = batch[1]
+                    continue
+            if not pending:
+                break
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                nr_rows = pending.pop(future)
+                try:
+                    future.result()
+                    loaded += nr_rows
+                    chunks += 1
+                except (woqlError.APIError, requests.exceptions.RequestException) as e:
+                    error = error or e
+            elapsed = time.perf_counter() - start
+            if unit == "rows":
+                print("[Loaded {:,} rows ({:,} triples):  {:,.0f} rows/s,  {:,.0f} triples/s]".format(
+                    loaded, loaded * per_row, loaded / elapsed, loaded * per_row / elapsed))
+            else:
+                print("[Loaded {:,} {}:  {:,.0f} {}/s]".format(loaded, unit, loaded / elapsed, unit))
+    if error is not None:
+        print("[Stopped after {:,} chunks ({:,} {}) of '{}' were loaded]".format(chunks, loaded, unit, url))
+        diagnose(error)
+    return {"rows": loaded, "triples": loaded * per_row, "chunks": chunks, "seconds": time.perf_counter() - start}
+
+
+#######################################################################################################################
+#
+#   Client-side loading of .csv files
+#
+#   Rather than have the server read the .csv file (with a get,  of a remote url or of a file in its local files
+#   directory),  load_csv_client_side() reads it here,  with pandas,  a chunk of rows at a time.  The demo's own
+#   load query is taken apart into its get (which columns bind which variables),  its idgens and casts,  and its
+#   inserts.  Each row of a chunk is then sent with its values in place of the get,  and the load query's own
+#   idgens,  casts and inserts (see rows_query()),  a transaction per chunk:  so that the server gives the documents
+#   the very ids its own load would.  The server needs no access to the file,  and the building of the queries can
+#   be spread across processes.  Opt-in:  see the demos' load_csv,  or set the WOQL_LOAD_CLIENT_SIDE environment
+#   variable.
+#
+
+def _conjuncts(node):
+    '''
+        :return:    list of the clauses of a woql query JSON,  with any (nested) 'and' flattened
+    '''
+    if isinstance(node, dict) and "and" in node:
+        return [c for clause in node["and"] for c in _conjuncts(clause)]
+    return [node]
+
+
+def _plain(value):
+    '''
+        :return:    the value of a woql JSON term,  without any '@value' or '@id' wrapping
+    '''
+    if isinstance(value, dict):
+        return value.get("@value", value.get("@id"))
+    return value
+
+
+def load_plan(q):
+    '''
+        Take apart a query which loads a .csv file:  when(and(get(...), idgen(...)..., typecast(...)...), inserts)
+
+        :param q:       a woql query (or its JSON)
+        :return:        dict, with the 'columns' read (list of .csv column name,  variable and type),  the 'steps'
+                        which derive further variables (list of ('idgen', prefix, key variables, variable) and
+                        ('cast', variable, type, variable)),  the woql JSON of those steps (as 'derive'),  and the
+                        'writes' (list of subject,  predicate,  object and graph,  any of which may be variables)
+    '''
+    j = q if isinstance(q, dict) else query_json(q)
+    parts = j.get("when")
+    if not isinstance(parts, list) or len(parts) != 2:
+        raise ValueError("Only a woql 'when' query can be loaded client-side")
+    plan = {"columns": [], "steps": [], "derive": [], "writes": []}
+    for clause in _conjuncts(parts[0]):
+        (op, args), = clause.items()
+        if op == "get":
+            columns = args[0].get("list", [args[0]]) if isinstance(args[0], dict) else args[0]
+            for column in columns:
+                column = column.get("as", column.get("woql:as"))
+                ty = _plain(column[2]) if len(column) > 2 else "xsd:string"
+                plan["columns"].append((_plain(column[0]), column[1], ty))
+        elif op == "idgen":
+            keys = args[1].get("list", []) if isinstance(args[1], dict) else args[1]
+            plan["steps"].append(("idgen", _plain(args[0]), keys, args[2]))
+            plan["derive"].append(clause)
+        elif op in ("typecast", "cast"):
+            plan["steps"].append(("cast", args[0], _plain(args[1]), args[2]))
+            plan["derive"].append(clause)
+        else:
+            raise ValueError("Cannot do a woql '{}' client-side".format(op))
+    for clause in _conjuncts(parts[1]):
+        (op, args), = clause.items()
+        if op in ("add_triple", "add_quad"):
+            plan["writes"].append((args[0], args[1], args[2], args[3] if len(args) > 3 else None))
+        elif op == "insert":
+            plan["writes"].append((args[0], "rdf:type", args[1], args[2] if len(args) > 2 else None))
+        else:
+            raise ValueError("Cannot do a woql '{}' client-side".format(op))
+    return plan
+
+
+def cast_column(values, ty):
+    '''
+        Cast a column of values to an xsd type,  all at once
+
+        :param values:      pandas Series of strings
+        :param ty:          string, the (prefixed) xsd type
+        :return:            pandas Series of the cast values,  as they are written in woql JSON
+    '''
+    name = local_name(ty)
+    parsed = _parse_column(values, ty)
+    if parsed is None:
+        return values
+    bad = parsed.isna() & values.notna()
+    if bad.any():
+        raise ValueError("Cannot cast {:,} values to {} (eg '{}')".format(int(bad.sum()), ty, values[bad].iloc[0]))
+    if name in XSD_DATETIME_TYPES:
+        return parsed.dt.strftime("%Y-%m-%d" if name == "date" else "%Y-%m-%dT%H:%M:%S")
+    return parsed.astype("int64") if name in XSD_INTEGER_TYPES else parsed
+
+
+def _parse_column(values, ty):
+    '''
+        :param values:      pandas Series of strings
+        :param ty:          string, the (prefixed) xsd type
+        :return:            pandas Series of the parsed values (missing where a value cannot be parsed as the type),
+                            or None if values of the type are left as strings
+    '''
+    import pandas as pd
+
+    name = local_name(ty)
+    if name in XSD_DATETIME_TYPES:
+        return pd.to_datetime(values, errors="coerce")
+    if name in XSD_INTEGER_TYPES or name in XSD_FLOAT_TYPES:
+        parsed = pd.to_numeric(values, errors="coerce")
+        if name in XSD_INTEGER_TYPES:
+            parsed = parsed.where(parsed % 1 == 0)          # eg '1.5' is a decimal,  but not an integer
+        return parsed
+    if name == "boolean":
+        return values.str.lower().map({"true": True, "false": False, "1": True, "0": False})
+    return None
+
+
+def _declared_xsd_type(predicate, property_types):
+    '''
+        :return:    string, the (prefixed) xsd type declared for a predicate,  or None if it has none
+    '''
+    ty = (property_types or {}).get(local_name(predicate))
+    if ty in XSD_DATETIME_TYPES or ty in XSD_INTEGER_TYPES or ty in XSD_FLOAT_TYPES or ty in ("string", "boolean"):
+        return "xsd:" + ty
+    return None
+
+
+def plan_values(plan, frame):
+    '''
+        Do a load plan's idgens and casts for a chunk of a .csv file.  In place of each id,  it gives a key which
+        tells it apart from any other (its prefix and values,  unencoded):  to compare triples by,  not to write,  as
+        only the server knows how its idgen encodes them.
+
+        :param plan:            dict, from load_plan()
+        :param frame:           pandas DataFrame, the chunk (all columns as strings)
+        :return:                dict, each variable to a pandas Series of its values,  and its xsd type (None for ids)
+    '''
+    def quoted(column):
+        return column.astype(str).str.replace("\\", "\\\\", regex=False).str.replace("_", "\\_", regex=False)
+
+    values = {}
+    for column, variable, ty in plan["columns"]:
+        values[variable] = (frame[column] if ty == "xsd:string" else cast_column(frame[column], ty), ty)
+    for step in plan["steps"]:
+        if step[0] == "idgen":
+            _, prefix, keys, variable = step
+            ids = prefix + "_" + quoted(values[keys[0]][0])
+            for key in keys[1:]:
+                ids = ids + "_" + quoted(values[key][0])
+            values[variable] = (ids, None)
+        else:
+            _, source, ty, variable = step
+            values[variable] = (cast_column(values[source][0], ty), ty)
+    return values
+
+
+def plan_writes(plan, frame, property_types=None, values=None):
+    '''
+        Do a load plan's idgens,  casts and inserts for a chunk of a .csv file,  with each id given by its key (see
+        plan_values())
+
+        :param plan:            dict, from load_plan()
+        :param frame:           pandas DataFrame, the chunk (all columns as strings)
+        :param property_types:  dict, property name to declared type name (eg from declared_property_types()),  so
+                                that literals are cast to their property's type here (else the server casts them)
+        :param values:          dict, the chunk's plan_values() (if already worked out)
+        :return:                list of woql add_triple (or add_quad) JSON,  for every row of the chunk:  to compare
+                                triples by,  not to write
+    '''
+    values = plan_values(plan, frame) if values is None else values
+    nr_rows = len(frame)
+    casts = {}                                          # (variable, type) to the variable's values cast to the type
+    writes = []
+    for s, p, o, graph in plan["writes"]:
+        subjects = values[s][0].tolist() if s in values else [s] * nr_rows
+        if o not in values:
+            objects = [o] * nr_rows
+        elif values[o][1] is None:
+            objects = values[o][0].tolist()
+        else:
+            column, ty = values[o]
+            declared = _declared_xsd_type(p, property_types)
+            if declared is not None and ty == "xsd:string" and declared != ty:
+                if (o, declared) not in casts:
+                    casts[(o, declared)] = cast_column(column, declared)
+                column, ty = casts[(o, declared)], declared
+            objects = [{"@type": ty, "@value": v} for v in column.tolist()]
+        tail = [] if graph is None else [graph]
+        op = "add_triple" if graph is None else "add_quad"
+        writes.extend({op: [subject, p, o] + tail} for subject, o in zip(subjects, objects))
+    return writes
+
+
+def read_csv_frames(url, columns, chunk_rows, local_dir=LOCAL_FILES_DIR):
+    '''
+        Read a .csv file with pandas,  a chunk of rows at a time
+
+        :param url:         string,  either a local file name (relative to local_dir) or http-style url
+        :param columns:     list of the names of the columns wanted
+        :param chunk_rows:  integer, number of rows in each chunk
+        :param local_dir:   string,  the directory which the server reads as /app/local_files/
+        :return:            generator of pandas DataFrames,  with every column as strings
+    '''
+    import pandas as pd
+
+    if not url.startswith("http"):
+        if url.startswith(SERVER_LOCAL_FILES):
+            url = url[len(SERVER_LOCAL_FILES):]
+        url = url if local_dir is None else os.path.join(local_dir, url)
+    with pd.read_csv(url, usecols=columns, dtype=str, keep_default_na=False, encoding="utf-8-sig",
+                     chunksize=chunk_rows) as reader:
+        yield from reader
+
+
+def _plan_query(plan, frame):
+    '''
+        :return:    dict, the JSON of a woql query writing the triples of a chunk of a .csv file (see rows_query())
+    '''
+    frame = frame[[column for column, _, _ in plan["columns"]]]
+    writes = list(range(len(plan["writes"])))
+    return rows_query(plan, [(frame, dict.fromkeys(range(len(frame)), writes), False)])
+
+
+def load_csv_client_side(client, url, load_query, chunk_rows=INSERT_BATCH_SIZE, workers=LOAD_WORKERS, processes=1,
+                         local_dir=LOCAL_FILES_DIR):
+    '''
+        Read a .csv file here (rather than on the server),  and send its rows to the server in chunks,  several at
+        a time,  each chunk in a transaction of its own,  with the load query's idgens,  casts and inserts to be
+        done by the server (see rows_query()).  The rows and triples loaded per second are reported as it goes.
+
+        :param client:          TerminusDB server connection
+        :param url:             string,  either a local file name (relative to local_dir) or http-style url
+        :param load_query:      function(url),  building the woql query which loads a whole .csv file:  a get of its
+                                columns,  then idgens and casts,  then inserts
+        :param chunk_rows:      integer, number of rows in each chunk (and transaction)
+        :param workers:         integer, number of chunks sent to the server at the same time
+        :param processes:       integer, number of processes across which the chunks' queries are built (1: just
+                                this one)
+        :param local_dir:       string,  the directory in which a local file is found
+        :return:                dict, with the number of 'rows',  'triples' and 'chunks' loaded,  and the 'seconds'
+                                taken
+    '''
+    site = caller_site()
+    plan = load_plan(load_query(url))
+    frames = read_csv_frames(url, [column for column, _, _ in plan["columns"]], chunk_rows, local_dir)
+
+    def chunks():
+        if processes <= 1:
+            for frame in frames:
+                yield _plan_query(plan, frame), len(frame)
+            return
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as pool:
+            parsing = collections.deque()
+            for frame in frames:
+                parsing.append((pool.submit(_plan_query, plan, frame), len(frame)))
+                if len(parsing) > processes:
+                    future, nr_rows = parsing.popleft()
+                    yield future.result(), nr_rows
+            while parsing:
+                future, nr_rows = parsing.popleft()
+                yield future.result(), nr_rows
+
+    def load(j):
+        run_query(WOQLQuery().json(j), client, use_cache=False, tag=site[0], site=site)
+
+    print("[Loading raw data from '{}' client-side,  in chunks of {:,} rows..]".format(url, chunk_rows))
+    return _load_batches(url, chunks(), load, workers, len(plan["writes"]))
+
+
+
+#######################################################################################################################
+#
+#   Incremental loading of .csv files
+#
+#   Rebuilding a database from scratch on every start takes longer the more data there is,  even when none of it has
+#   changed.  sync_csv() instead keeps a manifest of the rows last loaded from each .csv file:  for each row (by its
+#   id column,  eg 'Appt'),  a hash of its values,  and the values themselves.  The rows added,  removed or changed
+#   since are found by comparing hashes,  and only the triples which they add or take away are written,  in a single
+#   transaction.  Those triples are worked out here,  but written by the server:  each row they come from is sent with
+#   the load query's own idgens and casts,  so that the ids deleted are the ones the server's load created.  Opt-in:
+#   see the demos,  or set the WOQL_SYNC environment variable.
+#
+
+MANIFEST_FORMAT                 = "woql-manifest/1"
+
+
+def load_manifest(path):
+    '''
+        :param path:    string, the manifest file
+        :return:        dict, the manifest (empty if there is no such file)
+    '''
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != MANIFEST_FORMAT:
+        raise ValueError("{} is not a {} manifest".format(path, MANIFEST_FORMAT))
+    return manifest.get("files", {})
+
+
+def save_manifest(path, manifest):
+    '''
+        :param path:        string, the manifest file
+        :param manifest:    dict, the manifest of each .csv file
+    '''
+    temporary = path + ".tmp"
+    with open(temporary, "w") as f:
+        f.write(json.dumps({"format": MANIFEST_FORMAT, "files": manifest}))    # much faster than json.dump()
+    os.replace(temporary, path)                     # so a crash never leaves a half-written manifest
+
+
+def remove_manifest(path):
+    '''
+        Forget what was loaded (eg when the database is rebuilt by other means)
+    '''
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def row_hashes(frame):
+    '''
+        :param frame:   pandas DataFrame
+        :return:        pandas Series, a hash (as a hex string) of the values of each row
+    '''
+    import pandas as pd
+
+    return pd.util.hash_pandas_object(frame, index=False).map("{:016x}".format)
+
+
+def _triples(plan, frame, property_types, values=None):
+    '''
+        :param values:  dict, the frame's plan_values() (if already worked out)
+        :return:        dict, each triple written for the rows of a frame (a tuple of operator,  subject,
+                        predicate,  object (a type and value pair,  for a literal) and any graph,  with each id given
+                        by its key:  see plan_values()) to the plan's write and the frame's row (by position) which
+                        write it
+    '''
+    if len(frame) == 0:
+        return {}
+    values = plan_values(plan, frame) if values is None else values
+    nr_rows = len(frame)
+    triples = {}
+    for i, write in enumerate(plan_writes(plan, frame, property_types, values)):
+        (op, args), = write.items()
+        o = args[2]
+        triple = (op, args[0], args[1], (o["@type"], o["@value"]) if isinstance(o, dict) else o) + tuple(args[3:])
+        triples.setdefault(triple, (i // nr_rows, i % nr_rows))        # plan_writes() gives each write's rows in turn
+    return triples
+
+
+def _row_derivation(plan, needed):
+    '''
+        :param plan:    dict, from load_plan()
+        :param needed:  set of the variables wanted
+        :return:        tuple of the list of the columns they need (as (position,  variable,  type)),  and the list of
+                        the woql JSON of the idgens and casts which derive them
+    '''
+    needed = set(needed)
+    steps = []
+    for step, clause in reversed(list(zip(plan["steps"], plan["derive"]))):
+        if step[-1] in needed:
+            needed.update(step[2] if step[0] == "idgen" else [step[1]])
+            steps.insert(0, clause)
+    columns = [(i, variable, ty) for i, (_, variable, ty) in enumerate(plan["columns"]) if variable in needed]
+    return columns, steps
+
+
+def _row_clauses(derivation, row, suffix):
+    '''
+        :param derivation:  tuple, from _row_derivation()
+        :param row:         list of the values of a row of the .csv file,  in the order of the load plan's columns
+        :param suffix:      string, added to the name of each variable
+        :return:            list of woql JSON,  which binds the variables wanted for the row as the load query's get,
+                            idgens and casts do:  so that the ids are the server's own
+    '''
+    columns, steps = derivation
+    clauses = []
+    for i, variable, ty in columns:
+        value = {"@type": "xsd:string", "@value": row[i]}
+        if ty == "xsd:string":
+            clauses.append({"eq": [variable + suffix, value]})
+        else:
+            clauses.append({"typecast": [value, ty, variable + suffix]})
+    return clauses + rename_variables(steps, suffix)
+
+
+def rows_query(plan, parts):
+    '''
+        Build the query which writes (or deletes) some of the triples of the rows of a .csv file.  Each triple is
+        written from its load plan's write,  with the variables bound on the server for the row which writes it
+        (see _row_clauses()),  so that a document's id is always the one the server gives it.  Each row is a when()
+        of its own,  inside a select() of no variables,  so that its bindings go no further.
+
+        :param plan:        dict, from load_plan()
+        :param parts:       list of tuples (at most one each of deletes and of inserts) of a pandas DataFrame of
+                            rows (with the load plan's columns,  in order),  a dict of rows (by position) to the
+                            plan's writes (by position) made for them,  and whether those are deleted (else added)
+        :return:            dict, the woql JSON
+    '''
+    rows_done = []
+    derivations = {}                                    # the plan's writes of a row,  to the derivation they need
+    for frame, rows, delete in parts:
+        values = frame.values.tolist()
+        for row, row_writes in rows.items():
+            row_writes = tuple(row_writes)
+            if row_writes not in derivations:
+                needed = set(t for write in row_writes for t in plan["writes"][write]
+                             if isinstance(t, str) and t.startswith("v:"))
+                derivations[row_writes] = _row_derivation(plan, needed)
+            suffix = "_{}{}".format("d" if delete else "i", row)
+            writes = []
+            for write in row_writes:
+                s, p, o, graph = plan["writes"][write]
+                op = ("delete_" if delete else "add_") + ("triple" if graph is None else "quad")
+                writes.append({op: rename_variables([s, p, o] + ([] if graph is None else [graph]), suffix)})
+            condition = _row_clauses(derivations[row_writes], values[row], suffix)
+            rows_done.append({"select": [{"when": [{"and": condition}, {"and": writes}]}]})
+    return {"and": rows_done}
+
+
+def sync_query(plan, deletes, inserts):
+    '''
+        Build the query which deletes some of the triples written for the rows of a .csv file,  and inserts others
+        (see rows_query())
+
+        :param plan:        dict, from load_plan()
+        :param deletes:     tuple of a pandas DataFrame of rows,  and the _triples() of those rows to be deleted
+        :param inserts:     tuple of a pandas DataFrame of rows,  and the _triples() of those rows to be inserted
+        :return:            woql query
+    '''
+    parts = []
+    for (frame, triples), delete in ((deletes, True), (inserts, False)):
+        rows = collections.defaultdict(list)            # row to the plan's writes of it
+        for write, row in sorted(triples.values()):
+            rows[row].append(write)
+        parts.append((frame, rows, delete))
+    return WOQLQuery().json(rows_query(plan, parts))
+
+
+def sync_csv(client, url, load_query, key, manifest_path, property_types=None, local_dir=LOCAL_FILES_DIR):
+    '''
+        Bring a database up to date with a .csv file,  writing only the triples which the rows added,  removed or
+        changed since the last sync add or take away,  in a single transaction.  The server derives the ids of the
+        triples written from the rows they come from,  with the load query's idgens (see sync_query()).  A file not
+        synced before is loaded whole,  by the server (the database should then be empty of it).
+
+        :param client:          TerminusDB server connection
+        :param url:             string,  either a local file name (relative to local_dir) or http-style url
+        :param load_query:      function(url),  building the woql query which loads a whole .csv file:  a get of its
+                                columns,  then idgens and casts,  then inserts
+        :param key:             string, the name of the .csv column which identifies each row (eg 'Appt')
+        :param manifest_path:   string, the file in which the rows last loaded are kept
+        :param property_types:  dict, property name to declared type name (eg from declared_property_types())
+        :param local_dir:       string,  the directory in which a local file is found
+        :return:                dict, the number of rows 'added',  'removed' and 'changed',  and of triples
+                                'inserted' and 'deleted'
+    '''
+    import pandas as pd
+
+    plan = load_plan(load_query(url))
+    columns = [column for column, _, _ in plan["columns"]]
+    if key not in columns:
+        raise ValueError("The key column '{}' is not loaded from {}".format(key, url))
+    frame = pd.concat([pd.DataFrame(columns=columns, dtype=str)] +
+                      list(read_csv_frames(url, columns, STREAM_CHUNK_ROWS, local_dir)), ignore_index=True)
+    frame = frame[columns]
+    duplicated = frame[key].duplicated()
+    if duplicated.any():
+        raise ValueError("Rows of {} share a '{}':  eg '{}'".format(url, key, frame[key][duplicated].iloc[0]))
+
+    manifest = load_manifest(manifest_path)
+    site = caller_site()
+    if url not in manifest:
+        print("[Loading raw data from '{}',  as it has not been synced before..]".format(url))
+        execute_query(load_query(url), client, use_cache=False, tag=site[0], site=site)
+        report = {"added": len(frame), "removed": 0, "changed": 0,
+                  "inserted": len(frame) * len(plan["writes"]), "deleted": 0}
+        manifest[url] = {"columns": columns,
+                         "rows": dict(zip(frame[key], zip(row_hashes(frame), frame.values.tolist())))}
+        save_manifest(manifest_path, manifest)
+        return report
+    last = manifest[url]
+    if last["columns"] != columns:
+        raise ValueError("{} was last loaded with other columns:  reload the database".format(url))
+    hashes = row_hashes(frame)
+    last_hashes = pd.Series({k: v[0] for k, v in last["rows"].items()}, dtype=object)
+    known = frame[key].isin(last_hashes.index)
+    added = ~known
+    changed = known & (last_hashes.reindex(frame[key]).values != hashes.values)
+    unchanged = known & ~changed
+    removed = last_hashes.index.difference(frame[key])
+    stale = list(removed) + frame[key][changed].tolist()
+    old = pd.DataFrame([last["rows"][k][1] for k in stale], columns=columns, dtype=str)
+    new = frame[added | changed].reset_index(drop=True)
+
+    #
+    #  The triples the stale rows wrote,  and those the new rows write.  A triple may also be written by a row
+    #  which is unchanged (eg a charity's name,  by each of its appointments),  so must then be neither deleted
+    #  nor inserted:  look for those amongst the unchanged rows with a subject in common (just one of the rows
+    #  which give a write the same values).  The triples are compared by the keys of their ids (see plan_values()),
+    #  and written with the ids which the server gives them
+    #
+    deleting = _triples(plan, old, property_types)
+    inserting = _triples(plan, new, property_types)
+    same = frame[unchanged]
+    kept = set()
+    if len(same) and (deleting or inserting):
+        subjects = set(t[1] for t in itertools.chain(deleting, inserting))
+        values = plan_values(plan, same)
+        for write in plan["writes"]:
+            if write[0] in values:
+                needed = set(t for t in write if isinstance(t, str) and t.startswith("v:"))
+                reads = [columns[i] for i, _, _ in _row_derivation(plan, needed)[0]]
+                shared = values[write[0]][0].isin(subjects) & ~same.duplicated(subset=reads).values
+                if shared.any():
+                    kept |= _triples(dict(plan, writes=[write]), same[shared], property_types,
+                                     {k: (v[shared], ty) for k, (v, ty) in values.items()}).keys()
+    deleting, inserting = ({t: source for t, source in triples.items() if t not in others and t not in kept}
+                           for triples, others in ((deleting, inserting), (inserting, deleting)))
+
+    report = {"added": int(added.sum()), "removed": len(removed), "changed": int(changed.sum()),
+              "inserted": len(inserting), "deleted": len(deleting)}
+    print("[Syncing '{}':  {:,} rows added,  {:,} removed,  {:,} changed:  {:,} triples inserted,  {:,} deleted..]"
+          .format(url, report["added"], report["removed"], report["changed"], report["inserted"], report["deleted"]))
+    if deleting or inserting:
+        execute_query(sync_query(plan, (old, deleting), (new, inserting)), client, use_cache=False, tag=site[0],
+                      site=site)
+    if report["added"] or report["removed"] or report["changed"]:
+        manifest[url] = {"columns": columns, "rows": dict(zip(frame[key], zip(hashes, frame.values.tolist())))}
+        save_manifest(manifest_path, manifest)
+    return report
+
+
+
+#######################################################################################################################
+#
+#   Warm starts
+#
+#   A demo need not rebuild its database if it already holds what a rebuild would write.  fingerprint() hashes the
+#   queries which build it (the schema and the load queries) together with the .csv files which they read,  and
+#   build_database() (which the demos share) stores the fingerprint in the database's schema graph (as the comment of
+#   a class of its own) once it is loaded.  On the next start,  a database whose stored fingerprint matches is kept
+#   as it is.  The fingerprint is in two parts,  queries then data,  so that a database synced with its .csv files
+#   (see sync_csv()) can be kept whenever its queries are unchanged.  The demos' --force-reload rebuilds the
+#   database regardless.
+#
+
+FINGERPRINT_CLASS               = "scm:WOQLFingerprint"
+FINGERPRINT_GRAPH               = "db:schema"                 # as woqlclient writes the schema
+
+
+def _source_chunks(url, local_dir=LOCAL_FILES_DIR):
+    '''
+        :param url:         string,  either a local file name (relative to local_dir) or http-style url
+        :param local_dir:   string,  the directory which the server reads as /app/local_files/
+        :return:            generator of the bytes of the file,  in pieces
+    '''
+    if url.startswith("http"):
+        response = requests.get(url, stream=True)
+        try:
+            response.raise_for_status()
+            yield from response.iter_content(1024 * 1024)
+        finally:
+            response.close()
+        return
+    if url.startswith(SERVER_LOCAL_FILES):
+        url = url[len(SERVER_LOCAL_FILES):]
+    with open(url if local_dir is None else os.path.join(local_dir, url), "rb") as f:
+        yield from iter(lambda: f.read(1024 * 1024), b"")
+
+
+def fingerprint(queries, urls, local_dir=LOCAL_FILES_DIR):
+    '''
+        Fingerprint what a database is built from
+
+        :param queries:     list of woql queries,  those which build the database (eg the schema and load queries)
+        :param urls:        list of strings,  the .csv files read (each a local file name or http-style url)
+        :param local_dir:   string,  the directory in which a local file is found
+        :return:            string,  the hash of the queries,  then of the files,  separated by a ':';  or None if a
+                            file cannot be read (so that the database is always rebuilt)
+    '''
+    import hashlib
+
+    built = hashlib.sha256()
+    for q in queries:
+        built.update(canonical_json(q if isinstance(q, dict) else query_json(q)).encode("utf-8"))
+    read = hashlib.sha256()
+    try:
+        for url in urls:
+            read.update(url.encode("utf-8") + b"\0")
+            for chunk in _source_chunks(url, local_dir):
+                read.update(chunk)
+            read.update(b"\0")
+    except (OSError, requests.RequestException) as e:
+        print("[Cannot fingerprint the data ({}):  the database will be rebuilt]".format(e))
+        return None
+    return built.hexdigest() + ":" + read.hexdigest()
+
+
+def same_queries(stored, wanted):
+    '''
+        :return:    whether two fingerprints are of the same queries (if perhaps of different data)
+    '''
+    return stored is not None and wanted is not None and stored.split(":")[0] == wanted.split(":")[0]
+
+
+def stored_fingerprint(client):
+    '''
+        :param client:      TerminusDB server connection,  with the database chosen (eg by build_database())
+        :return:            string,  the fingerprint stored in the database;  or None if it has none (or there is no
+                            such database:  any other error is raised)
+    '''
+    q = WOQLQuery().quad(FINGERPRINT_CLASS, "rdfs:comment", "v:Fingerprint", FINGERPRINT_GRAPH)
+    try:
+        with suppress_Terminus_diagnostics():
+            bindings = run_query(q, client, use_cache=False)["bindings"]
+    except woqlError.APIError as e:
+        if e.status_code == 404:                    # no such database
+            return None
+        raise
+    for b in bindings:
+        for value in b.values():                    # the one variable,  however the server names it
+            return value.get("@value") if isinstance(value, dict) else value
+    return None
+
+
+def store_fingerprint(client, value):
+    '''
+        Record in the database the fingerprint of what it was built from,  in place of any before.  A failure to
+        store it is only warned of:  the database is then rebuilt on the next start.
+
+        :param client:      TerminusDB server connection
+        :param value:       string,  from fingerprint() (if None,  any stored fingerprint is just removed)
+    '''
+    graph = FINGERPRINT_GRAPH
+    writes = []
+    old = stored_fingerprint(client)
+    if old is not None:
+        writes.append({"delete_quad": [FINGERPRINT_CLASS, "rdfs:comment", {"@value": old, "@language": "en"}, graph]})
+    if value is not None:
+        writes += [{"add_quad": [FINGERPRINT_CLASS, "rdf:type", "owl:Class", graph]},
+                   {"add_quad": [FINGERPRINT_CLASS, "rdfs:label", {"@value": "Fingerprint", "@language": "en"}, graph]},
+                   {"add_quad": [FINGERPRINT_CLASS, "rdfs:comment", {"@value": value, "@language": "en"}, graph]}]
+    if writes:
+        try:
+            with suppress_Terminus_diagnostics():
+                run_query(WOQLQuery().json({"when": [{"true": []}, {"and": writes}]}), client)
+        except woqlError.APIError as e:
+            print("[Cannot store the fingerprint ({}):  the database will be rebuilt next time]".format(
+                e.errorObj.get("terminus:message", e.msg) if isinstance(e.errorObj, dict) else e.msg))
+
+
+def build_database(client, db_id, label, comment, schema, loads, check, load, sync, manifest_path,
+                   force_reload=False):
+    '''
+        Build a demo's database from its raw .csv data:  unless it already holds the same schema and data (see
+        fingerprint()),  when it is kept as it is.  With WOQL_SYNC set,  a database built by the same queries is
+        instead brought up to date with only the rows changed since (see sync_csv()).
+
+        :param client:          TerminusDB server connection (the database is chosen here)
+        :param db_id:           string, the database
+        :param label:           string, its label,  if it is created
+        :param comment:         string, its comment,  if it is created
+        :param schema:          woql query, which writes the schema
+        :param loads:           dict, each .csv file to the woql query which loads it,  in the order they are loaded
+        :param check:           function of a .csv file,  which checks it (eg exits if any of its rows are bad)
+        :param load:            function of the client and a .csv file,  which loads it
+        :param sync:            function of the client and a .csv file,  which syncs the database with it
+        :param manifest_path:   string, the manifest file of the rows synced
+        :param force_reload:    boolean,  whether to rebuild the database regardless
+    '''
+    client.conConfig.setDB(db_id)                   # as a start-up has only connected to the server
+    fingerprinted = fingerprint([schema] + list(loads.values()), list(loads))
+    stored = None if force_reload else stored_fingerprint(client)
+    if fingerprinted is not None and stored == fingerprinted:
+        print("[The database is up to date with its schema and data:  keeping it]")
+        return
+    for url in loads:
+        check(url)                                  # before the database is touched
+    if not (SYNC_LOADS and same_queries(stored, fingerprinted) and os.path.exists(manifest_path)):
+        try:
+            print("[Removing prior version of the database,  if it exists..]")
+            with suppress_Terminus_diagnostics():
+                client.deleteDatabase(db_id)
+        except Exception as e:
+            print("[No prior database to delete]")
+        remove_manifest(manifest_path)
+        try:
+            print("[Creating new database..]")
+            with suppress_Terminus_diagnostics():
+                client.createDatabase(db_id, label, key=None, comment=comment)
+        except Exception as e:
+            diagnose(e)
+        try:
+            print("[Building schema..]")
+            execute_query(schema, client)
+        except Exception as e:
+            diagnose(e)
+    for url in loads:
+        if SYNC_LOADS:
+            sync(client, url)                       # only the rows changed since,  if the database was kept
+        else:
+            load(client, url)
+    store_fingerprint(client, fingerprinted)        # only once loaded,  so a failed load is redone
+
+
+
+#######################################################################################################################
+#
+#   Validating .csv files before loading
+#
+#   A bad row in a .csv file is otherwise only found when the server rejects the whole load,  and diagnose() can
+#   then only guess at which row and why.  validate_csv() instead checks every row before anything is loaded,  a
+#   column at a time:  that it has a value,  and that the value can be read as the type which the schema declares
+#   for the property the load query writes it to.  A demo can add rules of its own:  the values which a column may
+#   take (eg the shipping routes),  and columns whose values must be found in another (eg a person's parents,  by
+#   name).  check_csv() reports all the offending rows at once.
+#
+
+def column_types(plan, property_types=None):
+    '''
+        :param plan:            dict, from load_plan()
+        :param property_types:  dict, property name to declared type name (eg from declared_property_types())
+        :return:                dict, each column to the (prefixed) xsd types its values must be read as:  those of
+                                the get,  of any casts of it,  and of the properties it is written to
+    '''
+    types = {}
+    for column, variable, ty in plan["columns"]:
+        wanted = set() if ty == "xsd:string" else {ty}
+        derived = {variable}
+        for step in plan["steps"]:
+            if step[0] == "cast" and step[1] in derived:
+                wanted.add(step[2])
+                derived.add(step[3])
+        for _, p, o, _ in plan["writes"]:
+            declared = _declared_xsd_type(p, property_types) if o in derived else None
+            if declared is not None and declared != "xsd:string":
+                wanted.add(declared)
+        types[column] = sorted(wanted)
+    return types
+
+
+def validate_csv(url, load_query, property_types=None, allowed=None, references=None, optional=(),
+                 local_dir=LOCAL_FILES_DIR):
+    '''
+        Check every row of a .csv file which is to be loaded
+
+        :param url:             string,  either a local file name (relative to local_dir) or http-style url
+        :param load_query:      function(url),  building the woql query which loads the .csv file
+        :param property_types:  dict, property name to declared type name (eg from declared_property_types())
+        :param allowed:         dict, column name to the collection of values which it may take
+        :param references:      dict, column name to the name of the column in which each of its values must be
+                                found (or else be one of its allowed values)
+        :param optional:        collection of the names of the columns which may be left empty
+        :param local_dir:       string,  the directory in which a local file is found
+        :return:                pandas DataFrame of the problems found,  one row each:  the 'line' of the file (the
+                                column names being line 1),  the 'column',  its 'value' and the 'problem'
+    '''
+    import pandas as pd
+
+    plan = load_plan(load_query(url))
+    types = column_types(plan, property_types)
+    columns = list(types)
+    read = columns + [column for column in (references or {}).values() if column not in columns]
+    frame = pd.concat([pd.DataFrame(columns=read, dtype=str)] +
+                      list(read_csv_frames(url, read, STREAM_CHUNK_ROWS, local_dir)), ignore_index=True)
+    problems = []
+
+    def found(column, bad, problem):
+        if bad.any():
+            problems.append(pd.DataFrame({"line": frame.index[bad] + 2, "column": column,
+                                          "value": frame[column][bad], "problem": problem}))
+
+    for column in columns:
+        values = frame[column]
+        missing = values.str.strip() == ""
+        if column not in optional:
+            found(column, missing, "missing value")
+        for ty in types[column]:
+            parsed = _parse_column(values, ty)
+            found(column, parsed.isna() & ~missing, "not a valid " + local_name(ty))
+        known = pd.Series(False, index=frame.index)
+        if allowed and column in allowed:
+            known |= values.isin(list(allowed[column]))
+        if references and column in references:
+            known |= values.isin(frame[references[column]])
+            found(column, ~known & ~missing, "no such " + references[column])
+        elif allowed and column in allowed:
+            found(column, ~known & ~missing, "not one of the allowed values")
+    if not problems:
+        return pd.DataFrame(columns=["line", "column", "value", "problem"])
+    return pd.concat(problems).sort_values(["line", "column"], kind="stable").reset_index(drop=True)
+
+
+def check_csv(url, load_query, property_types=None, allowed=None, references=None, optional=(),
+              local_dir=LOCAL_FILES_DIR, exit_on_error=True):
+    '''
+        Validate a .csv file before loading it (see validate_csv()),  report every row which fails...and then exit.
+
+        :param exit_on_error:   boolean, whether to exit if there are any problems
+        :return:                pandas DataFrame of the problems found (see validate_csv())
+    '''
+    problems = validate_csv(url, load_query, property_types, allowed, references, optional, local_dir)
+    if len(problems):
+        print("Data error:  {:,} problems in {:,} rows of {}:".format(len(problems), problems["line"].nunique(), url))
+        for line, column, value, problem in problems.itertuples(index=False):
+            print("   line {:>8}:  {:<20} {:<30} {}".format(line, column, repr(value), problem))
+        if exit_on_error:
+            sys.exit(-1)
+    return problems
+
+
+
+#######################################################################################################################
+#
+#   Streaming query results
+#
+#   execute_query() hands back the whole decoded result,  so that the raw JSON,  the decoded dict and (usually) a
+#   dataframe made from it all live in memory at once.  Instead,  the functions here read the server's response a
+#   piece at a time and decode its bindings one by one as they arrive,  so memory use stays flat however big the
+#   result.  They talk to the server directly (through the pooled session,  if there is one),  rather than through
+#   the woqlclient library,  which always decodes the whole response;  but as run_query() does,  they count towards
+#   MAX_IN_FLIGHT and take a result from the result cache if it is there.
+#
+
+def _client_attribute(client, *names):
+    '''
+        :return:    the value of the first of the (possibly dotted) attribute names which the client has,  or None
+    '''
+    for name in names:
+        value = client
+        for part in name.split("."):
+            value = getattr(value, part, None)
+            if value is None:
+                break
+        if value is not None:
+            return value() if callable(value) else value
+    return None
+
+
+def iter_json_array(chunks, key="bindings"):
+    '''
+        Incrementally decode the members of a top level array in a JSON document,  as it arrives
+
+        :param chunks:  iterable of bytes,  the JSON document in pieces
+        :param key:     string, the key of the array in the top level JSON object
+        :return:        generator of the decoded members of the array
+    '''
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    position = 0
+
+    def more():
+        nonlocal buffer, position
+        chunk = next(chunks, None)
+        if chunk is None:
+            return False
+        buffer = buffer[position:] + utf8.decode(chunk)
+        position = 0
+        return True
+
+    def skip_space():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer):
+                return True
+            if not more():
+                return False
+
+    def expect(character):
+        nonlocal position
+        if not skip_space():
+            raise ValueError("Query response ended where '{}' was expected".format(character))
+        if buffer[position] != character:
+            raise ValueError("Malformed query response near '{}'".format(buffer[position:position + 40]))
+        position += 1
+
+    def value():
+        if not skip_space():
+            raise ValueError("Query response ended where a value was expected")
+        while True:
+            try:
+                decoded, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if not more():
+                    raise
+                continue
+            if end == len(buffer) and more():           # eg a number,  which may go on in the next piece
+                continue
+            return decoded, end
+
+    #
+    #  Go through the keys of the top level object in turn,  decoding (and dropping) the value of each but the one
+    #  wanted:  a string value which happens to hold the key is then never mistaken for it
+    #
+    if not skip_space():
+        return
+    expect("{")
+    while True:
+        if not skip_space():
+            raise ValueError("Query response ended inside its top level object")
+        if buffer[position] == "}":
+            return
+        name, position = value()
+        expect(":")
+        if name == key:
+            break
+        _, position = value()
+        if skip_space() and buffer[position] == ",":
+            position += 1
+    expect("[")
+
+    #
+    #  Then decode each member in turn,  reading more of the document whenever a member is incomplete
+    #
+    while True:
+        while position < len(buffer) and (buffer[position].isspace() or buffer[position] == ","):
+            position += 1
+        if position >= len(buffer):
+            if not more():
+                raise ValueError("Query response ended inside the '{}' array".format(key))
+            continue
+        if buffer[position] == "]":
+            return
+        member, position = value()
+        yield member
+
+
+def stream_bindings(q, client, key=None, url=None):
+    '''
+        Do a (read) woql query,  yielding its bindings one by one as they arrive from the server.  As for
+        run_query(),  a query whose result is in the result cache is answered from it,  and the query counts
+        towards MAX_IN_FLIGHT (see set_max_in_flight()) until its last binding has arrived.
+
+        :param q:           a woql query
+        :param client:      TerminusDB server connection
+        :param key:         string, the server key (if the client does not have it)
+        :param url:         string, the server's woql query url (if the client does not have it)
+        :return:            generator of bindings (dicts)
+    '''
+    url = url or _client_attribute(client, "conConfig.queryURL", "conConfig.query_url")
+    key = key or _client_attribute(client, "conCapabilities.getClientKey", "conConfig.key")
+    j = written = query_json(q)
+    site = caller_site()
+    cache = _result_cache
+    if cache is not None:
+        result = cache.get(getattr(q, "_woql_key", None) or canonical_json(written))
+        if result is not None:
+            if _metrics is not None:
+                _metrics.record_cache_hit(site[0])
+            yield from result["bindings"]
+            return
+    if _optimizer is not None:
+        j = optimize_json(j, _estimate_for(client, _optimizer[0]))
+    if "@context" not in j and hasattr(q, "defaultContext"):
+        j = dict(j)
+        j["@context"] = q.defaultContext(_client_attribute(client, "conConfig.dbURL", "conConfig.db_url"))
+    headers = {}
+    if key:
+        headers["Authorization"] = "Basic " + base64.b64encode((":" + key).encode("utf-8")).decode("utf-8")
+
+    http = _session if _session is not None else requests
+    start = time.perf_counter()
+    nr_bytes = 0
+    nr_bindings = 0
+    body = json.dumps({"terminus:query": json.dumps(j)})
+    headers["Content-Type"] = "application/json"
+    in_flight = _in_flight
+    in_flight.acquire()
+    try:
+        response = http.post(url, headers=headers, data=body, stream=True) # as WOQLQuery.execute() sends it
+    except BaseException:
+        in_flight.release()
+        raise
+    try:
+        if response.status_code != 200:
+            try:
+                error = response.json()
+            except ValueError:
+                error = {"terminus:message": response.text}
+            raise woqlError.APIError(response.text, url, error, response.status_code)
+
+        def chunks():
+            nonlocal nr_bytes
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_BYTES):
+                nr_bytes += len(chunk)
+                yield chunk
+
+        for binding in iter_json_array(chunks()):
+            nr_bindings += 1
+            yield binding
+    finally:
+        response.close()
+        in_flight.release()
+        elapsed = time.perf_counter() - start
+        if _metrics is not None:
+            _metrics.record(site[0], elapsed, len(body), nr_bytes, nr_bindings)
+        if _slow_query_logger is not None and elapsed >= _slow_query_seconds:
+            log_slow_query(written, elapsed, {"bindings": range(nr_bindings)}, site,
+                           None if _optimizer is None else j)
+
+
+def stream_binding_chunks(q, client, rows=STREAM_CHUNK_ROWS, key=None, url=None):
+    '''
+        Do a (read) woql query,  yielding its bindings in lists of (at most) 'rows' at a time
+
+        :param q:           a woql query
+        :param client:      TerminusDB server connection
+        :param rows:        integer, maximum number of bindings in each list
+        :param key:         string, the server key (if the client does not have it)
+        :param url:         string, the server's woql query url (if the client does not have it)
+        :return:            generator of lists of bindings
+    '''
+    chunk = []
+    for binding in stream_bindings(q, client, key, url):
+        chunk.append(binding)
+        if len(chunk) >= rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_dataframes(q, client, rows=STREAM_CHUNK_ROWS, key=None, url=None, types=None):
+    '''
+        Do a (read) woql query,  yielding its result as a series of dataframes of (at most) 'rows' rows each
+
+        :param q:           a woql query
+        :param client:      TerminusDB server connection
+        :param rows:        integer, maximum number of rows in each dataframe
+        :param key:         string, the server key (if the client does not have it)
+        :param url:         string, the server's woql query url (if the client does not have it)
+        :param types:       dict, variable name to xsd type,  for typed dataframes (see bindings_to_df());  or None
+                            to use woqlDataframe.query_to_df()
+        :return:            generator of dataframes
+    '''
+    if types is not None:
+        for chunk in stream_binding_chunks(q, client, rows, key, url):
+            yield bindings_to_df(chunk, types)
+        return
+    import woqlclient.woqlDataframe as wdf
+    for chunk in stream_binding_chunks(q, client, rows, key, url):
+        yield wdf.query_to_df({"bindings": chunk})
+
+
+#######################################################################################################################
+#
+#   Typed dataframes
+#
+#   woqlDataframe.query_to_df() walks the bindings a value at a time,  for each column in turn,  and leaves most
+#   columns as python objects.  For the hot queries,  the functions here instead build each column in a single pass
+#   straight into a typed array:  datetime64 for xsd:dateTime,  int64 for the integer types,  float64 for
+#   xsd:decimal and xsd:double,  and categorical for strings and document ids.  The types come from the properties
+#   declared by the schema (see declared_property_types()),  matched up to the variables of the query.
+#
+XSD_DATETIME_TYPES              = ("dateTime", "dateTimeStamp", "date")
+XSD_INTEGER_TYPES               = ("integer", "int", "long", "short", "byte", "nonNegativeInteger",
+                                   "positiveInteger", "negativeInteger", "nonPositiveInteger",
+                                   "unsignedLong", "unsignedInt", "unsignedShort", "unsignedByte")
+XSD_FLOAT_TYPES                 = ("decimal", "double", "float")
+UNKNOWN_VALUES                  = ("terminus:unknown", "http://terminusdb.com/schema/terminus#unknown")
+                                                    # what the server binds to a variable left unset by an opt()
+
+
+def local_name(iri):
+    '''
+        Strip the prefix (eg 'scm:', 'xsd:', 'v:') or the url (up to the last '/' or '#') from an id
+
+        :param iri:     string, a prefixed or full id
+        :return:        string
+    '''
+    for sep in ("#", "/", ":"):
+        if sep in iri:
+            iri = iri.rsplit(sep, 1)[1]
+    return iri
+
+
+def _triple_parts(node):
+    '''
+        Pull the subject,  predicate and object out of a woql triple (or quad),  in either of the JSON forms which the
+        woqlclient library has used:  {"triple": [s, p, o]},  or {"@type": "woql:Triple", "woql:subject": ...}
+
+        :param node:    dict, a woql query JSON node
+        :return:        tuple of the subject, predicate and object,  or None if the node is not a triple or quad
+    '''
+    for op in ("triple", "quad", "add_triple", "add_quad"):
+        parts = node.get(op)
+        if isinstance(parts, list) and len(parts) >= 3:
+            return tuple(parts[:3])
+    if str(node.get("@type", "")).split(":")[-1] in ("Triple", "Quad", "AddTriple", "AddQuad"):
+        def term(t):
+            if isinstance(t, dict):
+                for k in ("woql:node", "woql:variable_name", "woql:datatype"):
+                    if k in t:
+                        return term(t[k])
+                return t.get("@value", t)
+            return t
+        return tuple(term(node.get("woql:" + k)) for k in ("subject", "predicate", "object"))
+    return None
+
+
+def _walk(node):
+    '''
+        Yield every dict within a woql query JSON,  depth first
+
+        :param node:    the woql query JSON,  or any part of it
+        :return:        generator of dicts
+    '''
+    if isinstance(node, dict):
+        yield node
+        for v in node.values():
+            yield from _walk(v)
+    elif isinstance(node, list):
+        for v in node:
+            yield from _walk(v)
+
+
+def declared_property_types(schema):
+    '''
+        Find the type declared for each property by a schema,  ie the target of each property's rdfs:range
+
+        :param schema:      a woql query which builds the schema (or its JSON)
+        :return:            dict, property name (without prefix) to type name (without prefix),  eg
+                            {"start": "dateTime", "charity_number": "decimal", "trustee": "Trustee"}
+    '''
+    types = {}
+    for node in _walk(schema if isinstance(schema, (dict, list)) else query_json(schema)):
+        parts = _triple_parts(node)
+        if parts is None or not all(isinstance(p, str) for p in parts):
+            continue
+        if local_name(parts[1]) == "range":
+            types[local_name(parts[0])] = local_name(parts[2])
+    return types
+
+
+def query_variable_types(q, property_types):
+    '''
+        Work out the type of each variable in a query,  from the properties it is matched against (by triple()) and
+        from any cast() to an xsd type
+
+        :param q:                   a woql query (or its JSON)
+        :param property_types:      dict, from declared_property_types()
+        :return:                    dict, variable name (without 'v:') to type name (without prefix)
+    '''
+    types = {}
+    for node in _walk(q if isinstance(q, (dict, list)) else query_json(q)):
+        parts = _triple_parts(node)
+        if parts is not None:
+            p, o = parts[1], parts[2]
+            if isinstance(p, str) and isinstance(o, str) and o.startswith("v:"):
+                ty = property_types.get(local_name(p))
+                if ty is not None:
+                    types.setdefault(local_name(o), ty)
+            continue
+        cast = node.get("cast")
+        if isinstance(cast, list) and len(cast) == 3 and isinstance(cast[1], str) and isinstance(cast[2], str):
+            types.setdefault(local_name(cast[2]), local_name(cast[1]))
+    return types
+
+
+def _column_values(bindings, key):
+    '''
+        Pull one column of values out of a list of bindings,  unwrapping typed literals
+
+        :param bindings:    list of dicts, the query bindings
+        :param key:         string, the variable's key in the bindings
+        :return:            list
+    '''
+    try:
+        return [b[key]["@value"] for b in bindings]         # the usual case:  every value is a typed literal
+    except (KeyError, TypeError):
+        pass
+    values = [b.get(key) for b in bindings]
+    return [v.get("@value") if v.__class__ is dict else
+            "unknown" if v in UNKNOWN_VALUES else v for v in values]
+
+
+def typed_column(values, ty, categorical=True):
+    '''
+        Turn a list of values into a typed column
+
+        :param values:          list, the (unwrapped) values
+        :param ty:              string, the xsd type name (without prefix),  or None if unknown
+        :param categorical:     boolean, whether strings and ids are made categorical
+        :return:                numpy array or pandas Categorical
+    '''
+    import numpy as np
+    import pandas as pd
+
+    if ty in XSD_DATETIME_TYPES:
+        try:
+            return np.array(values, dtype="datetime64[ns]")     # parses plain ISO 8601 strings in one go
+        except (TypeError, ValueError):
+            return pd.to_datetime(values, errors="coerce").values
+    if ty in XSD_INTEGER_TYPES:
+        try:
+            return np.array(values, dtype=np.int64)
+        except (TypeError, ValueError):
+            return pd.array(pd.to_numeric(values, errors="coerce"), dtype="Int64")
+    if ty in XSD_FLOAT_TYPES:
+        try:
+            return np.array(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            return pd.to_numeric(values, errors="coerce")
+    return pd.Categorical(values) if categorical else np.array(values, dtype=object)
+
+
+def bindings_to_df(result, types=None, categorical=True):
+    '''
+        A faster,  typed,  replacement for woqlDataframe.query_to_df():  build a dataframe from a query result,  one
+        typed column at a time.  Columns are named after the query variables,  less their 'v:' (or url) prefix.
+
+        Columns whose type is not given are typed from the '@type' of their first value.
+
+        :param result:          dict, the query result (or just its list of bindings)
+        :param types:           dict, variable name (without 'v:') to xsd type name,  eg from query_variable_types()
+        :param categorical:     boolean, whether strings and ids are made categorical
+        :return:                pandas dataframe
+    '''
+    import pandas as pd
+
+    bindings = result.get("bindings", []) if isinstance(result, dict) else result
+    if not bindings:
+        return pd.DataFrame()
+    types = types or {}
+    columns = {}
+    for key in bindings[0]:
+        name = local_name(key)
+        ty = types.get(name)
+        if ty is None:
+            first = next((b[key] for b in bindings if b.get(key) is not None), None)
+            if first.__class__ is dict:
+                ty = local_name(first.get("@type", ""))
+        columns[name] = typed_column(_column_values(bindings, key), ty, categorical)
+    return pd.DataFrame(columns, copy=False)
+
+
+def typed_query_to_df(q, result, property_types, categorical=True):
+    '''
+        Build a typed dataframe from a query's result,  typing its columns from the schema
+
+        :param q:                   the woql query which gave the result
+        :param result:              dict, the query result
+        :param property_types:      dict, from declared_property_types()
+        :param categorical:         boolean, whether strings and ids are made categorical
+        :return:                    pandas dataframe
+    '''
+    return bindings_to_df(result, query_variable_types(q, property_types), categorical)
+
+
+#######################################################################################################################
+#
+#   Query templates
+#
+#   A query run over and over with only a literal or two changing (eg shipping's query_status(),  once per animation
+#   frame) is otherwise rebuilt from scratch each time:  a tree of WOQLQuery objects,  then its JSON.  A template
+#   instead builds the query once,  with named placeholders ('$time',  '$trustee_name') in place of the values,  and
+#   then binds values straight into a copy of its JSON.  Only the path from the top of the JSON down to each
+#   placeholder is copied;  the rest is shared with the template.  The cache key and the read/write nature of each
+#   bound query are worked out once,  from the template.
+#
+class _Slot:
+    '''
+        Marks where a placeholder is,  in the JSON of a QueryTemplate
+    '''
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+
+class QueryTemplate:
+    '''
+        A woql query,  built once with placeholders for its parameters,  into which values are then bound.
+
+        The query is built by calling 'build' with the string '$<name>' for each parameter <name>:  the placeholder
+        may be used wherever the value would go,  either as is or wrapped as a typed literal (eg by literal_string(),
+        {"@type": "xsd:string", "@value": "$name"}),  and as often as needed.
+    '''
+
+    def __init__(self, build, *names):
+        '''
+            :param build:       function, called with a keyword argument for each parameter,  returning a woql query
+            :param names:       strings, the parameter names
+        '''
+        self.build = build
+        self.names = names
+        self.json = None
+        self.slots = None                               # nested dict of the steps down to each placeholder
+        self.key = None
+        self.update = None
+        self.types = {}                                 # the variable types,  by the property types they are from
+        self.lock = threading.Lock()
+
+    def compile(self):
+        '''
+            Build the query,  and find its placeholders.  Done on the first bind(),  if not before.
+
+            :return:        self
+        '''
+        with self.lock:
+            if self.json is not None:
+                return self
+            placeholders = {"$" + name: name for name in self.names}
+            q = self.build(**{name: "$" + name for name in self.names})
+            j = query_json(q)
+            found = set()
+
+            def find(node):
+                steps = node.items() if isinstance(node, dict) else enumerate(node)
+                slots = {}
+                for step, v in steps:
+                    if isinstance(v, str):
+                        if v in placeholders:
+                            slots[step] = _Slot(placeholders[v])
+                            found.add(v)
+                    elif isinstance(v, (dict, list)):
+                        sub = find(v)
+                        if sub:
+                            slots[step] = sub
+                return slots
+
+            slots = find(j)
+            missing = set(placeholders) - found
+            if missing:
+                raise ValueError("Query template has no placeholder for: " + ", ".join(sorted(missing)))
+            self.key = "template:" + canonical_json(j)
+            self.update = is_update_query(q, j)
+            self.slots = slots
+            self.json = j
+        return self
+
+    def bind_json(self, **values):
+        '''
+            :param values:      the value for each parameter,  by name
+            :return:            dict, the JSON of the query with the values in place of the placeholders
+        '''
+        if self.json is None:
+            self.compile()
+
+        def fill(node, slots):
+            copy = node.copy()
+            for step, sub in slots.items():
+                copy[step] = values[sub.name] if sub.__class__ is _Slot else fill(node[step], sub)
+            return copy
+
+        return fill(self.json, self.slots)
+
+    def bind(self, **values):
+        '''
+            :param values:      the value for each parameter,  by name
+            :return:            woql query
+        '''
+        q = WOQLQuery().json(self.bind_json(**values))
+        q._woql_key = self.key + json.dumps([values[name] for name in self.names], default=str)
+        q._woql_update = self.update
+        return q
+
+    def variable_types(self, property_types):
+        '''
+            The type of each variable in the query (see query_variable_types()),  worked out once for each set of
+            property types
+
+            :param property_types:      dict, from declared_property_types()
+            :return:                    dict, variable name to type name
+        '''
+        key = canonical_json(property_types)
+        types = self.types.get(key)
+        if types is None:
+            types = self.types[key] = query_variable_types(self.compile().json, property_types)
+        return types
+
+
+if METRICS_FILE:
+    enable_metrics(METRICS_FILE, METRICS_INTERVAL)
+if SLOW_QUERY_SECONDS > 0:
+    enable_slow_query_log(SLOW_QUERY_SECONDS)
+if STATISTICS_FILE:
+    enable_statistics(STATISTICS_FILE)
+if OPTIMIZE_QUERIES:
+    enable_query_optimizer(verify=OPTIMIZE_QUERIES == "verify")
@@ -0,0 +1,179 @@
+##
+##  A catalog of statistics for each predicate in a database:  the number of triples,  and the number of distinct
+##  subjects and objects.  From these,  the number of rows a triple pattern will match can be estimated,  for the
+##  query optimizer to plan with (see optimizer.py),  in place of its guesses from which parts are known.
+##
+##  The statistics of a predicate are recomputed after a query writes to it (eg a load_csv):  not straight away,  but
+##  before the next read query is planned,  so that a run of many small writes is followed by just one recount.  They
+##  are kept in a JSON file between runs,  so that a run against an unchanged database does not recompute them.  Only
+##  the writes made through this process are seen:  the statistics are not checked against the database's head,  so
+##  after another client (or an earlier run without statistics) writes to it,  refresh() must be called on demand.
+##
+##
+##      {"<database url>": {"scm:trustee": {"triples": 2438, "subjects": 2438, "objects": 1841,
+##                                          "refreshed": "2020-04-28T15:00:00"}, ...}, ...}
+##
+
+import os
+import json
+import time
+import threading
+
+from .optimizer import is_variable, heuristic_estimate
+
+
+WRITE_OPERATORS                 = ("add_triple", "delete_triple", "update_triple",
+                                   "add_quad", "delete_quad", "update_quad")
+                                                    # woql operators which write one triple (or quad)
+OBJECT_WRITE_OPERATORS          = ("delete_object", "update_object")
+                                                    # woql operators which write a whole document
+ALL_PREDICATES                  = "*"               # stands for every predicate,  when which are written is not known
+
+
+def written_predicates(node):
+    '''
+        :param node:    a woql query JSON
+        :return:        set of the predicates (eg 'scm:trustee') of the triples which it writes,  including
+                        ALL_PREDICATES if it writes a document,  or a triple whose predicate is a variable
+    '''
+    found = set()
+    if isinstance(node, dict):
+        for k, v in node.items():
+            if k in WRITE_OPERATORS and isinstance(v, list) and len(v) >= 3:
+                found.add(v[1] if isinstance(v[1], str) and not is_variable(v[1]) else ALL_PREDICATES)
+            elif k in OBJECT_WRITE_OPERATORS:
+                found.add(ALL_PREDICATES)
+            else:
+                found |= written_predicates(v)
+    elif isinstance(node, list):
+        for v in node:
+            found |= written_predicates(v)
+    return found
+
+
+class StatisticsCatalog:
+    '''
+        Triple,  distinct subject and distinct object counts,  for each predicate of each database
+    '''
+
+    def __init__(self, scan, path=None):
+        '''
+            :param scan:    function(client, predicate),  yielding a (subject, object) pair for each triple
+            :param path:    string, file in which the statistics are kept between runs (or None, to not keep them)
+        '''
+        self.scan = scan
+        self.path = path
+        self.databases = {}                             # database url to dict of statistics,  by predicate
+        self.stale = {}                                 # database url to set of predicates written since counted
+        self.lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                self.databases = json.load(f)
+
+    def save(self):
+        if self.path is None:
+            return
+        with self.lock:
+            text = json.dumps(self.databases, indent=1, sort_keys=True)
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            f.write(text)
+        os.replace(temporary, self.path)                # so a reader never sees a half-written file
+
+    def statistics(self, database, predicate):
+        '''
+            :param database:    string, the database url
+            :param predicate:   string, the predicate as used in queries (eg 'scm:trustee')
+            :return:            dict, with 'triples',  'subjects' and 'objects' counts,  or None if not known
+        '''
+        return self.databases.get(database, {}).get(predicate)
+
+    def refresh(self, client, database, predicates):
+        '''
+            Recompute the statistics of some predicates,  and save the catalog
+
+            :param client:      TerminusDB server connection
+            :param database:    string, the database url
+            :param predicates:  iterable of the predicates (eg 'scm:trustee')
+            :return:            dict, the new statistics of each predicate
+        '''
+        fresh = {}
+        for predicate in predicates:
+            triples = 0
+            subjects = set()
+            objects = set()
+            for s, o in self.scan(client, predicate):
+                triples += 1
+                subjects.add(s)
+                objects.add(json.dumps(o, sort_keys=True) if isinstance(o, dict) else o)
+            fresh[predicate] = {"triples": triples, "subjects": len(subjects), "objects": len(objects),
+                                "refreshed": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        with self.lock:
+            known = dict(self.databases.get(database, {}))
+            known.update(fresh)
+            self.databases[database] = known
+        self.save()
+        return fresh
+
+    def note_update(self, database, j):
+        '''
+            Mark as stale the statistics of each predicate which an update query wrote to:  of every predicate
+            counted,  if which it wrote to is not known
+
+            :param database:    string, the database url
+            :param j:           dict, the update query's JSON
+        '''
+        predicates = written_predicates(j)
+        if predicates:
+            with self.lock:
+                if ALL_PREDICATES in predicates:
+                    predicates = (predicates - {ALL_PREDICATES}) | set(self.databases.get(database, {}))
+                self.stale.setdefault(database, set()).update(predicates)
+
+    def refresh_stale(self, client, database):
+        '''
+            Recompute the statistics of the predicates written to since they were last counted
+
+            :param client:      TerminusDB server connection
+            :param database:    string, the database url
+            :return:            dict, the new statistics of each predicate
+        '''
+        with self.lock:
+            stale = self.stale.pop(database, None)
+        return self.refresh(client, database, sorted(stale)) if stale else {}
+
+    def forget(self, database):
+        '''
+            Drop the statistics of a database (eg when it is deleted)
+        '''
+        with self.lock:
+            self.databases.pop(database, None)
+            self.stale.pop(database, None)
+        self.save()
+
+    def estimator(self, database):
+        '''
+            :param database:    string, the database url
+            :return:            function(s, p, o, bound),  estimating the number of rows a triple will match,  for
+                                the query optimizer (falling back on heuristic_estimate for unknown predicates)
+        '''
+        known = self.databases.get(database, {})
+
+        def estimate(s, p, o, bound):
+            stats = None if is_variable(p) else known.get(p)
+            if stats is None:
+                return heuristic_estimate(s, p, o, bound)
+            triples = stats["triples"]
+            if triples == 0:
+                return 0
+            s_known = not is_variable(s) or s in bound
+            o_known = not is_variable(o) or o in bound
+            if s_known and o_known:
+                return triples / (stats["subjects"] * stats["objects"])
+            if s_known:
+                return triples / stats["subjects"]
+            if o_known:
+                return triples / stats["objects"]
+            return triples
+
+        return estimate
@@ -0,0 +1,64 @@
+##
+##  Lazy loading of the heavy modules used by the demos (matplotlib,  networkx),  so that a batch run which never
+##  plots does not pay for importing them.
+##
+##  Usage,  in place of 'import matplotlib.pyplot as plt':
+##      plt = wary.lazy_import("matplotlib.pyplot")
+##
+##  The module is imported the first time one of its attributes is used.  Set the WOQL_EAGER_IMPORTS environment
+##  variable to have every module imported straight away instead (eg to compare start up times).
+##
+
+import os
+import sys
+import importlib
+import threading
+
+
+EAGER_IMPORTS                   = bool(os.environ.get("WOQL_EAGER_IMPORTS"))
+                                                    # if set,  lazy_import() imports each module straight away
+
+
+class LazyModule:
+    '''
+        Stands in for a module until one of its attributes is first used,  and then imports it
+    '''
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        '''
+            :return:        the module,  importing it if need be
+        '''
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def is_loaded(self):
+        return self._module is not None or self._name in sys.modules
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        return "<lazy module '{}'{}>".format(self._name, "" if self.is_loaded else " (not yet imported)")
+
+
+def lazy_import(name):
+    '''
+        Import a module when it is first used,  rather than now
+
+        :param name:        string, the module's full name (eg 'matplotlib.pyplot')
+        :return:            a LazyModule (or the module itself,  if it is already imported or EAGER_IMPORTS is set)
+    '''
+    if name in sys.modules:
+        return sys.modules[name]
+    if EAGER_IMPORTS:
+        return importlib.import_module(name)
+    return LazyModule(name)
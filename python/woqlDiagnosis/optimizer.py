@@ -0,0 +1,379 @@
+##
+##  A client-side rewriting pass over the JSON of a woql (read) query,  done before it is sent to the server.
+##
+##  The demos build their queries for clarity rather than speed:  list_charities_for() has its one literal-bound
+##  triple fourth of five,  and the family-tree composers (grandmothers_of -> parent_of -> parents_of) nest woql_and
+##  and woql_or several levels deep.  The rewrites,  each of which leaves the bindings of the query unchanged
+##  (though maybe in another order),  are:
+##
+##      flatten     an 'and' within an 'and' (or an 'or' within an 'or') is merged into its parent
+##      hoist       a 'select' within an 'and' is replaced by its body,  if none of the variables it hides are used
+##                  anywhere else;  otherwise its variables are cut down to those which are used elsewhere
+##      drop        an 'eq' which only binds a variable used nowhere else is dropped,  as is a repeat of a triple
+##      order       the clauses of each 'and' are ordered greedily:  next is always the clause expected to match the
+##                  fewest rows,  given the variables already bound;  and each filter (less,  greater) goes as
+##                  soon as its variables are all bound
+##
+##  Clauses whose meaning depends on where they are (opt,  not,  and anything not known here) are not moved:  the
+##  clauses either side of one are ordered separately.  Update queries are left alone.
+##
+##  The number of rows a triple is expected to match comes from an 'estimate' function,  given the subject,
+##  predicate,  object and the set of variables already bound.  heuristic_estimate() goes by which of the three
+##  are known;  a function backed by statistics from the database may be given instead.
+##
+
+import json
+import collections
+
+
+HEURISTIC_ESTIMATES = {                             # rows matched,  by whether (subject, predicate, object) are known
+    (True, True, True):         1,
+    (True, True, False):        2,
+    (True, False, True):        3,
+    (False, True, True):        5,
+    (True, False, False):       10,
+    (False, False, True):       50,
+    (False, True, False):       1000,
+    (False, False, False):      1000000,
+}
+
+TRIPLE_OPERATORS                = ("triple", "quad")
+FILTER_OPERATORS                = ("less", "greater")
+GROUP_OPERATORS                 = ("and", "or")
+CAST_OPERATORS                  = ("typecast", "cast")
+REWRITES                        = ("flatten", "hoist", "drop", "order")
+
+SCOPE_OPERATORS                 = ("opt", "not", "limit", "start", "from", "into")
+                                                    # not moved,  but the query within is optimized
+
+
+def is_variable(term):
+    return isinstance(term, str) and term.startswith("v:")
+
+
+def variables(node):
+    '''
+        :param node:    a woql query JSON,  or any part of it
+        :return:        Counter, of the number of times each variable is used within it
+    '''
+    found = collections.Counter()
+
+    def walk(n):
+        if is_variable(n):
+            found[n] += 1
+        elif isinstance(n, dict):
+            for v in n.values():
+                walk(v)
+        elif isinstance(n, list):
+            for v in n:
+                walk(v)
+
+    walk(node)
+    return found
+
+
+def operator(node):
+    '''
+        :param node:    dict, a woql query JSON node
+        :return:        string, its operator (eg 'triple',  'and'),  or None if it is not a simple operator node
+    '''
+    if isinstance(node, dict) and len(node) == 1:
+        op = next(iter(node))
+        if isinstance(node[op], list):
+            return op
+    return None
+
+
+def heuristic_estimate(s, p, o, bound):
+    '''
+        Guess the number of rows a triple will match,  from which of its parts are known
+
+        :param s:       the subject:  a variable,  or a document id
+        :param p:       the predicate
+        :param o:       the object:  a variable,  a document id or a literal
+        :param bound:   set of the variables already bound
+        :return:        number
+    '''
+    return HEURISTIC_ESTIMATES[tuple(not is_variable(t) or t in bound for t in (s, p, o))]
+
+
+#
+#   flatten
+#
+
+def flatten(node):
+    '''
+        :param node:    a woql query JSON
+        :return:        a copy,  with each 'and' within an 'and' (and each 'or' within an 'or') merged into its parent
+    '''
+    if isinstance(node, list):
+        return [flatten(v) for v in node]
+    if not isinstance(node, dict):
+        return node
+    op = operator(node)
+    if op not in GROUP_OPERATORS:
+        return {k: flatten(v) for k, v in node.items()}
+    clauses = []
+    for clause in node[op]:
+        clause = flatten(clause)
+        if operator(clause) == op:
+            clauses.extend(clause[op])
+        else:
+            clauses.append(clause)
+    if len(clauses) == 1:
+        return clauses[0]
+    return {op: clauses}
+
+
+#
+#   hoist and drop:  only for a query whose top is a select,  so that every variable not selected is hidden
+#
+
+def _select_parts(node):
+    '''
+        :return:    the variables and the body of a 'select' node,  or None if the node is not one
+    '''
+    if operator(node) == "select" and node["select"] and isinstance(node["select"][-1], dict):
+        return node["select"][:-1], node["select"][-1]
+    return None
+
+
+def hoist_selects(node, counts):
+    '''
+        :param node:        a woql query JSON
+        :param counts:      Counter, of the variables used in the whole query (the top select's list included)
+        :return:            a copy,  with the selects nested in an 'and' either replaced by their bodies,  or their
+                            variables cut down to those used elsewhere
+    '''
+    if isinstance(node, list):
+        return [hoist_selects(v, counts) for v in node]
+    if not isinstance(node, dict):
+        return node
+    parts = _select_parts(node)
+    if parts is not None and _select_parts(parts[1]) is not None:
+        return {"select": parts[0] + [hoist_selects({"and": [parts[1]]}, counts)]}
+    if operator(node) != "and":
+        return {k: hoist_selects(v, counts) for k, v in node.items()}
+    clauses = []
+    for clause in node["and"]:
+        parts = _select_parts(clause)
+        if parts is None:
+            clauses.append(hoist_selects(clause, counts))
+            continue
+        selected, body = parts
+        inside = variables(body)
+        elsewhere = {v for v in counts if counts[v] > inside[v] + selected.count(v)}
+        if not (set(inside) - set(selected)) & elsewhere:
+            clauses.append(hoist_selects(body, counts))
+        else:
+            used = [v for v in selected if v in elsewhere]
+            clauses.append({"select": (used or selected) + [hoist_selects(body, counts)]})
+    return {"and": clauses}
+
+
+def drop_unused(node, counts):
+    '''
+        :param node:        a woql query JSON
+        :param counts:      Counter, of the variables used in the whole query (the top select's list included)
+        :return:            a copy,  without the 'eq's which bind a variable used nowhere else,  and without any
+                            repeat of a triple within the same 'and'
+    '''
+    if isinstance(node, list):
+        return [drop_unused(v, counts) for v in node]
+    if not isinstance(node, dict):
+        return node
+    if operator(node) != "and":
+        return {k: drop_unused(v, counts) for k, v in node.items()}
+    clauses = []
+    seen = set()
+    for clause in node["and"]:
+        op = operator(clause)
+        if op == "eq" and len(clause["eq"]) == 2:
+            left, right = clause["eq"]
+            if any(is_variable(t) and counts[t] == 1 and t != other and (not is_variable(other) or counts[other] > 1)
+                   for t, other in ((left, right), (right, left))):
+                continue
+        elif op in TRIPLE_OPERATORS:
+            key = json.dumps(clause, sort_keys=True)
+            if key in seen:
+                continue
+            seen.add(key)
+        clauses.append(drop_unused(clause, counts))
+    return {"and": clauses}
+
+
+#
+#   order
+#
+
+class _Planner:
+    '''
+        Orders the clauses of each 'and',  keeping track of which variables are bound (certainly,  or on some rows)
+    '''
+
+    def __init__(self, estimate):
+        self.estimate = estimate
+
+    def cost(self, clause, bound, maybe):
+        '''
+            :return:    the expected rows matched by a clause,  or None if it cannot go yet
+        '''
+        op = operator(clause)
+        args = clause[op] if op is not None else None
+        if op in TRIPLE_OPERATORS and len(args) >= 3:
+            return self.estimate(args[0], args[1], args[2], bound)
+        if op in FILTER_OPERATORS:
+            return -1 if set(variables(clause)) <= bound else None
+        if op == "eq" and len(args) == 2:
+            return 0 if any(not is_variable(t) or t in bound for t in args) else None
+        if op in CAST_OPERATORS and len(args) == 3:
+            return 0 if set(variables(args[0])) <= bound else None
+        if op == "and":
+            ordered, ready, _, _ = self.order(args, bound, maybe)
+            return self.cost(ordered[0], bound, maybe) if ready and ordered else None
+        if op == "or":
+            costs = [self.cost(branch, bound, maybe) for branch in args]
+            return None if None in costs else sum(costs)
+        return None
+
+    @staticmethod
+    def is_barrier(clause):
+        op = operator(clause)
+        return op not in TRIPLE_OPERATORS + FILTER_OPERATORS + GROUP_OPERATORS + CAST_OPERATORS + ("eq",)
+
+    def binds(self, clause, bound, maybe):
+        '''
+            :return:    the variables certainly bound,  and those maybe bound,  once a clause has been matched
+        '''
+        op = operator(clause)
+        if op in FILTER_OPERATORS:
+            return bound, maybe
+        if op in CAST_OPERATORS:
+            return bound | set(variables(clause[op][2])), maybe
+        if op == "and":
+            _, _, bound, maybe = self.order(clause[op], bound, maybe)
+            return bound, maybe
+        if op == "or":
+            outcomes = [self.binds(branch, bound, maybe) for branch in clause[op]]
+            certain = set.intersection(*[b for b, _ in outcomes]) if outcomes else bound
+            return certain, maybe.union(*[b | m for b, m in outcomes]) - certain
+        parts = _select_parts(clause)
+        if parts is not None:
+            return bound | set(parts[0]), maybe
+        if self.is_barrier(clause):
+            return bound, maybe | set(variables(clause))
+        return bound | set(variables(clause)), maybe
+
+    def plan(self, clause, bound, maybe):
+        '''
+            :return:    the clause,  with any query within it optimized
+        '''
+        op = operator(clause)
+        if op == "and":
+            return {"and": self.order(clause[op], bound, maybe)[0]}
+        if op == "or":
+            return {"or": [self.plan(branch, bound, maybe) for branch in clause[op]]}
+        if op in SCOPE_OPERATORS:
+            return {op: [self.plan(q, bound, maybe) if isinstance(q, dict) else q for q in clause[op]]}
+        parts = _select_parts(clause)
+        if parts is not None:
+            return {"select": parts[0] + [self.plan(parts[1], bound, maybe)]}
+        return clause
+
+    def order(self, clauses, bound, maybe):
+        '''
+            Order the clauses of an 'and'
+
+            :param clauses:     list, the clauses
+            :param bound:       set, the variables certainly bound beforehand
+            :param maybe:       set, the variables bound on some rows beforehand
+            :return:            the ordered (and optimized) clauses,  whether every one could be placed in an order
+                                in which it can run,  and the variables then bound (certainly,  and maybe)
+        '''
+        pending = list(clauses)
+        ordered = []
+        ready = True
+        while pending:
+            best = None
+            wanted = variables(pending)
+            for i, clause in enumerate(pending):
+                if self.is_barrier(clause):
+                    if i == 0:
+                        best = (0, 0)
+                    break
+                c = self.cost(clause, bound, maybe)
+                if c is None:
+                    continue
+                #
+                #  A clause which only fetches values wanted by no other clause cannot cut down the rows,  so
+                #  goes after those which can;  and an 'or' which binds a variable wanted elsewhere on only some
+                #  rows goes last,  as the clauses after it would have to scan for the rest
+                #
+                own = variables(clause)
+                new = set(own) - bound - maybe
+                rank = 1 if new and all(wanted[v] == own[v] for v in new) else 0
+                if operator(clause) == "or":
+                    partly = self.binds(clause, bound, maybe)[1] - maybe
+                    if any(wanted[v] > own[v] for v in partly):
+                        rank = 2
+                c = (rank, c)
+                if best is None or c < best[1]:
+                    best = (i, c)
+            if best is None:
+                best = (0, None)                        # none can run yet:  keep the original order
+                ready = False
+            clause = pending.pop(best[0])
+            ordered.append(self.plan(clause, bound, maybe))
+            bound, maybe = self.binds(clause, bound, maybe)
+            maybe = maybe - bound
+        return ordered, ready, bound, maybe
+
+
+def order_conjunctions(node, estimate=heuristic_estimate):
+    '''
+        :param node:        a woql query JSON
+        :param estimate:    function(s, p, o, bound),  giving the expected number of rows matched by a triple
+        :return:            a copy,  with the clauses of each 'and' in the order in which they are expected to be
+                            quickest
+    '''
+    return _Planner(estimate).plan(node, set(), set())
+
+
+def optimize_json(j, estimate=heuristic_estimate, rewrites=REWRITES):
+    '''
+        Rewrite the JSON of a woql read query,  to be quicker to run but give the same bindings
+
+        :param j:           dict, the woql query JSON
+        :param estimate:    function(s, p, o, bound),  giving the expected number of rows matched by a triple
+                            (default: heuristic_estimate)
+        :param rewrites:    tuple of the rewrites to make (default:  all of them:  see REWRITES)
+        :return:            dict, the rewritten woql query JSON
+    '''
+    context = {k: v for k, v in j.items() if k.startswith("@")}
+    j = {k: v for k, v in j.items() if k not in context}
+    if "flatten" in rewrites:
+        j = flatten(j)
+    if _select_parts(j) is not None:
+        if "hoist" in rewrites:
+            j = flatten(hoist_selects(j, variables(j)))
+        if "drop" in rewrites:
+            j = flatten(drop_unused(j, variables(j)))
+    if "order" in rewrites:
+        j = order_conjunctions(j, estimate)
+    j.update(context)
+    return j
+
+
+def same_bindings(result, expected):
+    '''
+        Whether two query results have the same bindings,  in whatever order
+
+        :param result:      the result of a woql query
+        :param expected:    the result of another woql query
+        :return:            boolean
+    '''
+    def rows(r):
+        bindings = r.get("bindings", []) if isinstance(r, dict) else []
+        return collections.Counter(json.dumps(b, sort_keys=True, default=str) for b in bindings)
+
+    return rows(result) == rows(expected)